@@ -5,9 +5,164 @@ import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QHBoxLayout, QPushButton, QSlider, QLabel,
-                             QComboBox, QGroupBox, QRadioButton, QSpinBox)
+                             QComboBox, QGroupBox, QRadioButton, QSpinBox, QFileDialog)
 from PyQt5.QtCore import Qt, QTimer
 from collections import deque
+from algo_trace import PlaybackController, TraceLog
+
+TRACE_FILTER = "Algorithm traces (*.trace);;All files (*)"
+
+
+class TraversalTrace(TraceLog):
+    """A DFS or BFS run as a TraceLog.
+
+    A state is the dict update_info_labels() shows: visited nodes, the
+    queue/stack, the current node and the action. An event is
+    [action, current node, neighbor, k, k newly visited nodes, entries removed
+    from the front, entries removed from the back, m, m entries appended].
+    The traversal calls visit/push/pop/popleft as it goes and step() to close
+    each step, which turns the changes since the previous step into its event.
+    """
+
+    ACTIONS = ['', 'start', 'exploring', 'backtracking', 'added']
+
+    def __init__(self):
+        self.live = {'visited': set(), 'queue_or_stack': deque(), 'current_node': None, 'action': ''}
+        self.visited_since = []
+        self.pushed_since = []
+        self.popped_front = 0
+        self.popped_back = 0
+        super().__init__(self.live)
+
+    @classmethod
+    def from_parameters(cls, parameters):
+        return cls()
+
+    def action_text(self, action, neighbor):
+        return f'added {neighbor} to queue' if self.ACTIONS[action] == 'added' else self.ACTIONS[action]
+
+    def encode(self, state):
+        action, neighbor = state.get('codes', (0, -1))
+        current = -1 if state['current_node'] is None else state['current_node']
+        return [action, current, neighbor, len(state['visited']), *sorted(state['visited']),
+                len(state['queue_or_stack']), *state['queue_or_stack']]
+
+    def decode(self, values):
+        values = values.tolist()
+        action, current, neighbor, k = values[:4]
+        queue_start = 5 + k
+        return {'visited': set(values[4:4 + k]), 'queue_or_stack': deque(values[queue_start:]),
+                'current_node': None if current < 0 else current,
+                'action': self.action_text(action, neighbor), 'codes': (action, neighbor)}
+
+    def apply(self, state, event):
+        event = event.tolist()
+        action, current, neighbor, k = event[:4]
+        state['visited'].update(event[4:4 + k])
+        popped_front, popped_back = event[4 + k:6 + k]
+        queue = state['queue_or_stack']
+        for _ in range(popped_front):
+            queue.popleft()
+        for _ in range(popped_back):
+            queue.pop()
+        queue.extend(event[7 + k:])
+        state['current_node'] = current
+        state['action'] = self.action_text(action, neighbor)
+        state['codes'] = (action, neighbor)
+        return state
+
+    def visit(self, node):
+        self.live['visited'].add(node)
+        self.visited_since.append(node)
+
+    def push(self, node):
+        self.live['queue_or_stack'].append(node)
+        self.pushed_since.append(node)
+
+    def pop(self):
+        if self.pushed_since:
+            self.pushed_since.pop()
+        else:
+            self.popped_back += 1
+        return self.live['queue_or_stack'].pop()
+
+    def popleft(self):
+        if len(self.live['queue_or_stack']) == len(self.pushed_since):
+            self.pushed_since.pop(0)
+        else:
+            self.popped_front += 1
+        return self.live['queue_or_stack'].popleft()
+
+    def step(self, action, current_node, neighbor=-1):
+        code = self.ACTIONS.index(action)
+        self.live.update(current_node=current_node, action=self.action_text(code, neighbor),
+                         codes=(code, neighbor))
+        event = [code, current_node, neighbor, len(self.visited_since), *self.visited_since,
+                 self.popped_front, self.popped_back, len(self.pushed_since), *self.pushed_since]
+        self.visited_since.clear()
+        self.pushed_since.clear()
+        self.popped_front = self.popped_back = 0
+        return self.record(event, self.live)
+
+
+def draw_traversal(ax, graph, pos, visited, queue_or_stack, current_node, title):
+    # Draw edges
+    nx.draw_networkx_edges(graph, pos, ax=ax, edge_color='gray')
+
+    # Initialize node colors
+    node_colors = []
+    for node in graph.nodes():
+        if node in visited:
+            if node == current_node:
+                node_colors.append('red')  # Current node
+            else:
+                node_colors.append('green')  # Visited node
+        elif node in queue_or_stack:
+            node_colors.append('orange')  # In queue/stack
+        else:
+            node_colors.append('skyblue')  # Unvisited node
+
+    # Draw nodes
+    nx.draw_networkx_nodes(graph, pos, ax=ax, node_color=node_colors,
+                           node_size=500)
+
+    # Draw node labels
+    nx.draw_networkx_labels(graph, pos, ax=ax, font_color='black')
+
+    # Create legend labels and handles
+    labels = ["Unvisited", "In Queue/Stack", "Visited", "Current"]
+    handles = [plt.Rectangle((0, 0), 1, 1, color=color) for color in ['skyblue', 'orange', 'green', 'red']]
+
+    # Add legend
+    ax.legend(handles, labels, loc='upper right', bbox_to_anchor=(1, 1),
+              fontsize=10, framealpha=0.7)
+
+    # Update title with algorithm information
+    ax.set_title(title)
+
+    # Remove axis
+    ax.axis('off')
+
+
+def trace_graph(meta):
+    # Graph and layout saved with a TraversalTrace
+    graph = nx.Graph()
+    graph.add_nodes_from(range(meta['nodes']))
+    graph.add_edges_from(meta['edges'])
+    return graph, {node: tuple(xy) for node, xy in enumerate(meta['pos'])}
+
+
+def frame_renderer(fig, trace):
+    """Draws steps of an opened TraversalTrace onto an Agg figure, for export_trace.py"""
+    graph, pos = trace_graph(trace.meta)
+
+    def draw(step):
+        state = trace.seek(step)
+        fig.clear()
+        draw_traversal(fig.add_subplot(111), graph, pos, state['visited'], state['queue_or_stack'],
+                       state['current_node'], f"{trace.meta['algorithm']} - Step {step}")
+        fig.canvas.draw()
+    return draw
 
 
 class GraphVisualizerApp(QMainWindow):
@@ -19,11 +174,13 @@ class GraphVisualizerApp(QMainWindow):
         # Algorithm state variables
         self.graph = nx.Graph()
         self.pos = {}  # Node positions
-        self.current_step = 0
-        self.algorithm_steps = []  # Will store states for stepping through
+        self.algorithm_steps = TraversalTrace()  # Will store states for stepping through
+        self.trace_loaded = False  # Steps come from an opened trace file, not the current settings
         self.timer = QTimer()
         self.timer.timeout.connect(self.step_forward)
         self.animation_speed = 500  # ms between steps
+        self.playback = PlaybackController(self.show_step, lambda: len(self.algorithm_steps), self.timer,
+                                           self.animation_speed)
 
         # Algorithm variables
         self.algorithm = "DFS"  # Default algorithm
@@ -78,6 +235,7 @@ class GraphVisualizerApp(QMainWindow):
         self.start_node_spinner = QSpinBox()
         self.start_node_spinner.setRange(0, 9)
         self.start_node_spinner.setValue(0)
+        self.start_node_spinner.valueChanged.connect(self.discard_loaded_trace)
 
         # Speed control
         speed_label = QLabel("Speed:")
@@ -136,6 +294,12 @@ class GraphVisualizerApp(QMainWindow):
         self.new_graph_button = QPushButton("New Graph")
         self.new_graph_button.clicked.connect(self.generate_random_graph)
 
+        self.save_trace_button = QPushButton("Save Trace")
+        self.save_trace_button.clicked.connect(self.save_trace)
+
+        self.open_trace_button = QPushButton("Open Trace")
+        self.open_trace_button.clicked.connect(self.open_trace)
+
         # Add buttons to info layout
         info_layout.addWidget(self.prev_button)
         info_layout.addWidget(self.step_button)
@@ -143,6 +307,8 @@ class GraphVisualizerApp(QMainWindow):
         info_layout.addWidget(self.stop_button)
         info_layout.addWidget(self.reset_button)
         info_layout.addWidget(self.new_graph_button)
+        info_layout.addWidget(self.save_trace_button)
+        info_layout.addWidget(self.open_trace_button)
 
         # Status display
         self.status_label = QLabel("Ready")
@@ -200,6 +366,7 @@ class GraphVisualizerApp(QMainWindow):
 
         # Calculate positions for nodes
         self.pos = nx.spring_layout(self.graph)
+        self.discard_loaded_trace()
 
         # Reset visualization
         self.reset_visualization()
@@ -209,211 +376,191 @@ class GraphVisualizerApp(QMainWindow):
 
     def draw_graph(self):
         self.figure.clear()
-        ax = self.figure.add_subplot(111)
-
-        # Draw edges
-        nx.draw_networkx_edges(self.graph, self.pos, ax=ax, edge_color='gray')
-
-        # Initialize node colors
-        node_colors = []
-        for node in self.graph.nodes():
-            if node in self.visited:
-                if node == self.current_node if hasattr(self, 'current_node') else False:
-                    node_colors.append('red')  # Current node
-                else:
-                    node_colors.append('green')  # Visited node
-            elif hasattr(self, 'queue_or_stack') and node in self.queue_or_stack:
-                node_colors.append('orange')  # In queue/stack
-            else:
-                node_colors.append('skyblue')  # Unvisited node
-
-        # Draw nodes
-        nx.draw_networkx_nodes(self.graph, self.pos, ax=ax, node_color=node_colors,
-                               node_size=500)
-
-        # Draw node labels
-        nx.draw_networkx_labels(self.graph, self.pos, ax=ax, font_color='black')
-
-        # Create legend labels and handles
-        labels = ["Unvisited", "In Queue/Stack", "Visited", "Current"]
-        handles = [plt.Rectangle((0, 0), 1, 1, color=color) for color in ['skyblue', 'orange', 'green', 'red']]
-
-        # Add legend
-        ax.legend(handles, labels, loc='upper right', bbox_to_anchor=(1, 1),
-                  fontsize=10, framealpha=0.7)
-
-        # Update title with algorithm information
-        ax.set_title(f"{self.algorithm} - Step {self.current_step}")
-
-        # Remove axis
-        ax.axis('off')
+        draw_traversal(self.figure.add_subplot(111), self.graph, self.pos, self.visited, self.queue_or_stack,
+                       getattr(self, 'current_node', None), f"{self.algorithm} - Step {self.playback.position}")
 
         # Update canvas
         self.canvas.draw()
 
     def set_algorithm(self, algorithm):
         self.algorithm = algorithm
+        self.discard_loaded_trace()
         self.reset_visualization()
 
     def update_speed(self):
         # Convert slider value (1-10) to ms (1000-100)
         self.animation_speed = 1100 - (self.speed_slider.value() * 100)
+        self.playback.set_interval(self.animation_speed)
 
     def calculate_algorithm_steps(self):
-        self.algorithm_steps = []
-        self.visited = set()
+        trace = TraversalTrace()
+        visited = trace.live['visited']
         start_node = self.start_node_spinner.value()
 
         if self.algorithm == "DFS":
             # DFS implementation
-            self.queue_or_stack = [start_node]  # Using as stack
+            trace.push(start_node)  # Using as stack
+            stack = trace.live['queue_or_stack']
 
-            while self.queue_or_stack:
-                current_node = self.queue_or_stack[-1]  # Peek at top of stack
+            while stack:
+                current_node = stack[-1]  # Peek at top of stack
 
                 # Save the current state
-                self.algorithm_steps.append({
-                    'visited': self.visited.copy(),
-                    'queue_or_stack': self.queue_or_stack.copy(),
-                    'current_node': current_node,
-                    'action': 'exploring' if current_node not in self.visited else 'backtracking'
-                })
+                trace.step('exploring' if current_node not in visited else 'backtracking', current_node)
 
-                if current_node not in self.visited:
-                    self.visited.add(current_node)
+                if current_node not in visited:
+                    trace.visit(current_node)
 
                     # Get unvisited neighbors
                     neighbors = sorted([n for n in self.graph.neighbors(current_node)
-                                        if n not in self.visited], reverse=True)
+                                        if n not in visited], reverse=True)
 
                     # If no unvisited neighbors, backtrack (pop)
                     if not neighbors:
-                        self.queue_or_stack.pop()
+                        trace.pop()
                     else:
                         # Add neighbors to stack (in reverse order so they come out in order)
                         for neighbor in neighbors:
-                            self.queue_or_stack.append(neighbor)
+                            trace.push(neighbor)
                 else:
                     # Already visited this node, backtrack
-                    self.queue_or_stack.pop()
+                    trace.pop()
 
         else:  # BFS
             # BFS implementation
-            self.queue_or_stack = deque([start_node])  # Using as queue
-            self.visited.add(start_node)
+            trace.push(start_node)  # Using as queue
+            trace.visit(start_node)
+            queue = trace.live['queue_or_stack']
 
             # Save initial state
-            self.algorithm_steps.append({
-                'visited': self.visited.copy(),
-                'queue_or_stack': list(self.queue_or_stack),
-                'current_node': start_node,
-                'action': 'start'
-            })
+            trace.step('start', start_node)
 
-            while self.queue_or_stack:
-                current_node = self.queue_or_stack.popleft()
+            while queue:
+                current_node = trace.popleft()
 
                 # Save the current state (after popping)
-                self.algorithm_steps.append({
-                    'visited': self.visited.copy(),
-                    'queue_or_stack': list(self.queue_or_stack),
-                    'current_node': current_node,
-                    'action': 'exploring'
-                })
+                trace.step('exploring', current_node)
 
                 # Get all neighbors
                 neighbors = sorted([n for n in self.graph.neighbors(current_node)
-                                    if n not in self.visited])
+                                    if n not in visited])
 
                 for neighbor in neighbors:
-                    if neighbor not in self.visited:
-                        self.queue_or_stack.append(neighbor)
-                        self.visited.add(neighbor)
+                    if neighbor not in visited:
+                        trace.push(neighbor)
+                        trace.visit(neighbor)
 
                         # Save state after each neighbor is added to queue and visited
-                        self.algorithm_steps.append({
-                            'visited': self.visited.copy(),
-                            'queue_or_stack': list(self.queue_or_stack),
-                            'current_node': current_node,
-                            'action': f'added {neighbor} to queue'
-                        })
+                        trace.step('added', current_node, neighbor)
+
+        trace.meta = {'algorithm': self.algorithm, 'start_node': start_node}
+        self.algorithm_steps = trace
+
+    def discard_loaded_trace(self):
+        self.trace_loaded = False
+
+    def prepare_steps(self):
+        # Runs are calculated when stepping off step 0, so later setting changes take effect
+        if self.playback.at_start() and not self.trace_loaded:
+            self.calculate_algorithm_steps()
+
+    def save_trace(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Trace", "", TRACE_FILTER)
+        if not path:
+            return
+        self.prepare_steps()
+
+        # The graph and layout go with the run so it can be redrawn without recomputing it
+        nodes = sorted(self.graph.nodes())
+        self.algorithm_steps.meta.update(nodes=len(nodes), edges=[list(edge) for edge in self.graph.edges()],
+                                         pos=[[float(x) for x in self.pos[node]] for node in nodes])
+        try:
+            self.algorithm_steps.save(path)
+        except OSError as e:
+            self.status_label.setText(f"Could not save trace: {e}")
+            return
+        self.status_label.setText(f"Saved {len(self.algorithm_steps) - 1} steps")
+
+    def open_trace(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Open Trace", "", TRACE_FILTER)
+        if not path:
+            return
+        self.stop_animation()
+        try:
+            trace = TraversalTrace.open(path)
+            meta = trace.meta
+            graph, pos = trace_graph(meta)
+        except (OSError, ValueError, KeyError) as e:
+            self.status_label.setText(f"Could not open trace: {e}")
+            return
+
+        # Match the controls to the run without generating a new graph
+        self.nodes_spinner.blockSignals(True)
+        self.nodes_spinner.setValue(meta['nodes'])
+        self.nodes_spinner.blockSignals(False)
+        self.start_node_spinner.setRange(0, meta['nodes'] - 1)
+        self.start_node_spinner.setValue(meta['start_node'])
+        self.algo_combo.setCurrentText(meta['algorithm'])
+        self.algorithm = meta['algorithm']
+
+        self.graph = graph
+        self.pos = pos
+        self.algorithm_steps = trace
+        self.trace_loaded = True
+        self.reset_visualization()
+        self.status_label.setText(f"Opened {len(trace) - 1} steps")
 
     def start_animation(self):
-        self.timer.start(self.animation_speed)
+        self.playback.play()
         self.start_button.setEnabled(False)
         self.stop_button.setEnabled(True)
         self.status_label.setText("Running...")
 
     def stop_animation(self):
-        self.timer.stop()
+        self.playback.pause()
         self.start_button.setEnabled(True)
         self.stop_button.setEnabled(False)
         self.status_label.setText("Paused")
 
-    def step_forward(self):
-        if self.current_step == 0:
-            # Initialize the algorithm steps if this is the first step
-            self.calculate_algorithm_steps()
-
-        if self.current_step < len(self.algorithm_steps):
-            # Get current state
-            state = self.algorithm_steps[self.current_step]
-            self.visited = state['visited']
-            self.queue_or_stack = state['queue_or_stack']
-            self.current_node = state['current_node']
-
-            # Update UI
-            self.draw_graph()
-            self.update_info_labels(state)
-
-            # Increment step counter
-            self.current_step += 1
-            self.step_label.setText(f"Step {self.current_step}")
+    def show_step(self, step):
+        # Step 0 is the state before the traversal starts
+        if step == 0:
+            self.reset_visualization()
+            return
 
-            # Enable previous button if we're past step 0
-            self.prev_button.setEnabled(self.current_step > 0)
+        state = self.algorithm_steps.seek(step)
+        self.visited = state['visited']
+        self.queue_or_stack = state['queue_or_stack']
+        self.current_node = state['current_node']
 
-            # Check if we've reached the end
-            if self.current_step >= len(self.algorithm_steps):
-                self.stop_animation()
-                self.status_label.setText("Completed")
-        else:
-            self.stop_animation()
-            self.status_label.setText("Completed")
-
-    def step_backward(self):
-        if self.current_step > 0:
-            # Decrement step counter
-            self.current_step -= 1
+        # Update UI
+        self.draw_graph()
+        self.update_info_labels(state)
+        self.step_label.setText(f"Step {step}")
 
-            # If at beginning, reset
-            if self.current_step == 0:
-                self.reset_visualization()
-                return
+        # Enable previous button if we're past step 0
+        self.prev_button.setEnabled(True)
 
-            # Get previous state
-            state = self.algorithm_steps[self.current_step - 1]
-            self.visited = state['visited']
-            self.queue_or_stack = state['queue_or_stack']
-            self.current_node = state['current_node']
+    def step_forward(self):
+        self.prepare_steps()
 
-            # Update UI
-            self.draw_graph()
-            self.update_info_labels(state)
-            self.step_label.setText(f"Step {self.current_step}")
+        if self.playback.next() and not self.playback.at_end():
+            return
 
-            # Disable previous button if we're at step 0
-            self.prev_button.setEnabled(self.current_step > 0)
+        # Check if we've reached the end
+        self.stop_animation()
+        self.status_label.setText("Completed")
 
+    def step_backward(self):
+        if self.playback.prev() and not self.playback.at_start():
             # Update status
             self.status_label.setText("Stepped back")
 
     def reset_visualization(self):
         # Stop any running animation
-        self.timer.stop()
+        self.playback.rewind()
 
         # Reset algorithm state
-        self.current_step = 0
         self.visited = set()
         self.queue_or_stack = []
         if hasattr(self, 'current_node'):
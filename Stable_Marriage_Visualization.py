@@ -1,15 +1,1236 @@
 import matplotlib.pyplot as plt
-import matplotlib.animation as animation
 import networkx as nx
-import random
+import argparse
+import bisect
+import heapq
+import itertools
+import multiprocessing
+import time
 import tkinter as tk
-from tkinter import ttk, scrolledtext
+import tkinter.font as tkfont
+from tkinter import ttk, scrolledtext, filedialog
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.collections import LineCollection
+from matplotlib.colors import ListedColormap
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 import numpy as np
-import copy
+from algo_trace import PlaybackController, TkTimer, TraceLog
+
+
+def index_dtype(n):
+    """Smallest unsigned integer dtype that can hold indices 0..n-1"""
+    return np.min_scalar_type(max(n - 1, 0))
+
+
+def random_preferences(n, rng, out=None):
+    """n x n matrix whose rows are independent uniformly random permutations of range(n)"""
+    prefs = np.tile(np.arange(n, dtype=index_dtype(n)), (n, 1))
+    if out is None:
+        out = prefs
+    return rng.permuted(prefs, axis=1, out=out)
+
+
+def correlated_preferences(n, rng, out=None, correlation=0.5):
+    """Rows rank the other side by correlation * shared popularity + (1 - correlation) * private noise"""
+    popularity = rng.random(n)
+    scores = correlation * popularity + (1 - correlation) * rng.random((n, n))
+    if out is None:
+        out = np.empty((n, n), dtype=index_dtype(n))
+    out[:] = np.argsort(-scores, axis=1)
+    return out
+
+
+def master_list_preferences(n, rng, out=None):
+    """Every row is the same random permutation"""
+    if out is None:
+        out = np.empty((n, n), dtype=index_dtype(n))
+    out[:] = rng.permutation(n)
+    return out
+
+
+# Every generator takes (n, rng, out=None) and fills an n x n preference matrix
+INSTANCE_KINDS = {
+    "uniform": random_preferences,
+    "correlated": correlated_preferences,
+    "master-list": master_list_preferences,
+}
+
+
+def inverse_ranks(prefs):
+    """ranks[i, j] is the position of j in row i of prefs"""
+    n = prefs.shape[1]
+    ranks = np.empty_like(prefs)
+    positions = np.arange(n, dtype=prefs.dtype)
+    # Row by row keeps the temporary memory at O(n) even for 10^8-entry matrices
+    for i, row in enumerate(prefs):
+        ranks[i, row] = positions
+    return ranks
+
+
+def blocking_pairs(men_rank, women_rank, wife, chunk_rows=1024):
+    """All blocking pairs of a (possibly partial) matching, as a k x 2 array of (man, woman).
+
+    men_rank[m, w] and women_rank[w, m] are inverse rank matrices and wife[m]
+    is man m's partner or -1. (m, w) blocks when each prefers the other to
+    their current partner, an unmatched person preferring anyone. Rows are
+    compared a block of men at a time, so temporaries stay O(chunk_rows * n).
+    """
+    n = len(wife)
+    wife = np.asarray(wife, dtype=np.int64)
+    husband = np.full(n, -1, dtype=np.int64)
+    matched = wife >= 0
+    husband[wife[matched]] = np.flatnonzero(matched)
+
+    # Rank of each person's current partner, n (worse than everyone) if unmatched
+    everyone = np.arange(n)
+    wife_rank = np.where(matched, men_rank[everyone, np.maximum(wife, 0)].astype(np.int64), n)
+    husband_rank = np.where(husband >= 0, women_rank[everyone, np.maximum(husband, 0)].astype(np.int64), n)
+
+    pairs = []
+    for start in range(0, n, chunk_rows):
+        stop = min(start + chunk_rows, n)
+        man_prefers = men_rank[start:stop] < wife_rank[start:stop, None]
+        woman_prefers = women_rank[:, start:stop].T < husband_rank[None, :]
+        men, women = np.nonzero(man_prefers & woman_prefers)
+        pairs.append(np.column_stack((men + start, women)))
+    return np.concatenate(pairs) if pairs else np.empty((0, 2), dtype=np.int64)
+
+
+# One round of simultaneous proposals: men[i] proposed to women[i], contested lists the
+# women who received proposals and previous their fiances beforehand (-1 if free)
+Round = namedtuple('Round', ['men', 'women', 'rejected', 'contested', 'previous'])
+
+
+class GaleShapleyEngine:
+    """Headless man-proposing Gale-Shapley on integer-indexed NumPy matrices.
+
+    men_prefs[m] lists women in man m's order of preference and
+    women_rank[w, m] is woman w's rank of man m. Free men wait in a deque, so
+    each proposal is O(1) and a full run is O(n^2) in the worst case. step()
+    performs one proposal for the visualizer, run() finishes the instance.
+    step_round() lets every free man propose at once (McVitie-Wilson rounds),
+    resolving each woman's choice with array operations.
+    """
+
+    def __init__(self, men_prefs, women_prefs):
+        self.n = len(men_prefs)
+        self.men_prefs = men_prefs
+        self.women_prefs = women_prefs
+        self.women_rank = inverse_ranks(women_prefs)
+        self.men_rank = None  # Only needed for stability checks, built on first use
+        self.reset()
+
+    def reset(self):
+        self.next_proposal = np.zeros(self.n, dtype=np.int64)  # Index into each man's list
+        self.husband = np.full(self.n, -1, dtype=np.int64)  # Woman -> man, -1 if free
+        self.free_men = deque(range(self.n))
+        self.proposal_count = 0
+        self.rounds = 0  # Rounds of proposals in the last run()
+
+    def step(self):
+        """Make one proposal; returns (man, woman, rejected man or -1) or None when done"""
+        if not self.free_men:
+            return None
+
+        m = self.free_men.popleft()
+        w = int(self.men_prefs[m, self.next_proposal[m]])
+        self.next_proposal[m] += 1
+        self.proposal_count += 1
+
+        current = self.husband[w]
+        if current < 0:
+            self.husband[w] = m
+            return m, w, -1
+        current = int(current)
+        if self.women_rank[w, m] < self.women_rank[w, current]:
+            self.husband[w] = m
+            self.free_men.append(current)
+            return m, w, current
+        self.free_men.append(m)
+        return m, w, m
+
+    def step_round(self):
+        """Every free man proposes to his next choice simultaneously; returns a Round or None when done"""
+        if not self.free_men:
+            return None
+
+        men = np.fromiter(self.free_men, dtype=np.int64, count=len(self.free_men))
+        women = self.men_prefs[men, self.next_proposal[men]].astype(np.int64)
+        self.next_proposal[men] += 1
+        self.proposal_count += len(men)
+
+        # Each woman proposed to keeps the best of her proposers and her current fiance
+        contested = np.unique(women)
+        previous = self.husband[contested]
+        holding = previous >= 0
+        candidates = np.concatenate((men, previous[holding]))
+        candidate_women = np.concatenate((women, contested[holding]))
+        order = np.lexsort((self.women_rank[candidate_women, candidates], candidate_women))
+        sorted_women = candidate_women[order]
+        best = order[np.r_[True, sorted_women[1:] != sorted_women[:-1]]]
+        self.husband[candidate_women[best]] = candidates[best]
+
+        chosen = np.zeros(len(candidates), dtype=bool)
+        chosen[best] = True
+        rejected = candidates[~chosen]
+        self.free_men = deque(rejected.tolist())
+        return Round(men, women, rejected, contested, previous)
+
+    def run_rounds(self):
+        """Finish the matching with step_round(); returns the number of rounds"""
+        rounds = 0
+        while self.step_round() is not None:
+            rounds += 1
+        return rounds
+
+    def undo(self, event):
+        """Reverse the event returned by the latest step() or step_round()"""
+        if isinstance(event, Round):
+            self.next_proposal[event.men] -= 1
+            self.proposal_count -= len(event.men)
+            self.husband[event.contested] = event.previous
+            self.free_men = deque(event.men.tolist())
+            return
+
+        m, w, rejected = event
+        self.next_proposal[m] -= 1
+        self.proposal_count -= 1
+        if rejected < 0:
+            self.husband[w] = -1
+        else:
+            # step() appended whoever was rejected; the proposer goes back to the front
+            self.free_men.pop()
+            if rejected != m:
+                self.husband[w] = rejected
+        self.free_men.appendleft(m)
+
+    def snapshot(self):
+        """Copy of the mutable state, for restore()"""
+        return self.next_proposal.copy(), self.husband.copy(), tuple(self.free_men), self.proposal_count
+
+    def restore(self, snapshot):
+        next_proposal, husband, free_men, self.proposal_count = snapshot
+        self.next_proposal = next_proposal.copy()
+        self.husband = husband.copy()
+        self.free_men = deque(free_men)
+
+    def run(self):
+        """Finish the matching from the current state; returns the number of proposals made"""
+        men_prefs, women_rank = self.men_prefs, self.women_rank
+        next_proposal = self.next_proposal.tolist()
+        husband = self.husband.tolist()
+        free_men = list(self.free_men)
+        proposals = 0
+        rounds = 0
+
+        # Each round every currently free man proposes once; men freed during it wait for the next
+        while free_men:
+            rounds += 1
+            proposers, free_men = free_men, []
+            for m in proposers:
+                w = men_prefs[m, next_proposal[m]]
+                next_proposal[m] += 1
+                proposals += 1
+
+                current = husband[w]
+                if current < 0:
+                    husband[w] = m
+                elif women_rank[w, m] < women_rank[w, current]:
+                    husband[w] = m
+                    free_men.append(current)
+                else:
+                    free_men.append(m)
+
+        self.next_proposal[:] = next_proposal
+        self.husband[:] = husband
+        self.free_men.clear()
+        self.proposal_count += proposals
+        self.rounds = rounds
+        return proposals
+
+    def wives(self):
+        """Man -> woman array of the current engagements, -1 if free"""
+        wife = np.full(self.n, -1, dtype=np.int64)
+        engaged = self.husband >= 0
+        wife[self.husband[engaged]] = np.flatnonzero(engaged)
+        return wife
+
+    def blocking_pairs(self, wife=None):
+        """Blocking pairs of the given man -> woman matching, by default the current engagements"""
+        if self.men_rank is None:
+            self.men_rank = inverse_ranks(self.men_prefs)
+        return blocking_pairs(self.men_rank, self.women_rank, self.wives() if wife is None else wife)
+
+
+class MatchingTrace(TraceLog):
+    """A Gale-Shapley run as a TraceLog over a live GaleShapleyEngine.
+
+    The state is the engine itself. A keyframe is its snapshot() flattened to
+    ints, and because the engine is deterministic, applying an event just makes
+    the same proposal (or round) again. An event is (man, woman, rejected) for
+    a single proposal, or a Round flattened to [k, k men, k women, r,
+    r rejected, c, c contested women, c previous fiances]. Seeking one step
+    back undoes the event in O(1) instead of replaying from a keyframe.
+    """
+
+    KEYFRAME_INTERVAL = 32
+
+    def __init__(self, engine):
+        self.engine = engine
+        super().__init__(engine)
+
+    def parameters(self):
+        return {'men_prefs': self.engine.men_prefs.tolist(), 'women_prefs': self.engine.women_prefs.tolist()}
+
+    @classmethod
+    def from_parameters(cls, parameters):
+        dtype = index_dtype(len(parameters['men_prefs']))
+        return cls(GaleShapleyEngine(np.array(parameters['men_prefs'], dtype=dtype),
+                                     np.array(parameters['women_prefs'], dtype=dtype)))
+
+    def encode(self, engine):
+        free_men = list(engine.free_men)
+        return [engine.proposal_count, *engine.next_proposal.tolist(), *engine.husband.tolist(),
+                len(free_men), *free_men]
+
+    def decode(self, values):
+        n = self.engine.n
+        values = np.frombuffer(values, dtype=np.int64)
+        self.engine.restore((values[1:1 + n], values[1 + n:1 + 2 * n],
+                             tuple(values[2 + 2 * n:].tolist()), int(values[0])))
+        return self.engine
+
+    def apply(self, engine, event):
+        engine.step() if len(event) == 3 else engine.step_round()
+        return engine
+
+    def seek(self, step):
+        step = range(len(self))[step]
+        if self.cursor is not None and step == self.cursor[0] - 1:
+            self.engine.undo(self.proposal(self.cursor[0]))
+            self.cursor = (step, self.engine)
+            return self.engine
+        return super().seek(step)
+
+    def view(self):
+        # The state is the live engine, so a view replays on an engine of its own
+        view = super().view()
+        view.engine = GaleShapleyEngine(self.engine.men_prefs, self.engine.women_prefs)
+        return view
+
+    def add(self, event):
+        """Log the step the engine just made; the engine stays the state at the new step"""
+        if isinstance(event, Round):
+            values = [len(event.men), *event.men.tolist(), *event.women.tolist(),
+                      len(event.rejected), *event.rejected.tolist(),
+                      len(event.contested), *event.contested.tolist(), *event.previous.tolist()]
+        else:
+            values = event
+        step = self.record(values, self.engine)
+        self.remember(step, self.engine)
+        return step
+
+    def proposal(self, step):
+        """The proposal event (or Round) leading to step, as the engine returned it"""
+        values = self.event(step)
+        if len(values) == 3:
+            return tuple(values)
+        values = np.frombuffer(values, dtype=np.int64)
+        k = int(values[0])
+        r = int(values[1 + 2 * k])
+        c = int(values[2 + 2 * k + r])
+        contested = 3 + 2 * k + r
+        return Round(values[1:1 + k], values[1 + k:1 + 2 * k], values[2 + 2 * k:2 + 2 * k + r],
+                     values[contested:contested + c], values[contested + c:contested + 2 * c])
+
+    def proposal_pairs(self, step):
+        """(man, woman) index pairs proposed in the event leading to step"""
+        if not step:
+            return []
+        event = self.proposal(step)
+        if isinstance(event, Round):
+            return list(zip(event.men.tolist(), event.women.tolist()))
+        m, w, _ = event
+        return [(m, w)]
+
+
+class StableMatchingLattice:
+    """Rotation poset of a stable marriage instance (Gusfield-Irving).
+
+    Every stable matching is the man-optimal matching with one closed set of
+    rotations eliminated, so the poset describes the whole lattice in O(n^2)
+    space. A rotation is a list of (man, woman) pairs; eliminating it gives
+    the man of pair i the woman of pair i + 1. predecessors[r] holds the
+    rotations that must be eliminated before rotation r, and rotations are
+    numbered in an order compatible with the poset. Matchings are man -> woman
+    arrays, like GaleShapleyEngine.wives().
+    """
+
+    def __init__(self, men_prefs, women_prefs):
+        self.n = len(men_prefs)
+        self.men_rank = inverse_ranks(men_prefs)
+        self.women_rank = inverse_ranks(women_prefs)
+
+        men_proposing = GaleShapleyEngine(men_prefs, women_prefs)
+        men_proposing.run()
+        self.man_optimal = men_proposing.wives()
+        women_proposing = GaleShapleyEngine(women_prefs, men_prefs)
+        women_proposing.run()
+        self.woman_optimal = women_proposing.husband.copy()  # Roles swapped, so this is man -> woman
+
+        self.rotations = []
+        self.predecessors = []
+        self._find_rotations(men_prefs.tolist())
+
+    def _find_rotations(self, men_prefs):
+        """Walk from the man-optimal to the woman-optimal matching, eliminating exposed rotations"""
+        n = self.n
+        men_rank, women_rank = self.men_rank.tolist(), self.women_rank.tolist()
+        wife = self.man_optimal.tolist()
+        husband = [0] * n
+        for m, w in enumerate(wife):
+            husband[w] = m
+        first_husband_rank = [women_rank[w][husband[w]] for w in range(n)]
+        final = self.woman_optimal.tolist()
+
+        # search[m] is where the hunt for the first woman after m's wife who prefers m to her
+        # husband resumes; women only ever improve, so it never has to move back
+        search = [men_rank[m][wife[m]] + 1 for m in range(n)]
+        last_rotation = [-1] * n  # Latest rotation that moved each man
+        improved_ranks = [[] for _ in range(n)]  # Per woman: negated new partner ranks, increasing
+        improved_by = [[] for _ in range(n)]  # Per woman: the rotations behind those improvements
+
+        def next_woman(m):
+            position = max(search[m], men_rank[m][wife[m]] + 1)
+            while True:
+                w = men_prefs[m][position]
+                if women_rank[w][m] < women_rank[w][husband[w]]:
+                    search[m] = position
+                    return w
+                position += 1
+
+        stack = []
+        on_stack = [False] * n
+        for start in range(n):
+            while wife[start] != final[start]:
+                if not stack:
+                    stack.append(start)
+                    on_stack[start] = True
+                following = husband[next_woman(stack[-1])]
+                if not on_stack[following]:
+                    stack.append(following)
+                    on_stack[following] = True
+                    continue
+
+                # The walk closed a cycle: the top of the stack is an exposed rotation
+                cycle = []
+                while not cycle or cycle[-1] != following:
+                    cycle.append(stack.pop())
+                    on_stack[cycle[-1]] = False
+                cycle.reverse()
+                rotation = [(m, wife[m]) for m in cycle]
+                index = len(self.rotations)
+                predecessors = set()
+
+                for i, (m, w) in enumerate(rotation):
+                    new_wife = rotation[(i + 1) % len(rotation)][1]
+                    if last_rotation[m] >= 0:
+                        predecessors.add(last_rotation[m])
+                    last_rotation[m] = index
+
+                    # Every woman m skips must already have left men she ranks below m, so
+                    # the rotation that first gave her someone better comes first
+                    for position in range(men_rank[m][w] + 1, men_rank[m][new_wife]):
+                        skipped = men_prefs[m][position]
+                        if first_husband_rank[skipped] > women_rank[skipped][m]:
+                            k = bisect.bisect_right(improved_ranks[skipped], -women_rank[skipped][m])
+                            predecessors.add(improved_by[skipped][k])
+
+                for i, (m, w) in enumerate(rotation):
+                    new_wife = rotation[(i + 1) % len(rotation)][1]
+                    wife[m] = new_wife
+                    husband[new_wife] = m
+                    improved_ranks[new_wife].append(-women_rank[new_wife][m])
+                    improved_by[new_wife].append(index)
+
+                self.rotations.append(rotation)
+                self.predecessors.append(predecessors)
+
+    def apply(self, wife, rotation):
+        """Eliminate a rotation in place"""
+        for i, (m, _) in enumerate(rotation):
+            wife[m] = rotation[(i + 1) % len(rotation)][1]
+
+    def revert(self, wife, rotation):
+        """Undo apply()"""
+        for m, w in rotation:
+            wife[m] = w
+
+    def matching(self, eliminated):
+        """Stable matching for a closed collection of rotation indices"""
+        wife = self.man_optimal.copy()
+        for r in sorted(eliminated):
+            self.apply(wife, self.rotations[r])
+        return wife
+
+    def closure(self, rotations):
+        """Smallest closed set containing the given rotations"""
+        closed = set()
+        pending = list(rotations)
+        while pending:
+            r = pending.pop()
+            if r not in closed:
+                closed.add(r)
+                pending.extend(self.predecessors[r])
+        return closed
+
+    def __iter__(self):
+        """Lazily yield every stable matching exactly once, starting with the man-optimal one.
+
+        A depth-first search over the rotations in poset order decides each
+        one in turn; a rotation can be eliminated only once all its
+        predecessors are, so every branch ends in a distinct closed set and
+        the work between consecutive matchings is O(rotations + n).
+        """
+        wife = self.man_optimal.copy()
+        eliminated = [False] * len(self.rotations)
+
+        def search(r):
+            if r == len(self.rotations):
+                yield wife.copy()
+                return
+            yield from search(r + 1)
+            if all(eliminated[p] for p in self.predecessors[r]):
+                eliminated[r] = True
+                self.apply(wife, self.rotations[r])
+                yield from search(r + 1)
+                self.revert(wife, self.rotations[r])
+                eliminated[r] = False
+
+        yield from search(0)
+
+    def costs(self, wife):
+        """(egalitarian cost, regret): total and worst partner rank over everyone, 0 = first choice"""
+        men = np.arange(self.n)
+        husband = np.empty(self.n, dtype=np.int64)
+        husband[wife] = men
+        men_ranks = self.men_rank[men, wife].astype(np.int64)
+        women_ranks = self.women_rank[men, husband].astype(np.int64)
+        return int(men_ranks.sum() + women_ranks.sum()), int(max(men_ranks.max(), women_ranks.max()))
+
+    def rotation_weight(self, r):
+        """Change in egalitarian cost from eliminating rotation r"""
+        rotation = self.rotations[r]
+        weight = 0
+        for i, (m, w) in enumerate(rotation):
+            next_man, next_wife = rotation[(i + 1) % len(rotation)]
+            weight += int(self.men_rank[m, next_wife]) - int(self.men_rank[m, w])
+            weight += int(self.women_rank[next_wife, m]) - int(self.women_rank[next_wife, next_man])
+        return weight
+
+    def egalitarian(self):
+        """Stable matching with the least total rank, as a minimum-weight closed set (min cut)"""
+        flow = nx.DiGraph()
+        flow.add_nodes_from(['source', 'sink'])
+        for r, predecessors in enumerate(self.predecessors):
+            weight = self.rotation_weight(r)
+            if weight < 0:
+                flow.add_edge('source', r, capacity=-weight)
+            elif weight > 0:
+                flow.add_edge(r, 'sink', capacity=weight)
+            for p in predecessors:
+                flow.add_edge(r, p)  # No capacity: taking r without p is never cut
+        _, (source_side, _) = nx.minimum_cut(flow, 'source', 'sink')
+        return self.matching(source_side - {'source'})
+
+    def minimum_regret(self):
+        """Stable matching minimizing the worst partner rank of anyone (Gusfield)
+
+        Men only get worse and women only better as rotations are eliminated,
+        so starting from the man-optimal matching, whenever a woman holds the
+        worst rank, the least that can be done about it is eliminating the
+        rotation that moves her and everything it depends on. Every matching
+        visited this way is forced, so the best of them is optimal.
+        """
+        moves_woman = [[] for _ in range(self.n)]  # Per woman: rotations that move her, in order
+        for r, rotation in enumerate(self.rotations):
+            for m, w in rotation:
+                moves_woman[w].append(r)
+
+        eliminated = set()
+        wife = self.man_optimal.copy()
+        best, best_regret = wife.copy(), self.n
+        while True:
+            husband = np.empty(self.n, dtype=np.int64)
+            husband[wife] = np.arange(self.n)
+            men_worst = self.men_rank[np.arange(self.n), wife].max()
+            women_ranks = self.women_rank[np.arange(self.n), husband]
+            worst = women_ranks.max()
+            if max(men_worst, worst) < best_regret:
+                best, best_regret = wife.copy(), max(men_worst, worst)
+            if worst <= men_worst:
+                return best
+
+            required = set()
+            for w in np.flatnonzero(women_ranks == worst).tolist():
+                pending = [r for r in moves_woman[w] if r not in eliminated]
+                if not pending:
+                    return best  # She already has her best stable partner
+                required.add(pending[0])
+            added = self.closure(required) - eliminated
+            for r in sorted(added):
+                self.apply(wife, self.rotations[r])
+            eliminated |= added
+
+
+def solve_random_instance(n, seed=None, parallel_rounds=False):
+    """Generate and solve a random n x n instance headlessly, printing timings"""
+    rng = np.random.default_rng(seed)
+
+    start = time.perf_counter()
+    men_prefs = random_preferences(n, rng)
+    women_prefs = random_preferences(n, rng)
+    engine = GaleShapleyEngine(men_prefs, women_prefs)
+    setup_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if parallel_rounds:
+        engine.rounds = engine.run_rounds()
+    else:
+        engine.run()
+    solve_time = time.perf_counter() - start
+
+    print(f"n = {n}: {men_prefs.size + women_prefs.size:,} preference entries ({men_prefs.dtype})")
+    print(f"Generated instance and rank matrix in {setup_time:.2f}s")
+    print(f"Solved with {engine.proposal_count:,} proposals in {engine.rounds:,} "
+          f"{'parallel ' if parallel_rounds else ''}rounds in {solve_time:.2f}s")
+
+    start = time.perf_counter()
+    blocking = engine.blocking_pairs()
+    check_time = time.perf_counter() - start
+    print(f"Stability check: {len(blocking):,} blocking pairs in {check_time:.2f}s")
+    return engine
+
+
+def summarize_lattice(n, seed=None, limit=10 ** 5):
+    """Build the rotation poset of a random n x n instance and print the special matchings"""
+    rng = np.random.default_rng(seed)
+    men_prefs = random_preferences(n, rng)
+    women_prefs = random_preferences(n, rng)
+
+    start = time.perf_counter()
+    lattice = StableMatchingLattice(men_prefs, women_prefs)
+    edges = sum(len(predecessors) for predecessors in lattice.predecessors)
+    print(f"n = {n}: {len(lattice.rotations):,} rotations, {edges:,} poset edges "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    count = sum(1 for _ in itertools.islice(lattice, limit))
+    print(f"Enumerated {count:,}{'+' if count == limit else ''} stable matchings "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    for name, find in (("Man-optimal", lambda: lattice.man_optimal),
+                       ("Woman-optimal", lambda: lattice.woman_optimal),
+                       ("Egalitarian", lattice.egalitarian),
+                       ("Minimum-regret", lattice.minimum_regret)):
+        start = time.perf_counter()
+        cost, regret = lattice.costs(find())
+        print(f"{name:>14}: total rank {cost:,}, regret {regret:,} ({time.perf_counter() - start:.2f}s)")
+    return lattice
+
+
+# Per-instance results of a batch run; ranks are 0 for a first choice
+BATCH_FIELDS = ('proposals', 'rounds', 'men_mean_rank', 'women_mean_rank', 'men_worst_rank', 'women_worst_rank')
+
+
+def instance_statistics(men_prefs, women_prefs):
+    """Solve one instance and return its BATCH_FIELDS"""
+    engine = GaleShapleyEngine(men_prefs, women_prefs)
+    proposals = engine.run()
+
+    # Each man proposed down his list until his wife, so her rank is his last pointer
+    men_ranks = engine.next_proposal - 1
+    women_ranks = engine.women_rank[np.arange(engine.n), engine.husband]
+    return (proposals, engine.rounds, men_ranks.mean(), women_ranks.mean(),
+            men_ranks.max(), women_ranks.max())
+
+
+def solve_shared_instances(shm_name, shape, dtype, start, stop):
+    """Worker-process entry point: solve instances start..stop of a shared (count, 2, n, n) block"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        instances = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        results = [instance_statistics(men_prefs, women_prefs) for men_prefs, women_prefs in instances[start:stop]]
+        del instances  # The block can't be closed while views into it exist
+        return results
+    finally:
+        shm.close()
+
+
+def run_batch(n, count, kind="uniform", seed=None, workers=None, memory_limit=256 * 2 ** 20):
+    """Solve count random n x n instances of the given kind in a process pool.
+
+    Instances are generated straight into a shared-memory block, so workers
+    read the preference matrices without pickling them; when count instances
+    don't fit in memory_limit bytes they are generated and solved in waves.
+    Returns a structured array with one row of BATCH_FIELDS per instance.
+    """
+    generate = INSTANCE_KINDS[kind]
+    rng = np.random.default_rng(seed)
+    dtype = index_dtype(n)
+    instance_bytes = 2 * n * n * dtype.itemsize
+    wave = max(1, min(count, memory_limit // instance_bytes))
+    workers = workers or multiprocessing.cpu_count()
+    chunk = max(1, -(-wave // (4 * workers)))  # A few tasks per worker keeps the pool balanced
+
+    results = np.zeros(count, dtype=[(field, np.float64) for field in BATCH_FIELDS])
+    shape = (wave, 2, n, n)
+    shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * dtype.itemsize)
+    try:
+        instances = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            for first in range(0, count, wave):
+                size = min(wave, count - first)
+                for i in range(size):
+                    generate(n, rng, out=instances[i, 0])
+                    generate(n, rng, out=instances[i, 1])
+
+                tasks = [(start, pool.submit(solve_shared_instances, shm.name, shape, dtype, start,
+                                             min(start + chunk, size)))
+                         for start in range(0, size, chunk)]
+                for start, task in tasks:
+                    rows = task.result()
+                    results[first + start:first + start + len(rows)] = rows
+        del instances
+    finally:
+        shm.close()
+        shm.unlink()
+    return results
+
+
+def summarize_batch(n, count, kind="uniform", seed=None, workers=None):
+    """Run a batch and print mean, standard deviation and range of every statistic"""
+    start = time.perf_counter()
+    results = run_batch(n, count, kind, seed, workers)
+    elapsed = time.perf_counter() - start
+
+    print(f"{count:,} {kind} instances with n = {n} in {elapsed:.2f}s ({count / elapsed:,.1f} instances/s)")
+    print(f"{'':>17} {'mean':>10} {'std':>10} {'min':>10} {'max':>10}")
+    for field in BATCH_FIELDS:
+        values = results[field]
+        print(f"{field.replace('_', ' '):>17} {values.mean():>10.2f} {values.std():>10.2f} "
+              f"{values.min():>10.2f} {values.max():>10.2f}")
+    return results
+
+
+def align_hospital_ranks(resident_lists, resident_offsets, hospital_lists, hospital_offsets, hospital_ranks,
+                         n_residents):
+    """Hospital's rank of the resident for every entry of the residents' lists, -1 where unacceptable.
+
+    Both sides are CSR lists: person i's list is lists[offsets[i]:offsets[i + 1]].
+    The two sides are joined on (hospital, resident) keys with one sort and a
+    searchsorted, so no dense hospital x resident matrix is ever built.
+    """
+    list_lengths = np.diff(resident_offsets)
+    residents = np.repeat(np.arange(len(list_lengths)), list_lengths)
+    keys = resident_lists.astype(np.int64) * n_residents + residents
+
+    hospital_keys = (np.repeat(np.arange(len(hospital_offsets) - 1), np.diff(hospital_offsets)).astype(np.int64)
+                     * n_residents + hospital_lists)
+    order = np.argsort(hospital_keys, kind='stable')
+    hospital_keys, ranks = hospital_keys[order], hospital_ranks[order]
+
+    if len(hospital_keys) == 0:
+        return np.full(len(keys), -1, dtype=np.int64)
+    found = np.minimum(np.searchsorted(hospital_keys, keys), len(hospital_keys) - 1)
+    return np.where(hospital_keys[found] == keys, ranks[found], -1).astype(np.int64)
+
+
+class HospitalsResidentsEngine:
+    """Resident-proposing Gale-Shapley for many-to-one matching with quotas.
+
+    Lists may be incomplete and contain ties. Resident r's list is
+    resident_lists[resident_offsets[r]:resident_offsets[r + 1]] with
+    resident_ranks giving each entry's rank (equal ranks are ties), and
+    hospital_ranks gives, for the same entries, the hospital's rank of the
+    resident. Pairs that either side finds unacceptable are dropped. Ties are
+    broken by list order on the residents' side and by tie_break (a resident
+    permutation, identity by default) on the hospitals' side, which yields a
+    weakly stable matching. Each hospital keeps its assignees in a heap, so a
+    full run is O(L log capacity) for L list entries.
+    """
+
+    def __init__(self, resident_lists, resident_offsets, resident_ranks, hospital_ranks, capacities,
+                 tie_break=None):
+        self.n_residents = len(resident_offsets) - 1
+        acceptable = hospital_ranks >= 0
+        residents = np.repeat(np.arange(self.n_residents), np.diff(resident_offsets))
+        lengths = np.bincount(residents[acceptable], minlength=self.n_residents)
+        self.capacities = np.asarray(capacities, dtype=np.int64)
+        self.offsets = np.concatenate(([0], np.cumsum(lengths)))
+        self.lists = resident_lists[acceptable].astype(np.int64)
+        self.resident_ranks = resident_ranks[acceptable].astype(np.int64)
+        self.hospital_ranks = hospital_ranks[acceptable].astype(np.int64)
+
+        # Strict hospital priorities: rank first, then the tie-breaking position of the resident
+        if tie_break is None:
+            tie_break = np.arange(self.n_residents)
+        residents = residents[acceptable]
+        self.priorities = self.hospital_ranks * self.n_residents + np.asarray(tie_break)[residents]
+        self.assignment = np.full(self.n_residents, -1, dtype=np.int64)
+        self.proposal_count = 0
+
+    def run(self):
+        """Match every resident; returns the resident -> hospital array (-1 if unassigned)"""
+        lists, priorities = self.lists.tolist(), self.priorities.tolist()
+        ends = self.offsets[1:].tolist()
+        next_entry = self.offsets[:-1].tolist()
+        capacities = self.capacities.tolist()
+        assigned = [[] for _ in capacities]  # Per hospital: heap of (-priority, resident), worst on top
+        free = list(range(self.n_residents))
+        proposals = 0
+
+        while free:
+            r = free.pop()
+            j = next_entry[r]
+            if j == ends[r]:
+                continue  # Rejected by every acceptable hospital
+            next_entry[r] = j + 1
+            proposals += 1
+
+            h = lists[j]
+            heap = assigned[h]
+            if len(heap) < capacities[h]:
+                heapq.heappush(heap, (-priorities[j], r))
+            elif heap and -heap[0][0] > priorities[j]:
+                free.append(heapq.heapreplace(heap, (-priorities[j], r))[1])
+            else:
+                free.append(r)
+
+        self.assignment.fill(-1)
+        for h, heap in enumerate(assigned):
+            for _, r in heap:
+                self.assignment[r] = h
+        self.next_entry = np.array(next_entry, dtype=np.int64)
+        self.proposal_count = proposals
+        return self.assignment
+
+    def blocking_pairs(self, assignment=None):
+        """(resident, hospital) pairs that block the assignment in the weak sense, as a k x 2 array.
+
+        r and h block when r strictly prefers h to their assignment and h is
+        either under quota or strictly prefers r to its worst assignee,
+        checked for every list entry at once.
+        """
+        if assignment is None:
+            assignment = self.assignment
+        residents = np.repeat(np.arange(self.n_residents), np.diff(self.offsets))
+        unranked = np.iinfo(np.int64).max
+
+        # Rank of each resident's own hospital, and each hospital's rank of its worst assignee
+        own = self.lists == assignment[residents]
+        assigned_rank = np.full(self.n_residents, unranked, dtype=np.int64)
+        assigned_rank[residents[own]] = self.resident_ranks[own]
+        worst = np.full(len(self.capacities), -1, dtype=np.int64)
+        np.maximum.at(worst, self.lists[own], self.hospital_ranks[own])
+        filled = np.bincount(self.lists[own], minlength=len(self.capacities))
+
+        hospitals = self.lists
+        blocks = ((self.resident_ranks < assigned_rank[residents])
+                  & ((filled[hospitals] < self.capacities[hospitals]) | (self.hospital_ranks < worst[hospitals])))
+        return np.column_stack((residents[blocks], hospitals[blocks]))
+
+
+def random_hospitals_residents(n_residents, n_hospitals, list_length, rng, tie_probability=0.2, grades=None):
+    """Random instance with incomplete lists and ties on both sides.
+
+    Residents list up to list_length hospitals, popular ones more often;
+    hospitals rank their applicants by a shared merit score plus noise,
+    rounded to grades levels so equal grades are ties. Capacities split the
+    residents roughly evenly. Returns the arguments of HospitalsResidentsEngine
+    (with hospital ranks aligned by align_hospital_ranks).
+    """
+    grades = grades or max(2, list_length)
+    popularity = rng.pareto(2.0, n_hospitals) + 1
+    picks = rng.choice(n_hospitals, size=(n_residents, list_length), p=popularity / popularity.sum())
+
+    # Keep the first occurrence of each hospital in a resident's list
+    order = np.argsort(picks, axis=1, kind='stable')
+    sorted_picks = np.take_along_axis(picks, order, axis=1)
+    duplicate = np.zeros_like(picks, dtype=bool)
+    np.put_along_axis(duplicate, order[:, 1:], sorted_picks[:, 1:] == sorted_picks[:, :-1], axis=1)
+    keep = ~duplicate
+    resident_lists = picks[keep]
+    resident_offsets = np.concatenate(([0], np.cumsum(keep.sum(axis=1))))
+
+    # A new rank starts unless the entry ties with the previous one
+    new_rank = rng.random(picks.shape) >= tie_probability
+    new_rank[:, 0] = False
+    resident_ranks = np.cumsum(new_rank & keep, axis=1)[keep]
+
+    # Hospitals rank their applicants in grade order; tied grades share a rank
+    residents = np.repeat(np.arange(n_residents), np.diff(resident_offsets))
+    merit = rng.random(n_residents)
+    scores = 0.7 * merit[residents] + 0.3 * rng.random(len(residents))
+    grade = (grades - 1 - np.floor(scores * grades)).astype(np.int64)
+    order = np.lexsort((grade, resident_lists))
+    hospital_lists = residents[order]
+    hospital_offsets = np.concatenate(([0], np.cumsum(np.bincount(resident_lists, minlength=n_hospitals))))
+    hospital_ranks = grade[order]
+
+    capacities = np.full(n_hospitals, n_residents // n_hospitals, dtype=np.int64)
+    capacities[:n_residents % n_hospitals] += 1
+    aligned = align_hospital_ranks(resident_lists, resident_offsets, hospital_lists, hospital_offsets,
+                                   hospital_ranks, n_residents)
+    return resident_lists, resident_offsets, resident_ranks, aligned, capacities
+
+
+def solve_hospitals_residents(n_residents, n_hospitals, list_length=10, seed=None):
+    """Generate and solve a random hospitals/residents instance headlessly, printing timings"""
+    rng = np.random.default_rng(seed)
+
+    start = time.perf_counter()
+    instance = random_hospitals_residents(n_residents, n_hospitals, list_length, rng)
+    engine = HospitalsResidentsEngine(*instance, tie_break=rng.permutation(n_residents))
+    setup_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    assignment = engine.run()
+    solve_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    blocking = engine.blocking_pairs()
+    check_time = time.perf_counter() - start
+
+    print(f"{n_residents:,} residents, {n_hospitals:,} hospitals, {len(engine.lists):,} acceptable pairs")
+    print(f"Generated instance in {setup_time:.2f}s")
+    print(f"Assigned {np.count_nonzero(assignment >= 0):,} residents with {engine.proposal_count:,} "
+          f"proposals in {solve_time:.2f}s")
+    print(f"Stability check: {len(blocking):,} blocking pairs in {check_time:.2f}s")
+    return engine
+
+
+class StableRoommatesEngine:
+    """Irving's algorithm for the stable roommates problem.
+
+    prefs is an n x (n - 1) matrix whose row p lists everyone else in p's
+    order of preference (complete lists, so n must be even for a stable
+    matching to exist). Instead of editing lists, the
+    preference table is kept as two bounds per person on a rank matrix: q is
+    still on p's list iff first[p] <= rank[p, q] <= last[p] and
+    first[q] <= rank[q, p] <= last[q]. Deleting pairs only narrows the
+    bounds, so both phases run in O(n^2) time.
+    """
+
+    def __init__(self, prefs):
+        self.n = len(prefs)
+        self.prefs = np.asarray(prefs).reshape(self.n, max(self.n - 1, 0))
+
+        # rank[p, q] is q's position in p's list; rank[p, p] = n - 1 sits past the end
+        self.rank = np.empty((self.n, self.n), dtype=index_dtype(self.n))
+        rows = np.repeat(np.arange(self.n), self.n - 1)
+        self.rank[rows, self.prefs.ravel()] = np.tile(np.arange(self.n - 1), self.n)
+        np.fill_diagonal(self.rank, self.n - 1)
+        self.partner = None
+
+    def run(self):
+        """Returns the person -> partner array, or None when no stable matching exists"""
+        prefs, rank = self.prefs.tolist(), self.rank.tolist()
+        n = self.n
+        first = [0] * n
+        last = [n - 2] * n
+
+        def present(p, q):
+            return rank[q][p] <= last[q] and first[q] <= rank[q][p]
+
+        def first_choice(p):
+            # Deleted entries never come back, so skipping them moves first[p] for good
+            while first[p] <= last[p] and not present(p, prefs[p][first[p]]):
+                first[p] += 1
+            return prefs[p][first[p]] if first[p] <= last[p] else -1
+
+        # Phase 1: everyone proposes; accepting p deletes everyone q ranks below p
+        held = [-1] * n
+        for p in range(n):
+            proposer = p
+            while proposer >= 0:
+                q = first_choice(proposer)
+                if q < 0:
+                    return None  # Rejected by everyone
+                previous = held[q]
+                held[q] = proposer
+                last[q] = rank[q][proposer]
+                proposer = previous
+
+        # Phase 2: eliminate exposed rotations until every list has one entry
+        def second_choice(p):
+            position = first[p] + 1
+            while position <= last[p] and not present(p, prefs[p][position]):
+                position += 1
+            return prefs[p][position] if position <= last[p] else -1
+
+        stack = []
+        on_stack = [False] * n
+        for start in range(n):
+            while True:
+                if not stack:
+                    q = first_choice(start)
+                    if q < 0:
+                        return None
+                    if prefs[start][last[start]] == q:
+                        break  # start's list is down to one person
+                    stack.append(start)
+                    on_stack[start] = True
+
+                p = stack[-1]
+                second = second_choice(p)
+                if second < 0:
+                    return None
+                following = prefs[second][last[second]]
+                if not on_stack[following]:
+                    stack.append(following)
+                    on_stack[following] = True
+                    continue
+
+                # x_0 .. x_k on top of the stack form a rotation: each x_i's second choice
+                # drops its current holder and keeps x_i instead
+                cycle = []
+                while not cycle or cycle[-1] != following:
+                    cycle.append(stack.pop())
+                    on_stack[cycle[-1]] = False
+                seconds = [second_choice(x) for x in cycle]
+                for x, y in zip(cycle, seconds):
+                    last[y] = rank[y][x]
+                for x in cycle:
+                    if first_choice(x) < 0:
+                        return None
+                # People left on the stack may now be down to one-entry lists
+                while stack and prefs[stack[-1]][last[stack[-1]]] == first_choice(stack[-1]):
+                    on_stack[stack.pop()] = False
+
+        self.partner = np.array([first_choice(p) for p in range(n)], dtype=np.int64)
+        return self.partner
+
+    def blocking_pairs(self, partner=None):
+        """Pairs p < q who both prefer each other to their partners, as a k x 2 array"""
+        partner = self.partner if partner is None else partner
+        everyone = np.arange(self.n)
+        prefers = self.rank < self.rank[everyone, partner][:, None]
+        blocks = np.triu(prefers & prefers.T, k=1)
+        return np.argwhere(blocks)
+
+
+def random_roommates(n, rng):
+    """n x (n - 1) matrix: each row is a random order of everyone else"""
+    scores = rng.random((n, n))
+    np.fill_diagonal(scores, np.inf)
+    return np.argsort(scores, axis=1)[:, :n - 1].astype(np.int64)
+
+
+def solve_roommates(n, seed=None):
+    """Solve a random stable roommates instance headlessly, printing timings"""
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    engine = StableRoommatesEngine(random_roommates(n, rng))
+    setup_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    partner = engine.run()
+    solve_time = time.perf_counter() - start
+
+    print(f"{n:,} roommates: set up in {setup_time:.2f}s, solved in {solve_time:.2f}s")
+    if partner is None:
+        print("No stable matching exists")
+    else:
+        print(f"Stable matching found; {len(engine.blocking_pairs()):,} blocking pairs")
+    return engine
+
+
+# Matrix view cell colors: unmatched, blocking pair, engaged
+MATRIX_COLORS = ListedColormap(['white', 'orange', 'blue'])
+
+
+class MatchingPlot:
+    """Bipartite drawing of a matching on one axes, or a man x woman matrix
+    for large instances. The artists are created once and draw() updates them
+    in place; the visualizer and headless export both draw through it."""
+
+    GRAPH_LIMIT = 40  # Larger instances are drawn as a man x woman matrix
+
+    def __init__(self, ax, men, women):
+        self.ax = ax
+        n = len(men)
+        self.men_y = np.linspace(0, 1, n)
+        self.women_y = np.linspace(0, 1, n)
+        self.ax.clear()
+
+        # Past a few dozen participants the bipartite drawing is unreadable, so show the matrix
+        self.matrix_view = n > self.GRAPH_LIMIT
+        if self.matrix_view:
+            self.matrix = np.zeros((n, n), dtype=np.uint8)
+            self.matrix_image = self.ax.imshow(self.matrix, cmap=MATRIX_COLORS, vmin=0, vmax=2,
+                                               interpolation='nearest', origin='lower')
+            self.proposal_points = self.ax.scatter([], [], s=12, c='red', marker='x', zorder=3)
+            self.ax.set_xlabel("Woman")
+            self.ax.set_ylabel("Man")
+        else:
+            node_size = min(700, 7000 / n)
+            self.ax.scatter(np.full(n, 0.3), self.men_y, s=node_size, c='skyblue', zorder=3)
+            self.ax.scatter(np.full(n, 0.7), self.women_y, s=node_size, c='lightpink', zorder=3)
+            font_size = 12 if n <= 10 else 7
+            for x, ys, names in ((0.3, self.men_y, men), (0.7, self.women_y, women)):
+                for y, name in zip(ys, names):
+                    self.ax.text(x, y, name, fontsize=font_size, ha='center', va='center', zorder=4)
+
+            # Engagements (blue solid), current proposals (red dashed) and blocking pairs (orange dotted)
+            self.engagement_lines = self.ax.add_collection(LineCollection([], colors='blue', linewidths=2))
+            self.proposal_lines = self.ax.add_collection(
+                LineCollection([], colors='red', linestyles='dashed', linewidths=2, zorder=2))
+            self.blocking_lines = self.ax.add_collection(
+                LineCollection([], colors='orange', linestyles='dotted', linewidths=1.5))
+            self.ax.set_axis_off()
+            self.ax.set_xlim(-0.1, 1.1)
+            self.ax.set_ylim(-0.1, 1.1)
+        self.title = self.ax.set_title("")
+
+    def segments(self, pairs):
+        """Line segments from each man to his woman for a k x 2 array of (man, woman) pairs"""
+        segments = np.empty((len(pairs), 2, 2))
+        segments[:, 0, 0] = 0.3
+        segments[:, 0, 1] = self.men_y[pairs[:, 0]]
+        segments[:, 1, 0] = 0.7
+        segments[:, 1, 1] = self.women_y[pairs[:, 1]]
+        return segments
+
+    def draw(self, husband, proposals, blocking, step):
+        """Show the engagements in husband (woman -> man, -1 if free), the (man, woman)
+        proposals and the k x 2 blocking pairs"""
+        women = np.flatnonzero(husband >= 0)
+        engaged = np.column_stack((husband[women], women))
+        proposals = np.array(proposals, dtype=np.int64).reshape(-1, 2)
+
+        if self.matrix_view:
+            self.matrix.fill(0)
+            self.matrix[blocking[:, 0], blocking[:, 1]] = 1
+            self.matrix[engaged[:, 0], engaged[:, 1]] = 2
+            self.matrix_image.set_data(self.matrix)
+            self.proposal_points.set_offsets(proposals[:, ::-1])  # x is the woman, y the man
+        else:
+            self.engagement_lines.set_segments(self.segments(engaged))
+            self.proposal_lines.set_segments(self.segments(proposals))
+            self.blocking_lines.set_segments(self.segments(blocking))
+
+        self.title.set_text(f"Stable Marriage Algorithm - Step {step}")
+
+
+def frame_renderer(fig, trace):
+    """Draws steps of an opened MatchingTrace onto an Agg figure, for export_trace.py"""
+    n = trace.engine.n
+    plot = MatchingPlot(fig.add_subplot(111), [f"M{i + 1}" for i in range(n)], [f"W{i + 1}" for i in range(n)])
+    no_blocking = np.empty((0, 2), dtype=np.int64)
+
+    def draw(step):
+        engine = trace.seek(step)
+        plot.draw(engine.husband, trace.proposal_pairs(step), no_blocking, step)
+        fig.canvas.draw()
+    return draw
+
+
+class VirtualTextView:
+    """Read-only text panel that only holds the rows scrolled into view.
+
+    The content is a list of sections, each a (row count, render_row) pair,
+    so rows are only formatted when they become visible. refresh() compares
+    the visible rows with what the widget shows and rewrites just the lines
+    that changed, so a step that moves one engagement edits one line.
+    """
+
+    def __init__(self, master, **text_options):
+        self.frame = ttk.Frame(master)
+        self.text = tk.Text(self.frame, wrap=tk.NONE, **text_options)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.on_scroll)
+        self.xscrollbar = ttk.Scrollbar(self.frame, orient=tk.HORIZONTAL, command=self.text.xview)
+        self.text.configure(xscrollcommand=self.xscrollbar.set)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.xscrollbar.pack(side=tk.BOTTOM, fill=tk.X)
+        self.text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.line_height = tkfont.Font(font=self.text['font']).metrics('linespace')
+        self.sections = []
+        self.starts = [0]  # First row of each section, plus the total row count
+        self.top = 0
+        self.shown = []  # Rows currently in the widget
+
+        self.text.bind('<Configure>', lambda event: self.refresh())
+        self.text.bind('<MouseWheel>', lambda event: self.scroll_rows(-event.delta // 120 or -1))
+        self.text.bind('<Button-4>', lambda event: self.scroll_rows(-3))
+        self.text.bind('<Button-5>', lambda event: self.scroll_rows(3))
+
+    def pack(self, **options):
+        self.frame.pack(**options)
+
+    def set_sections(self, sections):
+        """Replace the content; sections is a list of (row count, render_row(i)) pairs"""
+        self.sections = sections
+        self.starts = [0]
+        for count, _ in sections:
+            self.starts.append(self.starts[-1] + count)
+        self.refresh()
+
+    def row(self, index):
+        section = bisect.bisect_right(self.starts, index) - 1
+        return self.sections[section][1](index - self.starts[section])
+
+    def visible_count(self):
+        return max(1, self.text.winfo_height() // self.line_height)
+
+    def refresh(self):
+        total = self.starts[-1]
+        visible = self.visible_count()
+        self.top = max(0, min(self.top, total - visible))
+        rows = [self.row(i) for i in range(self.top, min(self.top + visible, total))]
+
+        # Rewrite only the lines that differ from what is on screen
+        for line, (old, new) in enumerate(zip(self.shown, rows), start=1):
+            if old != new:
+                self.text.delete(f"{line}.0", f"{line}.end")
+                self.text.insert(f"{line}.0", new)
+        if len(rows) > len(self.shown):
+            self.text.insert(tk.END, "".join("\n" + row for row in rows[len(self.shown):])
+                             if self.shown else "\n".join(rows))
+        elif len(rows) < len(self.shown):
+            self.text.delete(f"{len(rows)}.end" if rows else "1.0", tk.END)
+        self.shown = rows
+
+        if total:
+            self.scrollbar.set(self.top / total, (self.top + len(rows)) / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def scroll_rows(self, rows):
+        self.top += rows
+        self.refresh()
+        return "break"  # The widget itself must not scroll its few lines
+
+    def on_scroll(self, action, amount, units=None):
+        if action == tk.MOVETO:
+            self.top = int(float(amount) * self.starts[-1])
+            self.refresh()
+        elif units == tk.PAGES:
+            self.scroll_rows(int(amount) * self.visible_count())
+        else:
+            self.scroll_rows(int(amount))
+
+
+TRACE_FILETYPES = [("Algorithm traces", "*.trace"), ("All files", "*.*")]
 
 
 class StableMarriageVisualizer:
+    LATTICE_DISPLAY_LIMIT = 100  # Stable matchings listed in the Stable Matchings tab
+    LATTICE_DELAY_MS = 300  # Quiet time after a preference change before the lattice is recomputed
+
     def __init__(self, root):
         self.root = root
         self.root.title("Stable Marriage Algorithm Visualizer")
@@ -19,56 +1240,97 @@ class StableMarriageVisualizer:
         self.n_participants = 5
         self.men = [f"M{i + 1}" for i in range(self.n_participants)]
         self.women = [f"W{i + 1}" for i in range(self.n_participants)]
+        self.rng = np.random.default_rng()
+        self.parallel_rounds = False  # Step one proposal at a time, or one round of proposals
+        self.lattice_stale = True  # Stable Matchings tab doesn't show the current preferences yet
+        self.lattice_job = None
 
-        # Algorithm state variables
-        self.reset_algorithm()
+        # Animation settings
+        self.animation_speed = 1000  # ms between frames
+        self.playback = PlaybackController(self.show_step, lambda: len(self.trace), TkTimer(root, self.animate),
+                                           self.animation_speed, extend=self.extend_trace)
 
-        # Set up the main UI
+        # Set up the main UI; preferences create the engine and reset the algorithm state
         self.setup_ui()
         self.initialize_preferences()
 
-        # Animation settings
-        self.animation_speed = 1000  # ms between frames
-        self.animation_running = False
-        self.anim = None
-
     def reset_algorithm(self):
         """Reset the algorithm state"""
-        self.free_men = self.men.copy()
-        self.proposals = {m: 0 for m in self.men}
-        self.engagements = {w: None for w in self.women}
-        self.current_proposals = []  # Current proposals for visualization
-        self.step = 0
+        self.engine.reset()
+        self.current_proposals = []  # (man, woman) index pairs of the shown step, for visualization
         self.algorithm_done = False
 
-        # History of states for the previous button
-        self.history = []
-        self.save_state()  # Save initial state
-
-    def save_state(self):
-        """Save the current state for history navigation"""
-        state = {
-            'free_men': self.free_men.copy(),
-            'proposals': copy.deepcopy(self.proposals),
-            'engagements': copy.deepcopy(self.engagements),
-            'current_proposals': self.current_proposals.copy(),
-            'step': self.step,
-            'algorithm_done': self.algorithm_done,
-            'status': self.status_var.get() if hasattr(self, 'status_var') else "Ready"
-        }
-        self.history.append(state)
+        # Every proposal event so far, with sparse engine snapshots as keyframes.
+        # The engine is deterministic, so steps past the current one stay valid
+        # after going back and are replayed rather than recomputed.
+        self.trace = MatchingTrace(self.engine)
+        self.playback.rewind()
+
+    @property
+    def step(self):
+        return self.playback.position
+
+    def extend_trace(self):
+        """Make one more proposal (or round) past the end of the trace; False once every man is engaged"""
+        engine = self.trace.seek(len(self.trace) - 1)
+        event = engine.step_round() if self.parallel_rounds else engine.step()
+        if event is None:
+            return False
+        self.trace.add(event)
+        return True
+
+    def show_step(self, step):
+        """Bring the engine to step and update every display"""
+        self.trace.seek(step)
+        self.algorithm_done = not self.engine.free_men
+        self.show_latest_proposal()
+        if step:
+            self.status_var.set(self.describe_event(self.trace.proposal(step)))
+        self.update_state_display()
+        self.draw_graph()
+
+    def describe_event(self, event):
+        """Status line for a proposal event"""
+        if isinstance(event, Round):
+            return (f"Round {self.step}: {len(event.men)} men propose at once, "
+                    f"{len(event.rejected)} rejected")
+
+        m, w, rejected = event
+        man, woman = self.men[m], self.women[w]
+        if rejected < 0:
+            return f"{man} proposes to {woman} and is accepted"
+        if rejected != m:
+            return f"{man} proposes to {woman} and replaces {self.men[rejected]}"
+        return f"{man} proposes to {woman} but is rejected (she prefers {self.men[self.engine.husband[w]]})"
+
+    def show_latest_proposal(self):
+        """Point current_proposals at the event leading to the shown step"""
+        self.current_proposals = self.trace.proposal_pairs(self.step)
+
+    def on_mode_change(self):
+        """Switch between single proposals and parallel rounds; the run restarts, since a
+        trace mixing both kinds of step couldn't be replayed from keyframes"""
+        self.stop_animation()
+        self.parallel_rounds = self.round_mode_var.get()
+        self.reset_algorithm()
+        self.update_state_display()
+        self.draw_graph()
+        self.status_var.set("Parallel rounds: all free men propose each step" if self.parallel_rounds
+                            else "One proposal per step")
 
     def initialize_preferences(self):
         """Generate random preferences"""
-        # Create random preferences
-        self.men_prefs = {m: random.sample(self.women, len(self.women)) for m in self.men}
-        self.women_prefs = {w: random.sample(self.men, len(self.men)) for w in self.women}
-
-        # Create rankings for quick lookup
-        self.women_rankings = {w: {m: i for i, m in enumerate(prefs)} for w, prefs in self.women_prefs.items()}
+        # The engine works on integer indices; names are only used for display
+        self.stop_animation()
+        self.engine = GaleShapleyEngine(random_preferences(self.n_participants, self.rng),
+                                        random_preferences(self.n_participants, self.rng))
+        self.reset_algorithm()
 
-        # Update preference displays
+        # Update displays
         self.update_preference_display()
+        self.update_lattice_display()
+        self.update_state_display()
+        self.draw_graph()
 
     def setup_ui(self):
         """Set up the UI components"""
@@ -95,8 +1357,7 @@ class StableMarriageVisualizer:
         self.setup_controls()
         self.setup_preferences_display()
 
-        # Create the graph
-        self.G = nx.Graph()
+        # Lay out the participants
         self.update_graph()
 
     def setup_controls(self):
@@ -106,7 +1367,7 @@ class StableMarriageVisualizer:
         self.participants_var = tk.IntVar(value=self.n_participants)
         self.participant_slider = ttk.Scale(
             self.control_frame,
-            from_=3, to=10,
+            from_=3, to=200,
             orient=tk.HORIZONTAL,
             variable=self.participants_var,
             command=self.on_participants_change
@@ -130,6 +1391,13 @@ class StableMarriageVisualizer:
         self.btn_frame = ttk.Frame(self.control_frame)
         self.btn_frame.pack(side=tk.RIGHT, padx=10)
 
+        self.jump_var = tk.IntVar(value=0)
+        self.jump_spinbox = ttk.Spinbox(self.btn_frame, from_=0, to=10 ** 6, width=5, textvariable=self.jump_var)
+        self.jump_spinbox.pack(side=tk.LEFT, padx=2)
+
+        self.jump_btn = ttk.Button(self.btn_frame, text="Go to Step", command=self.jump_to_step)
+        self.jump_btn.pack(side=tk.LEFT, padx=2)
+
         self.previous_btn = ttk.Button(self.btn_frame, text="Previous", command=self.previous_step)
         self.previous_btn.pack(side=tk.LEFT, padx=2)
 
@@ -149,6 +1417,22 @@ class StableMarriageVisualizer:
                                         command=self.initialize_preferences)
         self.randomize_btn.pack(side=tk.LEFT, padx=2)
 
+        self.save_trace_btn = ttk.Button(self.btn_frame, text="Save Trace", command=self.save_trace)
+        self.save_trace_btn.pack(side=tk.LEFT, padx=2)
+
+        self.open_trace_btn = ttk.Button(self.btn_frame, text="Open Trace", command=self.open_trace)
+        self.open_trace_btn.pack(side=tk.LEFT, padx=2)
+
+        self.round_mode_var = tk.BooleanVar(value=self.parallel_rounds)
+        self.round_mode_check = ttk.Checkbutton(self.btn_frame, text="Parallel Rounds",
+                                                variable=self.round_mode_var, command=self.on_mode_change)
+        self.round_mode_check.pack(side=tk.LEFT, padx=2)
+
+        self.show_blocking_var = tk.BooleanVar(value=False)
+        self.blocking_check = ttk.Checkbutton(self.btn_frame, text="Show Blocking Pairs",
+                                              variable=self.show_blocking_var, command=self.draw_graph)
+        self.blocking_check.pack(side=tk.LEFT, padx=2)
+
         # Status label
         self.status_var = tk.StringVar(value="Ready")
         self.status_label = ttk.Label(self.control_frame, textvariable=self.status_var)
@@ -173,61 +1457,113 @@ class StableMarriageVisualizer:
         self.pref_notebook.add(self.state_frame, text="Current State")
 
         # Men's preferences text area
-        self.men_pref_text = scrolledtext.ScrolledText(self.men_pref_frame, width=30, height=20)
+        self.men_pref_text = VirtualTextView(self.men_pref_frame, width=30, height=20)
         self.men_pref_text.pack(fill=tk.BOTH, expand=True)
 
         # Women's preferences text area
-        self.women_pref_text = scrolledtext.ScrolledText(self.women_pref_frame, width=30, height=20)
+        self.women_pref_text = VirtualTextView(self.women_pref_frame, width=30, height=20)
         self.women_pref_text.pack(fill=tk.BOTH, expand=True)
 
         # Current state text area
-        self.state_text = scrolledtext.ScrolledText(self.state_frame, width=30, height=20)
+        self.state_text = VirtualTextView(self.state_frame, width=30, height=20)
         self.state_text.pack(fill=tk.BOTH, expand=True)
 
+        # Stable matchings tab
+        self.lattice_frame = ttk.Frame(self.pref_notebook, padding="10")
+        self.pref_notebook.add(self.lattice_frame, text="Stable Matchings")
+        self.lattice_text = scrolledtext.ScrolledText(self.lattice_frame, width=30, height=20)
+        self.lattice_text.pack(fill=tk.BOTH, expand=True)
+        self.pref_notebook.bind("<<NotebookTabChanged>>", lambda e: self.refresh_lattice_display())
+
     def update_preference_display(self):
         """Update the preference displays with current preferences"""
-        # Update men's preferences
-        self.men_pref_text.delete(1.0, tk.END)
-        for man, prefs in self.men_prefs.items():
-            self.men_pref_text.insert(tk.END, f"{man}: {' > '.join(prefs)}\n")
-
-        # Update women's preferences
-        self.women_pref_text.delete(1.0, tk.END)
-        for woman, prefs in self.women_prefs.items():
-            self.women_pref_text.insert(tk.END, f"{woman}: {' > '.join(prefs)}\n")
+        # Rows are formatted only when scrolled into view
+        men_prefs, women_prefs = self.engine.men_prefs, self.engine.women_prefs
+        self.men_pref_text.set_sections([(
+            self.n_participants,
+            lambda m: f"{self.men[m]}: {' > '.join(self.women[w] for w in men_prefs[m].tolist())}")])
+        self.women_pref_text.set_sections([(
+            self.n_participants,
+            lambda w: f"{self.women[w]}: {' > '.join(self.men[m] for m in women_prefs[w].tolist())}")])
+
+    def update_lattice_display(self):
+        """Note that the preferences changed. The rotation poset costs seconds at large n,
+        so it is only computed while the Stable Matchings tab is shown, and only once
+        the preferences stop changing (e.g. when the participant slider is released)."""
+        self.lattice_stale = True
+        if self.lattice_job is not None:
+            self.root.after_cancel(self.lattice_job)
+        self.lattice_job = self.root.after(self.LATTICE_DELAY_MS, self.refresh_lattice_display)
+
+    def refresh_lattice_display(self):
+        """List the rotations and every stable matching of the current preferences"""
+        self.lattice_job = None
+        if not self.lattice_stale or self.pref_notebook.select() != str(self.lattice_frame):
+            return
+        self.lattice_stale = False
+
+        lattice = StableMatchingLattice(self.engine.men_prefs, self.engine.women_prefs)
+        egalitarian = lattice.egalitarian().tolist()
+        minimum_regret = lattice.minimum_regret().tolist()
+
+        self.lattice_text.delete(1.0, tk.END)
+        self.lattice_text.insert(tk.END, f"Rotations: {len(lattice.rotations)}\n")
+        for r, rotation in enumerate(lattice.rotations):
+            pairs = " ".join(f"({self.men[m]}, {self.women[w]})" for m, w in rotation)
+            after = ", ".join(f"R{p + 1}" for p in sorted(lattice.predecessors[r]))
+            self.lattice_text.insert(tk.END, f"R{r + 1}: {pairs}" + (f" after {after}" if after else "") + "\n")
+
+        self.lattice_text.insert(tk.END, "\nStable Matchings (total rank / regret):\n")
+        for i, wife in enumerate(lattice):
+            if i == self.LATTICE_DISPLAY_LIMIT:
+                self.lattice_text.insert(tk.END, f"... (first {i} shown)\n")
+                break
+            cost, regret = lattice.costs(wife)
+            wife = wife.tolist()
+            tags = [label for label, special in (("egalitarian", egalitarian), ("min regret", minimum_regret))
+                    if wife == special]
+            pairs = " ".join(f"{self.men[m]}-{self.women[w]}" for m, w in enumerate(wife))
+            self.lattice_text.insert(tk.END, f"{i + 1}. {pairs}  [{cost} / {regret}]"
+                                             + (f" {', '.join(tags)}" if tags else "") + "\n")
 
     def update_state_display(self):
         """Update the current state display"""
-        self.state_text.delete(1.0, tk.END)
-
-        # Show current step
-        self.state_text.insert(tk.END, f"Step: {self.step}\n\n")
-
-        # Show free men
-        self.state_text.insert(tk.END, "Free Men:\n")
-        if self.free_men:
-            self.state_text.insert(tk.END, ", ".join(self.free_men) + "\n\n")
-        else:
-            self.state_text.insert(tk.END, "None\n\n")
-
-        # Show current proposals
-        self.state_text.insert(tk.END, "Current Proposals:\n")
-        if self.current_proposals:
-            for m, w in self.current_proposals:
-                self.state_text.insert(tk.END, f"{m} → {w}\n")
-        else:
-            self.state_text.insert(tk.END, "None\n")
-        self.state_text.insert(tk.END, "\n")
-
-        # Show engagements
-        self.state_text.insert(tk.END, "Current Engagements:\n")
-        for woman, man in self.engagements.items():
-            if man:
-                self.state_text.insert(tk.END, f"{man} ❤️ {woman}\n")
+        free_men = list(self.engine.free_men)
+        proposals = self.current_proposals
+        husband = self.engine.husband
+
+        def engagement(w):
+            m = husband[w]
+            return f"{self.men[m]} ❤️ {self.women[w]}" if m >= 0 else f"{self.women[w]}: free"
+
+        # One row per woman, so a step that changes one engagement changes one row
+        sections = [
+            (1, lambda i: f"Step: {self.step}"),
+            (1, lambda i: ""),
+            (1, lambda i: "Free Men:"),
+            (1, lambda i: ", ".join(self.men[m] for m in free_men) if free_men else "None"),
+            (1, lambda i: ""),
+            (1, lambda i: "Current Proposals:"),
+            (max(len(proposals), 1),
+             lambda i: f"{self.men[proposals[i][0]]} → {self.women[proposals[i][1]]}" if proposals else "None"),
+            (1, lambda i: ""),
+            (1, lambda i: "Current Engagements:"),
+            (self.n_participants, engagement),
+        ]
 
         # Show if algorithm is done
         if self.algorithm_done:
-            self.state_text.insert(tk.END, "\nAlgorithm has completed! Stable matching found.\n")
+            blocking = self.engine.blocking_pairs().tolist()
+            if not blocking:
+                sections.append((2, lambda i: ["", "Algorithm has completed! Stable matching found "
+                                                   "(verified: no blocking pairs)."][i]))
+            else:
+                sections.append((2, lambda i: ["", f"Algorithm has completed, but the matching has "
+                                                   f"{len(blocking)} blocking pairs:"][i]))
+                sections.append((len(blocking),
+                                 lambda i: f"({self.men[blocking[i][0]]}, {self.women[blocking[i][1]]})"))
+
+        self.state_text.set_sections(sections)
 
     def on_participants_change(self, event):
         """Handler for when number of participants changes"""
@@ -236,10 +1572,8 @@ class StableMarriageVisualizer:
             self.n_participants = new_n
             self.men = [f"M{i + 1}" for i in range(self.n_participants)]
             self.women = [f"W{i + 1}" for i in range(self.n_participants)]
-            self.reset_algorithm()
-            self.initialize_preferences()
             self.update_graph()
-            self.draw_graph()
+            self.initialize_preferences()
 
     def on_speed_change(self, event):
         """Handler for when speed slider changes"""
@@ -247,152 +1581,66 @@ class StableMarriageVisualizer:
         self.animation_speed = int(1100 - (self.speed_var.get() * 100))
 
         # Update animation if running
-        if self.animation_running and self.anim:
-            self.anim.event_source.interval = self.animation_speed
+        self.playback.set_interval(self.animation_speed)
 
     def update_graph(self):
-        """Update the graph structure when participants change"""
-        self.G.clear()
-        self.G.add_nodes_from(self.men, bipartite=0)
-        self.G.add_nodes_from(self.women, bipartite=1)
-
-        # Calculate node positions
-        self.pos = {}
-        men_y = np.linspace(0, 1, len(self.men))
-        women_y = np.linspace(0, 1, len(self.women))
-
-        for i, m in enumerate(self.men):
-            self.pos[m] = (0.3, men_y[i])
-
-        for i, w in enumerate(self.women):
-            self.pos[w] = (0.7, women_y[i])
+        """Lay out the participants and create the artists that draw_graph updates in place"""
+        self.plot = MatchingPlot(self.ax, self.men, self.women)
 
     def draw_graph(self):
-        """Draw the current state of the graph"""
-        self.ax.clear()
-
-        # Draw nodes
-        nx.draw_networkx_nodes(self.G, self.pos, nodelist=self.men, node_color='skyblue',
-                               node_size=700, ax=self.ax)
-        nx.draw_networkx_nodes(self.G, self.pos, nodelist=self.women, node_color='lightpink',
-                               node_size=700, ax=self.ax)
-
-        # Draw labels
-        nx.draw_networkx_labels(self.G, self.pos, font_size=12, ax=self.ax)
-
-        # Draw current proposals (red dashed)
-        if self.current_proposals:
-            nx.draw_networkx_edges(self.G, self.pos, edgelist=self.current_proposals,
-                                   edge_color='red', style='dashed', width=2, ax=self.ax,
-                                   arrows=True, arrowstyle='->', arrowsize=15)
-
-        # Draw engagements (blue solid)
-        engaged_edges = [(m, w) for w, m in self.engagements.items() if m]
-        if engaged_edges:
-            nx.draw_networkx_edges(self.G, self.pos, edgelist=engaged_edges,
-                                   edge_color='blue', style='solid', width=2, ax=self.ax)
-
-        # Formatting
-        self.ax.set_title(f"Stable Marriage Algorithm - Step {self.step}")
-        self.ax.set_axis_off()
-        self.ax.set_xlim(-0.1, 1.1)
-        self.ax.set_ylim(-0.1, 1.1)
-
-        # Update canvas
-        self.canvas.draw()
+        """Draw the current state of the graph by updating the existing artists"""
+        if self.show_blocking_var.get():
+            blocking = self.engine.blocking_pairs()
+        else:
+            blocking = np.empty((0, 2), dtype=np.int64)
+        self.plot.draw(self.engine.husband, self.current_proposals, blocking, self.step)
+        self.canvas.draw_idle()
 
     def gale_shapley_step(self):
         """Perform one step of the Gale-Shapley algorithm"""
-        if self.algorithm_done or not self.free_men:
-            self.algorithm_done = True
+        if not self.playback.next():
             self.status_var.set("Algorithm complete!")
             return False
-
-        # Save the current state before proceeding
-        self.save_state()
-
-        self.step += 1
-        self.current_proposals = []
-
-        # Get a free man
-        m = self.free_men.pop(0)
-
-        # Get his next preference
-        if self.proposals[m] >= len(self.women):
-            # This man has exhausted his preferences (shouldn't happen in standard algorithm)
-            self.status_var.set(f"Warning: {m} has exhausted all preferences!")
-            return True
-
-        w = self.men_prefs[m][self.proposals[m]]
-        self.proposals[m] += 1
-
-        # Add this proposal to current proposals for visualization
-        self.current_proposals.append((m, w))
-
-        # Check if woman is already engaged
-        current = self.engagements[w]
-        if current is None:
-            # Woman is free, accept proposal
-            self.engagements[w] = m
-            self.status_var.set(f"{m} proposes to {w} and is accepted")
-        else:
-            # Woman must choose between current and new proposal
-            if self.women_rankings[w][m] < self.women_rankings[w][current]:
-                # New man is preferred
-                self.engagements[w] = m
-                self.free_men.append(current)
-                self.status_var.set(f"{m} proposes to {w} and replaces {current}")
-            else:
-                # Current engagement is preferred
-                self.free_men.append(m)
-                self.status_var.set(f"{m} proposes to {w} but is rejected (she prefers {current})")
-
-        # Update the state display
-        self.update_state_display()
-
         return True
 
     def previous_step(self):
         """Go back to the previous step of the algorithm"""
-        if self.step <= 0 or len(self.history) <= 1:
+        if not self.playback.prev():
             self.status_var.set("Already at the beginning!")
             return
+        self.status_var.set(f"Went back to step {self.step}")
 
-        # Remove the current state from history
-        self.history.pop()
+    def jump_to_step(self, target=None):
+        """Move to an arbitrary step, computing the trace up to it if needed"""
+        if target is None:
+            try:
+                target = self.jump_var.get()
+            except tk.TclError:
+                self.status_var.set("Enter a step number")
+                return
+        target = max(0, target)
+        self.stop_animation()
 
-        # Load the previous state (which is now the last one in history)
-        previous_state = self.history[-1]
+        while len(self.trace) <= target and self.extend_trace():
+            pass
+        self.playback.seek(target)
 
-        # Restore state
-        self.free_men = previous_state['free_men']
-        self.proposals = previous_state['proposals']
-        self.engagements = previous_state['engagements']
-        self.current_proposals = previous_state['current_proposals']
-        self.step = previous_state['step']
-        self.algorithm_done = previous_state['algorithm_done']
-        self.status_var.set(f"Went back to step {self.step}")
-
-        # Update displays
-        self.update_state_display()
-        self.draw_graph()
+        if self.step < target:
+            self.status_var.set(f"Algorithm completes at step {self.step}")
+        else:
+            self.status_var.set(f"Jumped to step {self.step}")
 
     def step_animation(self):
         """Perform a single step of the algorithm"""
-        if not self.algorithm_done:
-            self.gale_shapley_step()
-            self.draw_graph()
-        else:
+        if self.algorithm_done:
             self.status_var.set("Algorithm already complete!")
+        else:
+            self.gale_shapley_step()
 
-    def animate(self, i):
-        """Animation function for FuncAnimation"""
-        if self.animation_running and not self.algorithm_done:
-            if self.gale_shapley_step():
-                self.draw_graph()
-            else:
-                self.stop_animation()
-        return []
+    def animate(self):
+        """Timer callback while the animation runs"""
+        if not self.gale_shapley_step():
+            self.stop_animation()
 
     def start_animation(self):
         """Start the animation"""
@@ -400,20 +1648,11 @@ class StableMarriageVisualizer:
             self.status_var.set("Algorithm already complete! Reset to start again.")
             return
 
-        self.animation_running = True
-
-        if self.anim is None:
-            self.anim = animation.FuncAnimation(
-                self.fig, self.animate, interval=self.animation_speed,
-                blit=True, repeat=False)
-        else:
-            self.anim.event_source.start()
+        self.playback.play()
 
     def stop_animation(self):
         """Stop the animation"""
-        self.animation_running = False
-        if self.anim:
-            self.anim.event_source.stop()
+        self.playback.pause()
 
     def reset_animation(self):
         """Reset the animation to the beginning"""
@@ -428,6 +1667,53 @@ class StableMarriageVisualizer:
         self.draw_graph()
         self.status_var.set("Reset complete")
 
+    def save_trace(self):
+        """Finish the run and write its whole trace to a file"""
+        path = filedialog.asksaveasfilename(defaultextension=".trace", filetypes=TRACE_FILETYPES)
+        if not path:
+            return
+        self.stop_animation()
+
+        # Saved traces are complete, so an opened one never needs extending
+        while self.extend_trace():
+            pass
+        self.trace.seek(self.step)
+        self.trace.meta = {'parallel_rounds': self.parallel_rounds}
+        try:
+            self.trace.save(path)
+        except OSError as e:
+            self.status_var.set(f"Could not save trace: {e}")
+            return
+        self.status_var.set(f"Saved {len(self.trace) - 1} steps")
+
+    def open_trace(self):
+        """Replace the instance with a saved run, read from the file as it is stepped through"""
+        path = filedialog.askopenfilename(filetypes=TRACE_FILETYPES)
+        if not path:
+            return
+        try:
+            trace = MatchingTrace.open(path)
+        except (OSError, ValueError, KeyError) as e:
+            self.status_var.set(f"Could not open trace: {e}")
+            return
+        self.stop_animation()
+
+        self.n_participants = trace.engine.n
+        self.participants_var.set(self.n_participants)
+        self.men = [f"M{i + 1}" for i in range(self.n_participants)]
+        self.women = [f"W{i + 1}" for i in range(self.n_participants)]
+        self.update_graph()
+        self.parallel_rounds = trace.meta.get('parallel_rounds', False)
+        self.round_mode_var.set(self.parallel_rounds)
+
+        self.engine = trace.engine
+        self.trace = trace
+        self.playback.rewind()
+        self.show_step(0)
+        self.update_preference_display()
+        self.update_lattice_display()
+        self.status_var.set(f"Opened {len(trace) - 1} steps")
+
     def run(self):
         """Run the application"""
         # Initial drawing
@@ -439,6 +1725,41 @@ class StableMarriageVisualizer:
 
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = StableMarriageVisualizer(root)
-    app.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Stable Marriage Algorithm Visualizer")
+    parser.add_argument("--solve", type=int, metavar="N",
+                        help="solve a random N x N instance headlessly instead of opening the GUI")
+    parser.add_argument("--seed", type=int, help="random seed for --solve and --batch")
+    parser.add_argument("--batch", type=int, metavar="COUNT",
+                        help="with --solve N, solve COUNT random N x N instances in a process pool")
+    parser.add_argument("--kind", choices=INSTANCE_KINDS, default="uniform",
+                        help="preference model for --batch")
+    parser.add_argument("--workers", type=int, help="worker processes for --batch (default: all CPUs)")
+    parser.add_argument("--rounds", action="store_true",
+                        help="with --solve, use vectorized parallel rounds instead of single proposals")
+    parser.add_argument("--residents", type=int, metavar="R",
+                        help="solve a random hospitals/residents instance with R residents")
+    parser.add_argument("--hospitals", type=int, default=100, metavar="H",
+                        help="number of hospitals for --residents (default: 100)")
+    parser.add_argument("--list-length", type=int, default=10, metavar="K",
+                        help="hospitals listed per resident for --residents (default: 10)")
+    parser.add_argument("--roommates", type=int, metavar="N",
+                        help="solve a random stable roommates instance with N people")
+    parser.add_argument("--lattice", action="store_true",
+                        help="with --solve, also build the rotation poset and report the egalitarian "
+                             "and minimum-regret matchings")
+    args = parser.parse_args()
+
+    if args.residents:
+        solve_hospitals_residents(args.residents, args.hospitals, args.list_length, args.seed)
+    elif args.roommates:
+        solve_roommates(args.roommates, args.seed)
+    elif args.solve and args.batch:
+        summarize_batch(args.solve, args.batch, args.kind, args.seed, args.workers)
+    elif args.solve:
+        solve_random_instance(args.solve, args.seed, args.rounds)
+        if args.lattice:
+            summarize_lattice(args.solve, args.seed)
+    else:
+        root = tk.Tk()
+        app = StableMarriageVisualizer(root)
+        app.run()
\ No newline at end of file
@@ -3,10 +3,1374 @@ from tkinter import ttk, messagebox
 import random
 import string
 import json
+import time
+import argparse
+import asyncio
+import queue
+import threading
+import tracemalloc
+from collections import deque, namedtuple
+from itertools import islice
 from datetime import datetime
+from algo_trace import PlaybackController, TkTimer
+
+
+class RingBuffer:
+    """Circular array: push, pop and popleft are O(1); capacity doubles when full
+    and halves when a quarter full, so copying is amortized O(1) per operation."""
+
+    name = "Ring buffer"
+    MIN_CAPACITY = 8
+
+    def __init__(self, values=()):
+        self.slots = [None] * self.MIN_CAPACITY
+        self.head = 0  # Slot of the front element
+        self.size = 0
+        self.stats = {"operations": 0, "resizes": 0, "copied": 0}
+        self.extend(values)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        slots, head, capacity = self.slots, self.head, len(self.slots)
+        for i in range(self.size):
+            yield slots[(head + i) % capacity]
+
+    def __getitem__(self, index):
+        index = range(self.size)[index]
+        return self.slots[(self.head + index) % len(self.slots)]
+
+    def capacity(self):
+        return len(self.slots)
+
+    def resize(self, capacity):
+        self.slots = list(self) + [None] * (capacity - self.size)
+        self.head = 0
+        self.stats["resizes"] += 1
+        self.stats["copied"] += self.size
+
+    def shrink(self):
+        if len(self.slots) > self.MIN_CAPACITY and self.size <= len(self.slots) // 4:
+            self.resize(len(self.slots) // 2)
+
+    def push(self, value):
+        self.stats["operations"] += 1
+        if self.size == len(self.slots):
+            self.resize(2 * len(self.slots))
+        self.slots[(self.head + self.size) % len(self.slots)] = value
+        self.size += 1
+
+    def pushleft(self, value):
+        self.stats["operations"] += 1
+        if self.size == len(self.slots):
+            self.resize(2 * len(self.slots))
+        self.head = (self.head - 1) % len(self.slots)
+        self.slots[self.head] = value
+        self.size += 1
+
+    def extend(self, values):
+        for value in values:
+            self.push(value)
+
+    def pop(self):
+        if not self.size:
+            raise IndexError("pop from empty ring buffer")
+        self.stats["operations"] += 1
+        self.size -= 1
+        slot = (self.head + self.size) % len(self.slots)
+        value, self.slots[slot] = self.slots[slot], None
+        self.shrink()
+        return value
+
+    def popleft(self):
+        if not self.size:
+            raise IndexError("pop from empty ring buffer")
+        self.stats["operations"] += 1
+        value, self.slots[self.head] = self.slots[self.head], None
+        self.head = (self.head + 1) % len(self.slots)
+        self.size -= 1
+        self.shrink()
+        return value
+
+    def clear(self):
+        self.slots = [None] * self.MIN_CAPACITY
+        self.head = 0
+        self.size = 0
+
+
+class DequeEngine:
+    """collections.deque: a linked list of 64-slot blocks, O(1) at both ends"""
+
+    name = "Deque"
+    BLOCK = 64
+
+    def __init__(self, values=()):
+        self.items = deque()
+        self.stats = {"operations": 0}
+        self.extend(values)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+    def capacity(self):
+        # CPython keeps one spare block beyond the ones in use
+        return (len(self.items) // self.BLOCK + 1) * self.BLOCK
+
+    def push(self, value):
+        self.stats["operations"] += 1
+        self.items.append(value)
+
+    def pushleft(self, value):
+        self.stats["operations"] += 1
+        self.items.appendleft(value)
+
+    def extend(self, values):
+        for value in values:
+            self.push(value)
+
+    def pop(self):
+        value = self.items.pop()
+        self.stats["operations"] += 1
+        return value
+
+    def popleft(self):
+        value = self.items.popleft()
+        self.stats["operations"] += 1
+        return value
+
+    def clear(self):
+        self.items.clear()
+
+
+class LinkedListNode:
+    __slots__ = ("value", "prev", "next")
+
+    def __init__(self, value, prev=None, next=None):
+        self.value = value
+        self.prev = prev
+        self.next = next
+
+
+class LinkedList:
+    """Doubly linked list: O(1) at both ends, one node allocation per push"""
+
+    name = "Linked list"
+
+    def __init__(self, values=()):
+        self.first = self.last = None
+        self.size = 0
+        self.stats = {"operations": 0, "allocated": 0}
+        self.extend(values)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        node = self.first
+        while node:
+            yield node.value
+            node = node.next
+
+    def __getitem__(self, index):
+        index = range(self.size)[index]
+        # Walk from whichever end is closer
+        if index < self.size // 2:
+            node = self.first
+            for _ in range(index):
+                node = node.next
+        else:
+            node = self.last
+            for _ in range(self.size - 1 - index):
+                node = node.prev
+        return node.value
+
+    def capacity(self):
+        return self.size
+
+    def push(self, value):
+        self.stats["operations"] += 1
+        self.stats["allocated"] += 1
+        node = LinkedListNode(value, prev=self.last)
+        if self.last:
+            self.last.next = node
+        else:
+            self.first = node
+        self.last = node
+        self.size += 1
+
+    def pushleft(self, value):
+        self.stats["operations"] += 1
+        self.stats["allocated"] += 1
+        node = LinkedListNode(value, next=self.first)
+        if self.first:
+            self.first.prev = node
+        else:
+            self.last = node
+        self.first = node
+        self.size += 1
+
+    def extend(self, values):
+        for value in values:
+            self.push(value)
+
+    def pop(self):
+        if not self.size:
+            raise IndexError("pop from empty linked list")
+        self.stats["operations"] += 1
+        node = self.last
+        self.last = node.prev
+        if self.last:
+            self.last.next = None
+        else:
+            self.first = None
+        self.size -= 1
+        return node.value
+
+    def popleft(self):
+        if not self.size:
+            raise IndexError("pop from empty linked list")
+        self.stats["operations"] += 1
+        node = self.first
+        self.first = node.next
+        if self.first:
+            self.first.prev = None
+        else:
+            self.last = None
+        self.size -= 1
+        return node.value
+
+    def clear(self):
+        self.first = self.last = None
+        self.size = 0
+
+
+class DynamicArray:
+    """Growable array with the front fixed at slot 0: push and pop are amortized O(1),
+    but popleft shifts every element, which is what makes it a stack, not a queue"""
+
+    name = "Dynamic array"
+    MIN_CAPACITY = 8
+
+    def __init__(self, values=()):
+        self.slots = [None] * self.MIN_CAPACITY
+        self.size = 0
+        self.stats = {"operations": 0, "resizes": 0, "copied": 0, "shifted": 0}
+        self.extend(values)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for i in range(self.size):
+            yield self.slots[i]
+
+    def __getitem__(self, index):
+        return self.slots[range(self.size)[index]]
+
+    def capacity(self):
+        return len(self.slots)
+
+    def resize(self, capacity):
+        self.slots = self.slots[:self.size] + [None] * (capacity - self.size)
+        self.stats["resizes"] += 1
+        self.stats["copied"] += self.size
+
+    def shrink(self):
+        if len(self.slots) > self.MIN_CAPACITY and self.size <= len(self.slots) // 4:
+            self.resize(len(self.slots) // 2)
+
+    def push(self, value):
+        self.stats["operations"] += 1
+        if self.size == len(self.slots):
+            self.resize(2 * len(self.slots))
+        self.slots[self.size] = value
+        self.size += 1
+
+    def pushleft(self, value):
+        self.stats["operations"] += 1
+        if self.size == len(self.slots):
+            self.resize(2 * len(self.slots))
+        self.slots[1:self.size + 1] = self.slots[:self.size]
+        self.stats["shifted"] += self.size
+        self.slots[0] = value
+        self.size += 1
+
+    def extend(self, values):
+        for value in values:
+            self.push(value)
+
+    def pop(self):
+        if not self.size:
+            raise IndexError("pop from empty array")
+        self.stats["operations"] += 1
+        self.size -= 1
+        value, self.slots[self.size] = self.slots[self.size], None
+        self.shrink()
+        return value
+
+    def popleft(self):
+        if not self.size:
+            raise IndexError("pop from empty array")
+        self.stats["operations"] += 1
+        value = self.slots[0]
+        # Slice assignment moves size - 1 references down one slot
+        self.slots[:self.size - 1] = self.slots[1:self.size]
+        self.stats["shifted"] += self.size - 1
+        self.size -= 1
+        self.slots[self.size] = None
+        self.shrink()
+        return value
+
+    def clear(self):
+        self.slots = [None] * self.MIN_CAPACITY
+        self.size = 0
+
+
+class ListEngine:
+    """Plain Python list: O(1) at the back, but popleft and pushleft move every element"""
+
+    name = "Python list"
+
+    def __init__(self, values=()):
+        self.items = []
+        self.stats = {"operations": 0, "shifted": 0}
+        self.extend(values)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+    def capacity(self):
+        return len(self.items)
+
+    def push(self, value):
+        self.stats["operations"] += 1
+        self.items.append(value)
+
+    def pushleft(self, value):
+        self.stats["operations"] += 1
+        self.stats["shifted"] += len(self.items)
+        self.items.insert(0, value)
+
+    def extend(self, values):
+        for value in values:
+            self.push(value)
+
+    def pop(self):
+        value = self.items.pop()
+        self.stats["operations"] += 1
+        return value
+
+    def popleft(self):
+        value = self.items.pop(0)
+        self.stats["operations"] += 1
+        self.stats["shifted"] += len(self.items)
+        return value
+
+    def clear(self):
+        self.items.clear()
+
+
+class TwoStackQueue:
+    """Queue from two lists: pushes go on the inbox, dequeues pop the reversed outbox.
+
+    Each element is moved from inbox to outbox at most once, so popleft is
+    amortized O(1); popping the back while the inbox is empty is O(n).
+    """
+
+    name = "Two-stack queue"
+
+    def __init__(self, values=()):
+        self.inbox = []
+        self.outbox = []  # Front of the queue is outbox[-1]
+        self.stats = {"operations": 0, "transfers": 0, "moved": 0}
+        self.extend(values)
+
+    def __len__(self):
+        return len(self.inbox) + len(self.outbox)
+
+    def __iter__(self):
+        yield from reversed(self.outbox)
+        yield from self.inbox
+
+    def __getitem__(self, index):
+        index = range(len(self))[index]
+        if index < len(self.outbox):
+            return self.outbox[-1 - index]
+        return self.inbox[index - len(self.outbox)]
+
+    def capacity(self):
+        return len(self)
+
+    def push(self, value):
+        self.stats["operations"] += 1
+        self.inbox.append(value)
+
+    def pushleft(self, value):
+        self.stats["operations"] += 1
+        self.outbox.append(value)
+
+    def extend(self, values):
+        for value in values:
+            self.push(value)
+
+    def pop(self):
+        if self.inbox:
+            value = self.inbox.pop()
+        else:
+            value = self.outbox.pop(0)
+            self.stats["moved"] += len(self.outbox)
+        self.stats["operations"] += 1
+        return value
+
+    def popleft(self):
+        if not self.outbox:
+            if not self.inbox:
+                raise IndexError("pop from empty queue")
+            self.inbox.reverse()
+            self.inbox, self.outbox = self.outbox, self.inbox
+            self.stats["transfers"] += 1
+            self.stats["moved"] += len(self.outbox)
+        self.stats["operations"] += 1
+        return self.outbox.pop()
+
+    def clear(self):
+        self.inbox.clear()
+        self.outbox.clear()
+
+
+def priority_key(value):
+    # Numeric strings order by value and ahead of any other text
+    if isinstance(value, str):
+        try:
+            return (0, float(value), value)
+        except ValueError:
+            return (1, 0.0, value)
+    return (0, value, "")
+
+
+class DaryHeap:
+    """Min-heap where node i has children d*i + 1 ... d*i + d.
+
+    push and pop are O(log_d n); a wider heap is shallower, so sift-up does fewer
+    swaps while sift-down compares up to d children per level. Entries are
+    (priority_key, value) pairs. The swaps made by the last push or pop are kept
+    in `last_swaps` so they can be animated and undone exactly.
+    """
+
+    arity = 2
+
+    def __init__(self, values=(), arity=None):
+        if arity is not None:
+            self.arity = arity
+        self.entries = [(priority_key(value), value) for value in values]
+        self.stats = {"operations": 0, "swaps": 0, "comparisons": 0}
+        self.last_swaps = []
+        # Bottom-up heapify is O(n)
+        for i in reversed(range(len(self.entries) // self.arity + 1)):
+            self.sift_down(i)
+        self.last_swaps = []
+
+    @property
+    def name(self):
+        return "Binary heap" if self.arity == 2 else f"{self.arity}-ary heap"
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        # Array order, which is level order in the tree
+        return (value for _, value in self.entries)
+
+    def __getitem__(self, index):
+        return self.entries[index][1]
+
+    def capacity(self):
+        return len(self.entries)
+
+    def parent(self, i):
+        return (i - 1) // self.arity
+
+    def swap(self, i, j):
+        entries = self.entries
+        entries[i], entries[j] = entries[j], entries[i]
+        self.last_swaps.append((i, j))
+        self.stats["swaps"] += 1
+
+    def sift_up(self, i):
+        entries = self.entries
+        while i:
+            parent = (i - 1) // self.arity
+            self.stats["comparisons"] += 1
+            if entries[i][0] >= entries[parent][0]:
+                break
+            self.swap(i, parent)
+            i = parent
+
+    def sift_down(self, i):
+        entries, size, arity = self.entries, len(self.entries), self.arity
+        while True:
+            first = arity * i + 1
+            if first >= size:
+                return
+            smallest = min(range(first, min(first + arity, size)), key=lambda child: entries[child][0])
+            self.stats["comparisons"] += min(arity, size - first)
+            if entries[smallest][0] >= entries[i][0]:
+                return
+            self.swap(i, smallest)
+            i = smallest
+
+    def push(self, value):
+        self.stats["operations"] += 1
+        self.last_swaps = []
+        self.entries.append((priority_key(value), value))
+        self.sift_up(len(self.entries) - 1)
+
+    def extend(self, values):
+        for value in values:
+            self.push(value)
+
+    def pop(self):
+        """Remove and return the minimum"""
+        if not self.entries:
+            raise IndexError("pop from empty heap")
+        self.stats["operations"] += 1
+        self.last_swaps = []
+        entries = self.entries
+        last = entries.pop()
+        if not entries:
+            return last[1]
+        top, entries[0] = entries[0], last
+        self.sift_down(0)
+        return top[1]
+
+    # A priority queue only removes the minimum, whichever end a caller asks for
+    popleft = pop
+
+    def unpush(self, swaps):
+        """Undo a push that made `swaps`"""
+        entries = self.entries
+        for i, j in reversed(swaps):
+            entries[i], entries[j] = entries[j], entries[i]
+        entries.pop()
+
+    def unpop(self, value, swaps):
+        """Undo a pop that returned `value` after making `swaps`"""
+        entries = self.entries
+        for i, j in reversed(swaps):
+            entries[i], entries[j] = entries[j], entries[i]
+        if entries:
+            entries.append(entries[0])
+            entries[0] = (priority_key(value), value)
+        else:
+            entries.append((priority_key(value), value))
+
+    def clear(self):
+        self.entries.clear()
+
+
+class BinaryHeap(DaryHeap):
+    name = "Binary heap"
+    arity = 2
+
+
+class QuaternaryHeap(DaryHeap):
+    name = "4-ary heap"
+    arity = 4
+
+
+class MonotonicQueue:
+    """Queue kept non-decreasing from front to back, as in sliding-window minimum.
+
+    A push first evicts every element at the back with a larger priority, so the
+    front is always the minimum. Each element is evicted at most once, making
+    push amortized O(1); the evicted run is kept in `last_evicted` for undo.
+    """
+
+    name = "Monotonic queue"
+
+    def __init__(self, values=()):
+        self.items = deque()
+        self.stats = {"operations": 0, "evicted": 0}
+        self.last_evicted = []
+        self.extend(values)
+        self.last_evicted = []
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return (value for _, value in self.items)
+
+    def __getitem__(self, index):
+        return self.items[index][1]
+
+    def capacity(self):
+        return len(self.items)
+
+    def push(self, value):
+        self.stats["operations"] += 1
+        key = priority_key(value)
+        evicted = []
+        while self.items and self.items[-1][0] > key:
+            evicted.append(self.items.pop()[1])
+        self.stats["evicted"] += len(evicted)
+        self.last_evicted = evicted
+        self.items.append((key, value))
+
+    def extend(self, values):
+        for value in values:
+            self.push(value)
+
+    def pop(self):
+        value = self.items.pop()[1]
+        self.stats["operations"] += 1
+        return value
+
+    def popleft(self):
+        value = self.items.popleft()[1]
+        self.stats["operations"] += 1
+        return value
+
+    def unpopleft(self, value):
+        """Undo a popleft that returned `value`.
+
+        Not a general push at the front: the value must be no larger than the
+        current front, as the one just dequeued always is.
+        """
+        key = priority_key(value)
+        assert not self.items or key <= self.items[0][0], "unpopleft would break the non-decreasing order"
+        self.items.appendleft((key, value))
+
+    def unpush(self, evicted):
+        """Undo a push that evicted `evicted` (nearest first)"""
+        self.items.pop()
+        for value in reversed(evicted):
+            self.items.append((priority_key(value), value))
+
+    def clear(self):
+        self.items.clear()
+
+
+class Lazy:
+    """Memoized suspension: a stream cell is a Lazy whose value is None (empty)
+    or a (value, next Lazy) pair, computed once on first force()"""
+
+    __slots__ = ("thunk", "value")
+
+    def __init__(self, thunk=None, value=None):
+        self.thunk = thunk
+        self.value = value
+
+    def force(self):
+        if self.thunk is not None:
+            self.value = self.thunk()
+            self.thunk = None
+        return self.value
+
+
+EMPTY_STREAM = Lazy()
+
+
+def rotate(front, rear, accumulated):
+    """Lazy front ++ reversed(rear) ++ accumulated, for a cons list rear one longer than front"""
+    def thunk():
+        cell = front.force()
+        value, rest = rear
+        if cell is None:
+            return value, accumulated
+        return cell[0], rotate(cell[1], rest, Lazy(value=(value, accumulated)))
+    return Lazy(thunk)
+
+
+class PersistentStack:
+    """Immutable cons list; push and pop return a new stack sharing every cell of the old one"""
+
+    __slots__ = ("cell", "size")
+
+    def __init__(self, cell=None, size=0):
+        self.cell = cell  # None or (top value, cell below)
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def from_top(self):
+        cell = self.cell
+        while cell:
+            yield cell[0]
+            cell = cell[1]
+
+    def __iter__(self):
+        # Bottom to top, like the other engines; the cells only link downwards
+        return reversed(list(self.from_top()))
+
+    def __getitem__(self, index):
+        depth = self.size - 1 - range(self.size)[index]
+        cell = self.cell
+        for _ in range(depth):
+            cell = cell[1]
+        return cell[0]
+
+    def push(self, value):
+        return PersistentStack((value, self.cell), self.size + 1)
+
+    def pop(self):
+        if not self.cell:
+            raise IndexError("pop from empty stack")
+        value, below = self.cell
+        return value, PersistentStack(below, self.size - 1)
+
+
+PersistentStack.EMPTY = PersistentStack()
+
+
+class RealTimeQueue:
+    """Okasaki's real-time queue: immutable with O(1) worst-case push and popleft.
+
+    The front is a lazy stream and the rear a cons list, newest first. When the
+    rear outgrows the front they are rotated into a new lazy stream, and every
+    operation forces one more cell of it through `schedule`, so no single
+    operation ever pays for the whole reversal and old versions stay valid.
+    """
+
+    __slots__ = ("front", "front_size", "rear", "rear_size", "schedule")
+
+    def __init__(self, front=EMPTY_STREAM, front_size=0, rear=None, rear_size=0, schedule=EMPTY_STREAM):
+        self.front = front
+        self.front_size = front_size
+        self.rear = rear
+        self.rear_size = rear_size
+        self.schedule = schedule
+
+    @staticmethod
+    def balanced(front, front_size, rear, rear_size, schedule):
+        cell = schedule.force()
+        if cell is not None:
+            return RealTimeQueue(front, front_size, rear, rear_size, cell[1])
+        # Schedule exhausted: the rear is one longer than the front, so rotate
+        rotated = rotate(front, rear, EMPTY_STREAM)
+        return RealTimeQueue(rotated, front_size + rear_size, None, 0, rotated)
+
+    def __len__(self):
+        return self.front_size + self.rear_size
+
+    def __iter__(self):
+        cell = self.front.force()
+        while cell:
+            yield cell[0]
+            cell = cell[1].force()
+        rear = []
+        cell = self.rear
+        while cell:
+            rear.append(cell[0])
+            cell = cell[1]
+        yield from reversed(rear)
+
+    def __getitem__(self, index):
+        index = range(len(self))[index]
+        if index < self.front_size:
+            cell = self.front.force()
+            for _ in range(index):
+                cell = cell[1].force()
+            return cell[0]
+        cell = self.rear
+        for _ in range(len(self) - 1 - index):
+            cell = cell[1]
+        return cell[0]
+
+    def push(self, value):
+        return self.balanced(self.front, self.front_size, (value, self.rear), self.rear_size + 1, self.schedule)
+
+    def popleft(self):
+        cell = self.front.force()
+        if cell is None:
+            raise IndexError("pop from empty queue")
+        value, rest = cell
+        return value, self.balanced(rest, self.front_size - 1, self.rear, self.rear_size, self.schedule)
+
+
+RealTimeQueue.EMPTY = RealTimeQueue()
+
+
+class PersistentEngine:
+    """Engine over a persistent stack or queue that keeps every version it has been.
+
+    Versions share structure, so each operation costs O(1) memory no matter how
+    many versions exist, and checkout() jumps to any of them in O(1). Operations
+    after a checkout branch off that version; `versions` records them all in
+    the order they were made.
+    """
+
+    def __init__(self, values=(), kind="stack"):
+        self.kind = kind
+        self.current = PersistentStack.EMPTY if kind == "stack" else RealTimeQueue.EMPTY
+        self.versions = [self.current]
+        self.version = 0
+        self.stats = {"operations": 0, "versions": 1}
+        self.extend(values)
+
+    @property
+    def name(self):
+        return f"Persistent {self.kind}"
+
+    def __len__(self):
+        return len(self.current)
+
+    def __iter__(self):
+        return iter(self.current)
+
+    def __getitem__(self, index):
+        return self.current[index]
+
+    def capacity(self):
+        return len(self.current)
+
+    def commit(self, structure):
+        self.current = structure
+        self.versions.append(structure)
+        self.version = len(self.versions) - 1
+        self.stats["operations"] += 1
+        self.stats["versions"] = len(self.versions)
+
+    def checkout(self, version):
+        self.current = self.versions[version]
+        self.version = version
+
+    def push(self, value):
+        self.commit(self.current.push(value))
+
+    def extend(self, values):
+        for value in values:
+            self.push(value)
+
+    def pop(self):
+        value, rest = self.current.pop()
+        self.commit(rest)
+        return value
+
+    def popleft(self):
+        value, rest = self.current.popleft()
+        self.commit(rest)
+        return value
+
+    def clear(self):
+        self.commit(self.versions[0])
+
+
+# Every engine holds the sequence front to back and supports push/pop at the back
+# and pushleft/popleft at the front
+ENGINES = {engine.name: engine for engine in (RingBuffer, DequeEngine, LinkedList, DynamicArray,
+                                              ListEngine, TwoStackQueue)}
+
+# Priority queues run the same benchmark workloads, removing the minimum
+BENCHMARK_ENGINES = {**ENGINES, BinaryHeap.name: BinaryHeap, QuaternaryHeap.name: QuaternaryHeap}
+
+
+def format_engine_stats(engine):
+    counts = ", ".join(f"{key} {value:,}" for key, value in engine.stats.items())
+    return f"{engine.name}: capacity {engine.capacity():,}, {counts}"
+
+
+def stress_test(engine_class, operations, seed=None):
+    """Run a random walk of pushes and removals on a fresh engine.
+
+    Stacks and queues share the engine, so removals alternate between the back
+    and the front. Returns (engine, seconds).
+    """
+    rng = random.Random(seed)
+    engine = engine_class()
+    choices = [rng.random() for _ in range(operations)]
+    start = time.perf_counter()
+    for i, choice in enumerate(choices):
+        if choice < 0.5 or not len(engine):
+            engine.push(i)
+        elif i & 1:
+            engine.pop()
+        else:
+            engine.popleft()
+    return engine, time.perf_counter() - start
+
+
+# Benchmark workloads: each returns (prefill, ops) for a run of `operations`
+# operations, where ops is a bytearray of PUSH/REMOVE codes that never removes
+# from an empty structure.
+PUSH, REMOVE = 0, 1
+
+
+def random_ops(operations, push_probability, prefill, rng):
+    ops = bytearray(operations)
+    size = prefill
+    for i in range(operations):
+        if size and rng.random() >= push_probability:
+            ops[i] = REMOVE
+            size -= 1
+        else:
+            size += 1
+    return prefill, ops
+
+
+def push_heavy_workload(operations, rng):
+    return random_ops(operations, 0.9, 0, rng)
+
+
+def pop_heavy_workload(operations, rng):
+    return random_ops(operations, 0.2, operations * 3 // 5, rng)
+
+
+def mixed_workload(operations, rng):
+    return random_ops(operations, 0.5, 0, rng)
+
+
+def burst_workload(operations, rng, burst=1000):
+    ops = bytearray(operations)
+    for start in range(burst, operations, 2 * burst):
+        ops[start:start + burst] = bytes([REMOVE]) * len(ops[start:start + burst])
+    return 0, ops
+
+
+def fifo_workload(operations, rng, depth=1000):
+    ops = bytearray(operations)
+    ops[1::2] = bytes([REMOVE]) * len(ops[1::2])
+    return depth, ops
+
+
+WORKLOADS = {
+    "push-heavy": push_heavy_workload,
+    "pop-heavy": pop_heavy_workload,
+    "mixed": mixed_workload,
+    "burst": burst_workload,
+    "fifo": fifo_workload,
+}
+
+BenchmarkResult = namedtuple("BenchmarkResult", "engine workload operations ops_per_sec p50 p90 p99 worst bytes_per_element")
+
+
+def bytes_per_element(engine_class, count=100000):
+    """Container overhead per element, measured with tracemalloc.
+
+    Every slot holds the same object, so only the structure itself is counted.
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        engine = engine_class()
+        for _ in range(count):
+            engine.push(0)
+        return (tracemalloc.get_traced_memory()[0] - before) / count
+    finally:
+        tracemalloc.stop()
+
+
+BENCHMARK_CHUNK = 1 << 14  # Ops between checks of a benchmark's cancel event
+
+
+def run_benchmark(engine_class, workload, operations=100000, mode="queue", seed=0, cancel=None):
+    """Time one workload on one engine.
+
+    The throughput pass runs the ops back to back; a second pass times every op
+    individually for latency percentiles (in nanoseconds), since per-op timers
+    would otherwise skew ops/sec. `mode` picks which end REMOVE takes from; the
+    fifo workload always dequeues. Both passes check the `cancel` event every
+    BENCHMARK_CHUNK ops and return None once it is set, since engines with O(n)
+    front removal can take minutes on large runs.
+    """
+    prefill, ops = WORKLOADS[workload](operations, random.Random(seed))
+    if workload == "fifo":
+        mode = "queue"
+
+    def cancelled():
+        return cancel is not None and cancel.is_set()
+
+    engine = engine_class(range(prefill))
+    push, remove = engine.push, engine.popleft if mode == "queue" else engine.pop
+    elapsed = 0.0
+    for base in range(0, len(ops), BENCHMARK_CHUNK):
+        if cancelled():
+            return None
+        start = time.perf_counter()
+        for i, op in enumerate(ops[base:base + BENCHMARK_CHUNK], base):
+            if op:
+                remove()
+            else:
+                push(i)
+        elapsed += time.perf_counter() - start
+
+    engine = engine_class(range(prefill))
+    push, remove = engine.push, engine.popleft if mode == "queue" else engine.pop
+    clock = time.perf_counter_ns
+    latencies = [0] * len(ops)
+    for base in range(0, len(ops), BENCHMARK_CHUNK):
+        if cancelled():
+            return None
+        for i, op in enumerate(ops[base:base + BENCHMARK_CHUNK], base):
+            tick = clock()
+            if op:
+                remove()
+            else:
+                push(i)
+            latencies[i] = clock() - tick
+    latencies.sort()
+
+    def percentile(q):
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    return BenchmarkResult(engine_class.name, workload, operations,
+                           operations / elapsed if elapsed else float("inf"),
+                           percentile(0.5), percentile(0.9), percentile(0.99), latencies[-1],
+                           bytes_per_element(engine_class, min(operations, 100000)))
+
+
+def run_benchmarks(engine_names=None, workloads=None, operations=100000, mode="queue", seed=0):
+    results = []
+    for workload in workloads or WORKLOADS:
+        for name in engine_names or BENCHMARK_ENGINES:
+            results.append(run_benchmark(BENCHMARK_ENGINES[name], workload, operations, mode, seed))
+    return results
+
+
+def print_benchmarks(results):
+    print(f"{'workload':<11} {'engine':<16} {'ops/s':>12} {'p50 ns':>8} {'p90 ns':>8} "
+          f"{'p99 ns':>8} {'max ns':>10} {'B/elem':>7}")
+    for result in results:
+        print(f"{result.workload:<11} {result.engine:<16} {result.ops_per_sec:>12,.0f} {result.p50:>8,} "
+              f"{result.p90:>8,} {result.p99:>8,} {result.worst:>10,} {result.bytes_per_element:>7.1f}")
+
+
+# A logged operation. push/pushleft/pop/popleft carry the single value moved, so
+# undo is its inverse and entries stay constant size; replace carries the
+# (old, new) contents for bulk changes such as randomize. Heap and monotonic
+# queue operations carry (value, trace), where the trace is the swaps or
+# evictions the operation made, so they can be undone exactly. On a
+# PersistentEngine every operation is logged as version (before, after), and
+# travel is the same for a jump made with the version slider.
+Command = namedtuple("Command", "op value")
+
+INVERSE_OPS = {"push": "pop", "pushleft": "popleft", "pop": "push", "popleft": "pushleft"}
+TRACED_OPS = {"heappush", "heappop", "monopush"}
+
+
+def command_value(command):
+    return command.value[0] if command.op in TRACED_OPS else command.value
+
+
+def apply_command(engine, command, inverse=False):
+    if command.op in ("version", "travel"):
+        engine.checkout(command.value[0] if inverse else command.value[1])
+    elif command.op == "replace":
+        engine.clear()
+        engine.extend(command.value[0] if inverse else command.value[1])
+    elif command.op in TRACED_OPS:
+        value, trace = command.value
+        if not inverse:
+            engine.pop() if command.op == "heappop" else engine.push(value)
+        elif command.op == "heappop":
+            engine.unpop(value, trace)
+        else:
+            engine.unpush(trace)
+    elif inverse and command.op == "popleft" and isinstance(engine, MonotonicQueue):
+        # A monotonic queue has no general pushleft; only a dequeue can be undone
+        engine.unpopleft(command.value)
+    else:
+        op = INVERSE_OPS[command.op] if inverse else command.op
+        if op in ("push", "pushleft"):
+            getattr(engine, op)(command.value)
+        else:
+            getattr(engine, op)()
+
+
+class UndoLog:
+    """Linear undo/redo history of Commands, capped at `limit` entries.
+
+    `index` counts the applied entries; those after it are the redo tail. When
+    the log outgrows its cap the older half is compacted first (a push undone
+    by the pop right after it is dropped, and consecutive replaces merge), and
+    only then are the oldest entries discarded.
+    """
+
+    def __init__(self, limit=1000):
+        self.entries = deque()
+        self.index = 0
+        self.limit = limit
+
+    def __len__(self):
+        return len(self.entries)
+
+    def can_undo(self):
+        return self.index > 0
+
+    def can_redo(self):
+        return self.index < len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+        self.index = 0
+
+    def record(self, command):
+        while len(self.entries) > self.index:
+            self.entries.pop()
+        self.entries.append(command)
+        self.index += 1
+        if len(self.entries) > self.limit:
+            self.trim()
+
+    def amend(self, command):
+        """Replace the newest entry, e.g. to fold a slider drag into one step"""
+        self.entries[self.index - 1] = command
+
+    def undo(self):
+        self.index -= 1
+        return self.entries[self.index]
+
+    def redo(self):
+        self.index += 1
+        return self.entries[self.index - 1]
+
+    def trim(self):
+        self.compact(len(self.entries) - self.limit // 2)
+        # Applied entries go oldest first; the redo tail is only cut when it
+        # alone is longer than the limit
+        while len(self.entries) > self.limit and self.index > 0:
+            self.entries.popleft()
+            self.index -= 1
+        while len(self.entries) > self.limit:
+            self.entries.pop()
+
+    def compact(self, count):
+        # Only the oldest `count` entries are touched so recent steps stay exact
+        count = min(count, self.index)
+        kept = []
+        for _ in range(count):
+            command = self.entries.popleft()
+            previous = kept[-1] if kept else None
+            if (previous and previous.op == "push" and command.op == "pop"
+                    and previous.value == command.value):
+                kept.pop()
+            elif previous and previous.op == "replace" and command.op == "replace":
+                kept[-1] = Command("replace", (previous.value[0], command.value[1]))
+            else:
+                kept.append(command)
+        self.entries.extendleft(reversed(kept))
+        self.index -= count - len(kept)
+
+
+class SimulationStats:
+    """Counters shared between the simulation's workers and the UI thread"""
+
+    def __init__(self, capacity, samples=2000):
+        self.lock = threading.Lock()
+        self.capacity = capacity
+        self.produced = self.consumed = self.blocked = 0
+        self.put_wait = 0.0  # Seconds producers spent blocked on a full queue
+        self.waits = deque(maxlen=samples)  # Seconds from put to get, most recent items
+        self.occupancy = deque(maxlen=300)  # (seconds since start, queue size)
+        self.start = time.perf_counter()
+
+    def record_put(self, wait, blocked):
+        with self.lock:
+            self.produced += 1
+            if blocked:
+                self.blocked += 1
+                self.put_wait += wait
+
+    def record_get(self, wait):
+        with self.lock:
+            self.consumed += 1
+            self.waits.append(wait)
+
+    def sample(self, size):
+        with self.lock:
+            self.occupancy.append((time.perf_counter() - self.start, size))
+
+    def snapshot(self):
+        with self.lock:
+            elapsed = time.perf_counter() - self.start
+            waits = sorted(self.waits)
+            return {
+                "elapsed": elapsed,
+                "produced": self.produced,
+                "consumed": self.consumed,
+                "throughput": self.consumed / elapsed if elapsed else 0.0,
+                "mean_wait": sum(waits) / len(waits) if waits else 0.0,
+                "p95_wait": waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+                "blocked": self.blocked / self.produced if self.produced else 0.0,
+                "mean_put_wait": self.put_wait / self.blocked if self.blocked else 0.0,
+                "occupancy": list(self.occupancy),
+            }
+
+
+class ProducerConsumerSimulation:
+    """Producers put items into a bounded queue at `rate` items/s each (Poisson
+    arrivals); consumers take them and hold each one for an exponentially
+    distributed `service_time` seconds. A full queue blocks producers, which is
+    the backpressure the statistics measure.
+
+    Subclasses run the workers either as asyncio tasks or as threads; both run
+    off the Tk thread and are polled through `stats.snapshot()`.
+    """
+
+    SAMPLE_INTERVAL = 0.02
+
+    def __init__(self, capacity, producers=2, consumers=2, rate=50.0, service_time=0.02, seed=None):
+        self.capacity = max(1, capacity)
+        self.producers = producers
+        self.consumers = consumers
+        self.rate = rate
+        self.service_time = service_time
+        self.seed = seed
+        self.stats = SimulationStats(self.capacity)
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def rng(self, worker):
+        return random.Random(None if self.seed is None else self.seed * 1000 + worker)
+
+    def start(self, duration=None):
+        self.stats = SimulationStats(self.capacity)
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.run, args=(duration,), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def join(self):
+        if self.thread:
+            self.thread.join()
+
+    def run(self, duration):
+        raise NotImplementedError
+
+
+class AsyncProducerConsumer(ProducerConsumerSimulation):
+    """Workers are asyncio tasks sharing an asyncio.Queue on a private event loop"""
+
+    name = "asyncio"
+
+    def run(self, duration):
+        asyncio.run(self.main(duration))
+
+    async def produce(self, channel, rng):
+        while True:
+            await asyncio.sleep(rng.expovariate(self.rate))
+            tick = time.perf_counter()
+            blocked = channel.full()
+            await channel.put(tick)
+            self.stats.record_put(time.perf_counter() - tick, blocked)
+
+    async def consume(self, channel, rng):
+        while True:
+            queued_at = await channel.get()
+            self.stats.record_get(time.perf_counter() - queued_at)
+            await asyncio.sleep(rng.expovariate(1 / self.service_time))
+
+    async def sample(self, channel):
+        while True:
+            self.stats.sample(channel.qsize())
+            await asyncio.sleep(self.SAMPLE_INTERVAL)
+
+    async def main(self, duration):
+        channel = asyncio.Queue(maxsize=self.capacity)
+        tasks = [asyncio.create_task(self.produce(channel, self.rng(i))) for i in range(self.producers)]
+        tasks += [asyncio.create_task(self.consume(channel, self.rng(self.producers + i)))
+                  for i in range(self.consumers)]
+        tasks.append(asyncio.create_task(self.sample(channel)))
+        deadline = None if duration is None else time.perf_counter() + duration
+        while not self.stopping.is_set() and (deadline is None or time.perf_counter() < deadline):
+            await asyncio.sleep(0.05)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class ThreadedProducerConsumer(ProducerConsumerSimulation):
+    """Workers are OS threads sharing a thread-safe queue.Queue"""
+
+    name = "threads"
+
+    def produce(self, channel, rng):
+        while not self.stopping.wait(rng.expovariate(self.rate)):
+            tick = time.perf_counter()
+            blocked = channel.full()
+            while not self.stopping.is_set():
+                try:
+                    channel.put(tick, timeout=0.1)
+                except queue.Full:
+                    continue
+                self.stats.record_put(time.perf_counter() - tick, blocked)
+                break
+
+    def consume(self, channel, rng):
+        while not self.stopping.is_set():
+            try:
+                queued_at = channel.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            self.stats.record_get(time.perf_counter() - queued_at)
+            self.stopping.wait(rng.expovariate(1 / self.service_time))
+
+    def run(self, duration):
+        channel = queue.Queue(maxsize=self.capacity)
+        workers = [threading.Thread(target=self.produce, args=(channel, self.rng(i)), daemon=True)
+                   for i in range(self.producers)]
+        workers += [threading.Thread(target=self.consume, args=(channel, self.rng(self.producers + i)), daemon=True)
+                    for i in range(self.consumers)]
+        for worker in workers:
+            worker.start()
+        deadline = None if duration is None else time.perf_counter() + duration
+        while not self.stopping.wait(self.SAMPLE_INTERVAL):
+            self.stats.sample(channel.qsize())
+            if deadline is not None and time.perf_counter() >= deadline:
+                self.stopping.set()
+        for worker in workers:
+            worker.join()
+
+
+SIMULATIONS = {simulation.name: simulation for simulation in (AsyncProducerConsumer, ThreadedProducerConsumer)}
+
+
+def simulate_capacities(capacities, variant="asyncio", duration=2.0, producers=2, consumers=2, rate=50.0,
+                        service_time=0.02, seed=None):
+    """Run the simulation once per capacity and print how capacity trades latency for blocking"""
+    print(f"{variant}: {producers} producers at {rate:g}/s, {consumers} consumers at "
+          f"{service_time * 1000:g} ms, {duration:g}s per run")
+    print(f"{'capacity':>8} {'items/s':>9} {'mean wait':>10} {'p95 wait':>9} {'blocked':>8} {'put wait':>9}")
+    results = []
+    for capacity in capacities:
+        simulation = SIMULATIONS[variant](capacity, producers, consumers, rate, service_time, seed)
+        simulation.start(duration)
+        simulation.join()
+        stats = simulation.stats.snapshot()
+        results.append(stats)
+        print(f"{capacity:>8} {stats['throughput']:>9.1f} {stats['mean_wait'] * 1000:>8.1f}ms "
+              f"{stats['p95_wait'] * 1000:>7.1f}ms {stats['blocked']:>8.1%} {stats['mean_put_wait'] * 1000:>7.1f}ms")
+    return results
 
 
 class StackQueueVisualizer:
+    PREVIEW_LIMIT = 50  # Elements listed in the stats panel before truncating
+    # Theme color used by each mode; heaps are drawn as trees, the rest as rows
+    MODE_COLORS = {"stack": "stack", "queue": "queue", "deque": "queue",
+                   "heap": "stack", "d-ary heap": "stack", "monotonic queue": "queue"}
+    HEAP_MODES = ("heap", "d-ary heap")
+    LOG_CAPACITY = 500  # Log entries kept, in memory and in the log panel
+    LOG_FLUSH_MS = 50  # Log entries are written to the panel at most this often
+
     def __init__(self, root):
         self.root = root
         self.root.title("Stack Queue Visualizer")
@@ -15,16 +1379,45 @@ class StackQueueVisualizer:
 
         # App state
         self.data_structure = tk.StringVar(value="stack")
-        self.elements = []
+        self.engine_name = tk.StringVar(value=RingBuffer.name)
+        self.elements = RingBuffer()
+        self.stress_operations = tk.IntVar(value=1000000)
+        self.stress_running = False
+        self.benchmark_workload = tk.StringVar(value="all")
+        self.benchmark_mode = tk.StringVar(value="queue")
+        self.benchmark_operations = tk.IntVar(value=20000)
+        self.benchmark_results = []
+        self.benchmark_queue = []
+        self.benchmark_cancel = None  # Set to stop the benchmark in progress
+        self.simulation = None
+        self.simulation_variant = tk.StringVar(value="asyncio")
+        self.simulation_producers = tk.IntVar(value=2)
+        self.simulation_consumers = tk.IntVar(value=2)
+        self.simulation_rate = tk.DoubleVar(value=50.0)
+        self.simulation_service_ms = tk.DoubleVar(value=20.0)
         self.animating = False
         self.highlighted_index = None
-        self.history = []
-        self.history_index = -1
+        self.view_offset = 0  # Elements scrolled past from the top of the stack / front of the queue
+        self.element_items = []  # Reusable (rectangle, value text, index text) canvas items
+        self.frame_items = None  # Fixed labels: empty message, start marker, end marker
+        self.heap_arity = tk.IntVar(value=4)
+        self.persistent = tk.BooleanVar(value=False)
+        self.heap_items = []  # Reusable (edge line, node oval, node text) canvas items
+        self.heap_swaps = []  # Swaps of the heap operation being animated
+        self.heap_step = 0  # Swaps of heap_swaps already shown
+        self.history_limit = tk.IntVar(value=1000)
+        self.history = UndoLog(self.history_limit.get())
+        # Undo and redo move a playback cursor over the history; step k is the
+        # state after the k oldest entries, and Replay plays them back
+        self.playback = PlaybackController(self.show_history_step, lambda: len(self.history) + 1,
+                                           TkTimer(root, self.replay_step))
         self.animation_speed = tk.IntVar(value=50)
         self.max_elements = tk.IntVar(value=10)
         self.theme = tk.StringVar(value="light")
         self.animation_enabled = tk.BooleanVar(value=True)
-        self.operation_log = []
+        self.operation_log = deque(maxlen=self.LOG_CAPACITY)
+        self.pending_log = deque(maxlen=self.LOG_CAPACITY)  # Entries not yet in log_display
+        self.log_flush_job = None
 
         # Color themes
         self.themes = {
@@ -112,6 +1505,18 @@ class StackQueueVisualizer:
         )
         queue_button.pack(side=tk.LEFT)
 
+        for mode, label in (("deque", "Deque"), ("heap", "Heap"), ("d-ary heap", "d-ary Heap"),
+                            ("monotonic queue", "Monotonic")):
+            active = self.data_structure.get() == mode
+            tk.Button(
+                toggle_frame,
+                text=label,
+                command=lambda mode=mode: self.toggle_data_structure(mode),
+                bg=self.themes[self.theme.get()][self.MODE_COLORS[mode] + "_active"] if active else self.themes[self.theme.get()]["button"],
+                fg="white" if active else self.themes[self.theme.get()]["text"],
+                relief=tk.RAISED if active else tk.FLAT
+            ).pack(side=tk.LEFT)
+
         # Settings button
         settings_button = tk.Button(
             toggle_frame,
@@ -132,6 +1537,26 @@ class StackQueueVisualizer:
         )
         help_button.pack(side=tk.LEFT, padx=5)
 
+        # Benchmark button
+        benchmark_button = tk.Button(
+            toggle_frame,
+            text="📊",
+            command=self.open_benchmark,
+            bg=self.themes[self.theme.get()]["background"],
+            fg=self.themes[self.theme.get()]["text"]
+        )
+        benchmark_button.pack(side=tk.LEFT, padx=5)
+
+        # Producer/consumer simulation button
+        simulation_button = tk.Button(
+            toggle_frame,
+            text="⏱",
+            command=self.open_simulation,
+            bg=self.themes[self.theme.get()]["background"],
+            fg=self.themes[self.theme.get()]["text"]
+        )
+        simulation_button.pack(side=tk.LEFT, padx=5)
+
         # Settings panel (initially hidden)
         self.settings_frame = tk.Frame(self.root, bg=self.themes[self.theme.get()]["card"], bd=1, relief=tk.SOLID)
         # Will be shown when settings button is clicked
@@ -175,6 +1600,25 @@ class StackQueueVisualizer:
         )
         remove_button.pack(side=tk.LEFT, padx=2)
 
+        # Front/back buttons, shown only in deque mode
+        self.deque_frame = tk.Frame(input_frame, bg=self.themes[self.theme.get()]["background"])
+
+        tk.Button(
+            self.deque_frame,
+            text="Push Front",
+            command=lambda: self.add_element(front=True),
+            bg="#10B981",  # Green
+            fg="white"
+        ).pack(side=tk.LEFT, padx=2)
+
+        tk.Button(
+            self.deque_frame,
+            text="Pop Back",
+            command=lambda: self.remove_element(back=True),
+            bg="#EF4444",  # Red
+            fg="white"
+        ).pack(side=tk.LEFT, padx=2)
+
         # History and utility buttons
         button_frame = tk.Frame(controls_frame, bg=self.themes[self.theme.get()]["background"])
         button_frame.pack(side=tk.RIGHT)
@@ -197,6 +1641,15 @@ class StackQueueVisualizer:
         )
         redo_button.pack(side=tk.LEFT, padx=2)
 
+        self.replay_button = tk.Button(
+            button_frame,
+            text="Replay",
+            command=self.toggle_replay,
+            bg="#6B7280",  # Gray
+            fg="white"
+        )
+        self.replay_button.pack(side=tk.LEFT, padx=2)
+
         reset_button = tk.Button(
             button_frame,
             text="🔄",
@@ -233,6 +1686,22 @@ class StackQueueVisualizer:
         )
         self.viz_frame.grid(row=2, column=0, sticky="nsew", padx=10, pady=10)
 
+        # Scrollbar over element positions; only the visible window is drawn
+        scroll_frame = tk.Frame(self.viz_frame, bg=self.themes[self.theme.get()]["card"])
+        scroll_frame.pack(side=tk.RIGHT, fill=tk.Y)
+
+        tk.Button(
+            scroll_frame,
+            text="⤒",
+            command=self.scroll_to_top,
+            bg="#6B7280",  # Gray
+            fg="white",
+            bd=0
+        ).pack(side=tk.TOP, fill=tk.X)
+
+        self.scrollbar = tk.Scrollbar(scroll_frame, command=self.scroll_view)
+        self.scrollbar.pack(side=tk.TOP, fill=tk.Y, expand=True)
+
         # Canvas for drawing elements
         self.canvas = tk.Canvas(
             self.viz_frame,
@@ -240,6 +1709,10 @@ class StackQueueVisualizer:
             highlightthickness=0
         )
         self.canvas.pack(fill=tk.BOTH, expand=True)
+        self.canvas.bind("<Configure>", lambda e: self.render_visualization())
+        self.canvas.bind("<MouseWheel>", lambda e: self.scroll_view("scroll", -1 if e.delta > 0 else 1, "units"))
+        self.canvas.bind("<Button-4>", lambda e: self.scroll_view("scroll", -1, "units"))
+        self.canvas.bind("<Button-5>", lambda e: self.scroll_view("scroll", 1, "units"))
 
         # Stats and log frame
         stats_log_frame = tk.Frame(self.root, bg=self.themes[self.theme.get()]["background"])
@@ -294,6 +1767,19 @@ class StackQueueVisualizer:
         )
         self.structure_stats_label.pack(anchor="w")
 
+        # Time travel over a persistent engine's versions, packed only when one is active
+        self.version_scale = tk.Scale(
+            stats_left,
+            label="Version",
+            from_=0,
+            to=0,
+            orient=tk.HORIZONTAL,
+            command=lambda value: self.time_travel(int(value)),
+            bg=self.themes[self.theme.get()]["card"],
+            fg=self.themes[self.theme.get()]["text"],
+            highlightthickness=0
+        )
+
         # Right side stats
         stats_right = tk.Frame(stats_content_frame, bg=self.themes[self.theme.get()]["card"])
         stats_right.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
@@ -444,17 +1930,14 @@ class StackQueueVisualizer:
             fg=self.themes[self.theme.get()]["text"]
         ).pack(side=tk.LEFT)
 
-        max_scale = tk.Scale(
+        max_spinbox = tk.Spinbox(
             max_elements_frame,
-            from_=5,
-            to=50,
-            orient=tk.HORIZONTAL,
-            variable=self.max_elements,
-            bg=self.themes[self.theme.get()]["card"],
-            fg=self.themes[self.theme.get()]["text"],
-            highlightthickness=0
+            values=(5, 10, 20, 50, 100, 1000, 10000, 100000),
+            textvariable=self.max_elements,
+            command=self.update_ui,
+            width=8
         )
-        max_scale.pack(side=tk.LEFT)
+        max_spinbox.pack(side=tk.LEFT, padx=5)
 
         # Animation speed
         speed_frame = tk.Frame(settings_content, bg=self.themes[self.theme.get()]["card"])
@@ -495,6 +1978,423 @@ class StackQueueVisualizer:
         )
         animation_check.pack(side=tk.LEFT)
 
+        # Storage engine behind the stack/queue
+        engine_frame = tk.Frame(settings_content, bg=self.themes[self.theme.get()]["card"])
+        engine_frame.grid(row=2, column=0, sticky="w", pady=5)
+
+        tk.Label(
+            engine_frame,
+            text="Engine",
+            bg=self.themes[self.theme.get()]["card"],
+            fg=self.themes[self.theme.get()]["text"]
+        ).pack(side=tk.LEFT)
+
+        engine_options = ttk.Combobox(
+            engine_frame,
+            textvariable=self.engine_name,
+            values=list(ENGINES),
+            state="readonly",
+            width=14
+        )
+        engine_options.pack(side=tk.LEFT, padx=5)
+        engine_options.bind("<<ComboboxSelected>>", lambda e: self.change_engine())
+
+        # Stress test on a scratch engine of the selected type
+        stress_frame = tk.Frame(settings_content, bg=self.themes[self.theme.get()]["card"])
+        stress_frame.grid(row=2, column=1, sticky="w", pady=5, padx=10)
+
+        tk.Label(
+            stress_frame,
+            text="Operations",
+            bg=self.themes[self.theme.get()]["card"],
+            fg=self.themes[self.theme.get()]["text"]
+        ).pack(side=tk.LEFT)
+
+        tk.Spinbox(
+            stress_frame,
+            from_=1000,
+            to=10000000,
+            increment=100000,
+            textvariable=self.stress_operations,
+            width=10
+        ).pack(side=tk.LEFT, padx=5)
+
+        self.stress_button = tk.Button(
+            stress_frame,
+            text="Stress Test",
+            command=self.run_stress_test,
+            bg="#F59E0B",  # Amber
+            fg="white"
+        )
+        self.stress_button.pack(side=tk.LEFT)
+
+        # Undo history cap
+        history_frame = tk.Frame(settings_content, bg=self.themes[self.theme.get()]["card"])
+        history_frame.grid(row=3, column=0, sticky="w", pady=5)
+
+        tk.Label(
+            history_frame,
+            text="Undo History Limit",
+            bg=self.themes[self.theme.get()]["card"],
+            fg=self.themes[self.theme.get()]["text"]
+        ).pack(side=tk.LEFT)
+
+        tk.Scale(
+            history_frame,
+            from_=10,
+            to=10000,
+            resolution=10,
+            orient=tk.HORIZONTAL,
+            variable=self.history_limit,
+            command=lambda value: self.change_history_limit(),
+            bg=self.themes[self.theme.get()]["card"],
+            fg=self.themes[self.theme.get()]["text"],
+            highlightthickness=0
+        ).pack(side=tk.LEFT)
+
+        # Children per node in d-ary heap mode
+        arity_frame = tk.Frame(settings_content, bg=self.themes[self.theme.get()]["card"])
+        arity_frame.grid(row=3, column=1, sticky="w", pady=5, padx=10)
+
+        tk.Label(
+            arity_frame,
+            text="Heap Arity (d)",
+            bg=self.themes[self.theme.get()]["card"],
+            fg=self.themes[self.theme.get()]["text"]
+        ).pack(side=tk.LEFT)
+
+        tk.Spinbox(
+            arity_frame,
+            from_=2,
+            to=8,
+            textvariable=self.heap_arity,
+            command=self.change_heap_arity,
+            width=3
+        ).pack(side=tk.LEFT, padx=5)
+
+        # Persistent stack/queue with every version kept
+        persistent_frame = tk.Frame(settings_content, bg=self.themes[self.theme.get()]["card"])
+        persistent_frame.grid(row=4, column=0, sticky="w", pady=5)
+
+        tk.Checkbutton(
+            persistent_frame,
+            text="Persistent Versions (stack/queue)",
+            variable=self.persistent,
+            command=self.change_engine,
+            bg=self.themes[self.theme.get()]["card"],
+            fg=self.themes[self.theme.get()]["text"],
+            selectcolor=self.themes[self.theme.get()]["card"],
+            activebackground=self.themes[self.theme.get()]["card"],
+            activeforeground=self.themes[self.theme.get()]["text"]
+        ).pack(side=tk.LEFT)
+
+    def open_benchmark(self):
+        if hasattr(self, "benchmark_window") and self.benchmark_window.winfo_exists():
+            self.benchmark_window.lift()
+            return
+
+        colors = self.themes[self.theme.get()]
+        self.benchmark_window = tk.Toplevel(self.root, bg=colors["card"])
+        self.benchmark_window.title("Stack/Queue Benchmark")
+        self.benchmark_window.geometry("760x560")
+        self.benchmark_window.protocol("WM_DELETE_WINDOW", self.close_benchmark)
+
+        controls = tk.Frame(self.benchmark_window, bg=colors["card"])
+        controls.pack(fill=tk.X, padx=10, pady=5)
+
+        tk.Label(controls, text="Workload", bg=colors["card"], fg=colors["text"]).pack(side=tk.LEFT)
+        ttk.Combobox(
+            controls,
+            textvariable=self.benchmark_workload,
+            values=["all"] + list(WORKLOADS),
+            state="readonly",
+            width=10
+        ).pack(side=tk.LEFT, padx=5)
+
+        tk.Label(controls, text="Remove from", bg=colors["card"], fg=colors["text"]).pack(side=tk.LEFT)
+        ttk.Combobox(
+            controls,
+            textvariable=self.benchmark_mode,
+            values=["queue", "stack"],
+            state="readonly",
+            width=6
+        ).pack(side=tk.LEFT, padx=5)
+
+        tk.Label(controls, text="Operations", bg=colors["card"], fg=colors["text"]).pack(side=tk.LEFT)
+        tk.Spinbox(
+            controls,
+            from_=1000,
+            to=1000000,
+            increment=10000,
+            textvariable=self.benchmark_operations,
+            width=8
+        ).pack(side=tk.LEFT, padx=5)
+
+        running = self.benchmark_cancel is not None
+        self.benchmark_button = tk.Button(
+            controls,
+            text="Stop" if running else "Run",
+            command=self.start_benchmark,
+            bg="#EF4444" if running else "#10B981",  # Red / green
+            fg="white"
+        )
+        self.benchmark_button.pack(side=tk.LEFT, padx=5)
+
+        self.benchmark_canvas = tk.Canvas(self.benchmark_window, bg=colors["card"], highlightthickness=0, height=300)
+        self.benchmark_canvas.pack(fill=tk.BOTH, expand=True, padx=10)
+        self.benchmark_canvas.bind("<Configure>", lambda e: self.plot_benchmark())
+
+        self.benchmark_table = tk.Text(
+            self.benchmark_window,
+            height=10,
+            bg=colors["background"],
+            fg=colors["text"],
+            font=("Courier", 9)
+        )
+        self.benchmark_table.pack(fill=tk.X, padx=10, pady=(5, 10))
+        self.show_benchmark_table()
+
+    def start_benchmark(self):
+        if self.benchmark_cancel is not None:
+            # The button reads Stop while a benchmark runs
+            self.benchmark_cancel.set()
+            return
+        try:
+            operations = self.benchmark_operations.get()
+        except tk.TclError:
+            self.add_to_log("error", "Operations must be a whole number")
+            return
+        workload = self.benchmark_workload.get()
+        workloads = list(WORKLOADS) if workload == "all" else [workload]
+        self.benchmark_results = []
+        self.benchmark_queue = [(workload, name, operations, self.benchmark_mode.get())
+                                for workload in workloads for name in BENCHMARK_ENGINES]
+        self.benchmark_cancel = threading.Event()
+        self.show_benchmark_running(True)
+        self.add_to_log("info", f"Benchmarking {len(self.benchmark_queue)} runs of {operations:,} operations")
+        self.benchmark_next()
+
+    def benchmark_next(self):
+        if not self.benchmark_queue:
+            self.finish_benchmark("Benchmark finished")
+            return
+        # Runs go to a worker thread one (workload, engine) pair at a time, so
+        # the table fills in as they finish and Stop takes effect within a chunk
+        workload, name, operations, mode = self.benchmark_queue.pop(0)
+        cancel = self.benchmark_cancel
+        self.run_in_background(
+            lambda: run_benchmark(BENCHMARK_ENGINES[name], workload, operations, mode, cancel=cancel),
+            self.benchmark_done,
+            lambda: self.finish_benchmark("Benchmark failed")
+        )
+
+    def benchmark_done(self, result):
+        if result is None:
+            self.finish_benchmark("Benchmark stopped")
+            return
+        self.benchmark_results.append(result)
+        if hasattr(self, "benchmark_window") and self.benchmark_window.winfo_exists():
+            self.show_benchmark_table()
+            self.plot_benchmark()
+        self.benchmark_next()
+
+    def finish_benchmark(self, message):
+        self.benchmark_cancel = None
+        self.benchmark_queue = []
+        self.show_benchmark_running(False)
+        self.add_to_log("info", message)
+
+    def show_benchmark_running(self, running):
+        if hasattr(self, "benchmark_window") and self.benchmark_window.winfo_exists():
+            self.benchmark_button.config(text="Stop" if running else "Run",
+                                         bg="#EF4444" if running else "#10B981")
+
+    def close_benchmark(self):
+        if self.benchmark_cancel is not None:
+            self.benchmark_cancel.set()
+        self.benchmark_window.destroy()
+
+    def show_benchmark_table(self):
+        lines = [f"{'workload':<11} {'engine':<16} {'ops/s':>12} {'p50 ns':>8} {'p99 ns':>8} {'B/elem':>7}"]
+        for result in self.benchmark_results:
+            lines.append(f"{result.workload:<11} {result.engine:<16} {result.ops_per_sec:>12,.0f} "
+                         f"{result.p50:>8,} {result.p99:>8,} {result.bytes_per_element:>7.1f}")
+        self.benchmark_table.config(state=tk.NORMAL)
+        self.benchmark_table.delete(1.0, tk.END)
+        self.benchmark_table.insert(tk.END, "\n".join(lines))
+        self.benchmark_table.see(tk.END)
+        self.benchmark_table.config(state=tk.DISABLED)
+
+    def plot_benchmark(self):
+        # Grouped bar chart of ops/sec: one group per workload, one bar per engine
+        canvas = self.benchmark_canvas
+        canvas.delete("all")
+        colors = self.themes[self.theme.get()]
+        if not self.benchmark_results:
+            canvas.create_text(canvas.winfo_width() // 2, canvas.winfo_height() // 2,
+                               text="Run a benchmark to plot ops/sec", fill=colors["text"])
+            return
+
+        palette = ["#3B82F6", "#10B981", "#F59E0B", "#EF4444", "#8B5CF6", "#EC4899", "#14B8A6", "#78716C"]
+        engine_colors = {name: palette[i % len(palette)] for i, name in enumerate(BENCHMARK_ENGINES)}
+        workloads = list(dict.fromkeys(result.workload for result in self.benchmark_results))
+        best = max(result.ops_per_sec for result in self.benchmark_results)
+
+        width, height = canvas.winfo_width(), canvas.winfo_height()
+        left, bottom, top = 50, height - 60, 20
+        group_width = (width - left - 10) / len(workloads)
+        bar_width = group_width * 0.8 / len(BENCHMARK_ENGINES)
+        canvas.create_line(left, top, left, bottom, width - 10, bottom, fill=colors["text"])
+        canvas.create_text(left - 5, top, text=f"{best / 1e6:.1f}M", anchor=tk.E, fill=colors["text"],
+                           font=("Helvetica", 8))
+        canvas.create_text(left - 5, bottom, text="0", anchor=tk.E, fill=colors["text"], font=("Helvetica", 8))
+
+        for result in self.benchmark_results:
+            group = workloads.index(result.workload)
+            slot = list(BENCHMARK_ENGINES).index(result.engine)
+            x = left + group * group_width + group_width * 0.1 + slot * bar_width
+            y = bottom - (bottom - top) * result.ops_per_sec / best
+            canvas.create_rectangle(x, y, x + bar_width - 2, bottom, fill=engine_colors[result.engine], outline="")
+
+        for group, workload in enumerate(workloads):
+            canvas.create_text(left + (group + 0.5) * group_width, bottom + 12, text=workload,
+                               fill=colors["text"], font=("Helvetica", 9))
+
+        # Legend, wrapping onto a second row when the window is narrow
+        x, y = left + 10, bottom + 29
+        for name, color in engine_colors.items():
+            step = 14 + 7 * len(name) + 12
+            if x + step > width:
+                x, y = left + 10, y + 16
+            canvas.create_rectangle(x, y - 5, x + 10, y + 5, fill=color, outline="")
+            canvas.create_text(x + 14, y, text=name, anchor=tk.W, fill=colors["text"], font=("Helvetica", 8))
+            x += step
+
+    def open_simulation(self):
+        if hasattr(self, "simulation_window") and self.simulation_window.winfo_exists():
+            self.simulation_window.lift()
+            return
+
+        colors = self.themes[self.theme.get()]
+        self.simulation_window = tk.Toplevel(self.root, bg=colors["card"])
+        self.simulation_window.title("Producer/Consumer Simulation")
+        self.simulation_window.geometry("720x460")
+        self.simulation_window.protocol("WM_DELETE_WINDOW", self.close_simulation)
+
+        controls = tk.Frame(self.simulation_window, bg=colors["card"])
+        controls.pack(fill=tk.X, padx=10, pady=5)
+
+        ttk.Combobox(
+            controls,
+            textvariable=self.simulation_variant,
+            values=list(SIMULATIONS),
+            state="readonly",
+            width=8
+        ).pack(side=tk.LEFT, padx=5)
+
+        for label, variable, low, high, step in (("Producers", self.simulation_producers, 1, 32, 1),
+                                                 ("Consumers", self.simulation_consumers, 1, 32, 1),
+                                                 ("Rate/s", self.simulation_rate, 1, 1000, 10),
+                                                 ("Service ms", self.simulation_service_ms, 1, 1000, 5)):
+            tk.Label(controls, text=label, bg=colors["card"], fg=colors["text"]).pack(side=tk.LEFT)
+            tk.Spinbox(controls, from_=low, to=high, increment=step, textvariable=variable,
+                       width=5).pack(side=tk.LEFT, padx=(2, 8))
+
+        self.simulation_button = tk.Button(
+            controls,
+            text="Start",
+            command=self.toggle_simulation,
+            bg="#10B981",  # Green
+            fg="white"
+        )
+        self.simulation_button.pack(side=tk.LEFT, padx=5)
+
+        self.simulation_canvas = tk.Canvas(self.simulation_window, bg=colors["card"], highlightthickness=0)
+        self.simulation_canvas.pack(fill=tk.BOTH, expand=True, padx=10)
+
+        self.simulation_label = tk.Label(
+            self.simulation_window,
+            text=f"Capacity is Max Elements ({self.max_elements.get()})",
+            font=("Courier", 9),
+            justify=tk.LEFT,
+            anchor="w",
+            bg=colors["card"],
+            fg=colors["text"]
+        )
+        self.simulation_label.pack(fill=tk.X, padx=10, pady=(5, 10))
+
+    def toggle_simulation(self):
+        if self.simulation and self.simulation.running():
+            self.simulation.stop()
+            return
+        try:
+            self.simulation = SIMULATIONS[self.simulation_variant.get()](
+                self.max_elements.get(),
+                self.simulation_producers.get(),
+                self.simulation_consumers.get(),
+                self.simulation_rate.get(),
+                self.simulation_service_ms.get() / 1000
+            )
+        except (tk.TclError, ZeroDivisionError):
+            self.add_to_log("error", "Simulation settings must be positive numbers")
+            return
+        self.simulation.start()
+        self.simulation_button.config(text="Stop", bg="#EF4444")
+        self.add_to_log("info", f"Started {self.simulation.name} simulation with capacity {self.simulation.capacity}")
+        self.root.after(100, self.poll_simulation)
+
+    def close_simulation(self):
+        if self.simulation:
+            self.simulation.stop()
+        self.simulation_window.destroy()
+
+    def poll_simulation(self):
+        if not (hasattr(self, "simulation_window") and self.simulation_window.winfo_exists()):
+            return
+        stats = self.simulation.stats.snapshot()
+        self.plot_simulation(stats)
+        self.simulation_label.config(text=(
+            f"capacity {self.simulation.capacity}   produced {stats['produced']:,}   "
+            f"consumed {stats['consumed']:,}   throughput {stats['throughput']:.1f}/s\n"
+            f"queue wait mean {stats['mean_wait'] * 1000:.1f} ms, p95 {stats['p95_wait'] * 1000:.1f} ms   "
+            f"blocked puts {stats['blocked']:.1%} (mean {stats['mean_put_wait'] * 1000:.1f} ms)"
+        ))
+        if self.simulation.running():
+            self.root.after(100, self.poll_simulation)
+        else:
+            self.simulation_button.config(text="Start", bg="#10B981")
+            self.add_to_log("info", f"Simulation stopped: {stats['consumed']:,} items, "
+                                    f"p95 wait {stats['p95_wait'] * 1000:.1f} ms")
+
+    def plot_simulation(self, stats):
+        # Live occupancy: a fill gauge on the left and its recent history on the right
+        canvas = self.simulation_canvas
+        canvas.delete("all")
+        colors = self.themes[self.theme.get()]
+        width, height = canvas.winfo_width(), canvas.winfo_height()
+        capacity = self.simulation.capacity
+        occupancy = stats["occupancy"]
+        top, bottom = 20, height - 20
+        size = occupancy[-1][1] if occupancy else 0
+
+        canvas.create_rectangle(10, top, 50, bottom, outline="#6B7280", width=2)
+        fill = "#EF4444" if size >= capacity else colors["queue"]
+        canvas.create_rectangle(12, bottom - (bottom - top) * size / capacity, 48, bottom, fill=fill, outline="")
+        canvas.create_text(30, top - 10, text=f"{size}/{capacity}", fill=colors["text"], font=("Helvetica", 8))
+
+        left, right = 70, width - 10
+        canvas.create_line(left, top, left, bottom, right, bottom, fill=colors["text"])
+        canvas.create_text(left - 4, top, text=str(capacity), anchor=tk.E, fill=colors["text"], font=("Helvetica", 8))
+        if len(occupancy) > 1:
+            start, end = occupancy[0][0], occupancy[-1][0]
+            span = max(end - start, 1e-9)
+            points = []
+            for t, value in occupancy:
+                points += [left + (right - left) * (t - start) / span, bottom - (bottom - top) * value / capacity]
+            canvas.create_line(*points, fill=colors["stack_active"], width=2)
+            canvas.create_text(right, bottom + 10, text=f"last {span:.1f}s", anchor=tk.E, fill=colors["text"],
+                               font=("Helvetica", 8))
+
     def toggle_tutorial(self):
         # Check if tutorial frame exists and is mapped
         if hasattr(self, "tutorial_frame") and self.tutorial_frame.winfo_ismapped():
@@ -595,7 +2495,7 @@ class StackQueueVisualizer:
 
         features_info = tk.Label(
             features_frame,
-            text="• Undo/Redo: Navigate through operation history\n• Copy: Copy elements to clipboard\n• Settings: Change theme, animation speed, and maximum elements\n• Operation Log: Track actions performed",
+            text="• Undo/Redo: Navigate through operation history\n• Replay: Play the history back from its oldest step\n• Copy: Copy elements to clipboard\n• Settings: Change theme, animation speed, and maximum elements\n• Deque, Heap, d-ary Heap, Monotonic: extra modes with animated sift-up/sift-down for heaps\n• Operation Log: Track actions performed",
             justify=tk.LEFT,
             bg=self.themes[self.theme.get()]["card"],
             fg=self.themes[self.theme.get()]["text"]
@@ -624,171 +2524,288 @@ class StackQueueVisualizer:
             stats_text = f"Size: {len(self.elements)}\n"
             if self.elements and ds_type == "stack":
                 stats_text += f"Top: \"{self.elements[-1]}\"\n"
-            elif self.elements and ds_type == "queue":
+            elif self.elements and ds_type in self.HEAP_MODES:
+                stats_text += f"Min: \"{self.elements[0]}\"\n"
+                stats_text += f"Height: {self.heap_levels(len(self.elements))}\n"
+            elif self.elements:
                 stats_text += f"Front: \"{self.elements[0]}\"\n"
                 stats_text += f"Back: \"{self.elements[-1]}\"\n"
-            stats_text += f"Max Size: {self.max_elements.get()}"
+            stats_text += f"Max Size: {self.max_elements.get()}\n"
+            stats_text += format_engine_stats(self.elements)
             self.structure_stats_label.config(text=stats_text)
 
         # Update elements display
         if hasattr(self, 'elements_display'):
             self.elements_display.config(state=tk.NORMAL)
             self.elements_display.delete(1.0, tk.END)
-            if self.elements:
+            if len(self.elements) > self.PREVIEW_LIMIT:
+                preview = ', '.join(islice(self.elements, self.PREVIEW_LIMIT))
+                self.elements_display.insert(
+                    tk.END, f"[{preview}, ... {len(self.elements) - self.PREVIEW_LIMIT:,} more]")
+            elif self.elements:
                 self.elements_display.insert(tk.END, f"[{', '.join(self.elements)}]")
             else:
                 self.elements_display.insert(tk.END, f"Empty {ds_type}")
             self.elements_display.config(state=tk.DISABLED)
 
+        # Update version slider
+        if hasattr(self, 'version_scale'):
+            if isinstance(self.elements, PersistentEngine):
+                self.version_scale.config(to=len(self.elements.versions) - 1)
+                self.version_scale.set(self.elements.version)
+                self.version_scale.pack(anchor="w", fill=tk.X)
+            else:
+                self.version_scale.pack_forget()
+
+        # Keep the playback cursor on the history's current step
+        self.playback.position = self.history.index
+
         # Update visualization
         self.render_visualization()
 
-    def render_visualization(self):
-        self.canvas.delete("all")
+    def visible_window(self):
+        """Element index range [lo, hi) that fits on the canvas at the current scroll offset"""
+        ds_type = self.data_structure.get()
+        if ds_type == "stack":
+            capacity = max(1, (self.canvas.winfo_height() - 60) // 50)
+        else:
+            capacity = max(1, (self.canvas.winfo_width() - 90) // 90)
+        size = len(self.elements)
+        self.view_offset = max(0, min(self.view_offset, size - capacity))
+        if ds_type == "stack":
+            hi = size - self.view_offset
+            return max(0, hi - capacity), hi
+        return self.view_offset, min(size, self.view_offset + capacity)
+
+    def scroll_view(self, action, amount, unit=None):
+        size = len(self.elements)
+        lo, hi = self.visible_window()
+        page = max(1, hi - lo)
+        if action == "moveto":
+            # Scrollbar fractions run from the top of the stack / front of the queue
+            self.view_offset = int(float(amount) * size)
+        else:
+            self.view_offset += int(amount) * (page if unit == "pages" else 1)
+        self.render_visualization()
 
-        if not self.elements:
-            # Show empty state
-            self.canvas.create_text(
-                self.canvas.winfo_width() // 2,
-                self.canvas.winfo_height() // 2,
-                text=f"Empty {self.data_structure.get()}\n  ",
-                font=("Helvetica", 12),
-                fill=self.current_theme["text"],
-                justify=tk.CENTER
-            )
-            return
+    def scroll_to_top(self):
+        self.view_offset = 0
+        self.render_visualization()
 
+    def render_visualization(self):
+        # Canvas items are created once and repositioned with coords/itemconfig;
+        # only the elements inside the viewport get an item, so the cost of a
+        # redraw does not depend on the size of the structure.
+        theme = self.current_theme
+        canvas = self.canvas
+        if self.frame_items is None:
+            self.frame_items = [canvas.create_text(0, 0, font=("Helvetica", 12), justify=tk.CENTER),
+                                canvas.create_text(0, 0, font=("Helvetica", 10, "bold")),
+                                canvas.create_text(0, 0, font=("Helvetica", 10, "bold"))]
+        empty_item, start_item, end_item = self.frame_items
+        width, height = canvas.winfo_width(), canvas.winfo_height()
         ds_type = self.data_structure.get()
+        size = len(self.elements)
+
+        if ds_type in self.HEAP_MODES and size:
+            for item in self.frame_items:
+                canvas.itemconfig(item, state=tk.HIDDEN)
+            for items in self.element_items:
+                for item in items:
+                    canvas.itemconfig(item, state=tk.HIDDEN)
+            self.scrollbar.set(0, 1)
+            self.render_heap()
+            return
+        for items in self.heap_items:
+            for item in items:
+                canvas.itemconfig(item, state=tk.HIDDEN)
 
-        if ds_type == "stack":
-            # Stack visualization (vertical)
-            self.canvas.create_text(
-                self.canvas.winfo_width() // 2,
-                30,
-                text="Top ▲",
-                font=("Helvetica", 10, "bold"),
-                fill=self.current_theme["text"]
-            )
-
-            element_width = 120
-            element_height = 40
-
-            # Calculate positions
-            center_x = self.canvas.winfo_width() // 2
-            start_y = self.canvas.winfo_height() - 50  # Start from bottom
-
-            for i, element in enumerate(self.elements):
-                y_pos = start_y - i * (element_height + 10)
-
-                # Background color based on highlight
-                bg_color = self.current_theme["highlight"] if i == self.highlighted_index else self.current_theme["stack"]
-
-                self.canvas.create_rectangle(
-                    center_x - element_width // 2,
-                    y_pos - element_height // 2,
-                    center_x + element_width // 2,
-                    y_pos + element_height // 2,
-                    fill=bg_color,
-                    outline="#6B7280",
-                    width=2,
-                    tags=f"element-{i}"
-                )
-
-                self.canvas.create_text(
-                    center_x,
-                    y_pos,
-                    text=element,
-                    font=("Helvetica", 10, "bold"),
-                    fill=self.current_theme["text"]
-                )
-
-                self.canvas.create_text(
-                    center_x - element_width // 2 + 10,
-                    y_pos - element_height // 2 + 10,
-                    text=str(len(self.elements) - 1 - i),
-                    font=("Helvetica", 8),
-                    fill=self.current_theme["text"],
-                    anchor=tk.NW
-                )
-
-            # Show "Bottom" text below the stack
-            if self.elements:
-                self.canvas.create_text(
-                    center_x,
-                    start_y + 30,
-                    text="Bottom",
-                    font=("Helvetica", 10),
-                    fill=self.current_theme["text"]
-                )
+        lo, hi = self.visible_window()
+        if size:
+            self.scrollbar.set(self.view_offset / size, (self.view_offset + hi - lo) / size)
         else:
-            # Queue visualization (horizontal)
-            self.canvas.create_text(
-                50,
-                30,
-                text="◀ Front",
-                font=("Helvetica", 10, "bold"),
-                fill=self.current_theme["text"],
-                anchor=tk.W
-            )
+            self.scrollbar.set(0, 1)
 
-            self.canvas.create_text(
-                self.canvas.winfo_width() - 50,
-                30,
-                text="Back ▶",
-                font=("Helvetica", 10, "bold"),
-                fill=self.current_theme["text"],
-                anchor=tk.E
-            )
+        while len(self.element_items) < hi - lo:
+            self.element_items.append((
+                canvas.create_rectangle(0, 0, 0, 0, outline="#6B7280", width=2),
+                canvas.create_text(0, 0, font=("Helvetica", 10, "bold")),
+                canvas.create_text(0, 0, font=("Helvetica", 8), anchor=tk.NW)
+            ))
+
+        if not size:
+            # Show empty state
+            canvas.coords(empty_item, width // 2, height // 2)
+            canvas.itemconfig(empty_item, text=f"Empty {ds_type}\n  ", fill=theme["text"], state=tk.NORMAL)
+            canvas.itemconfig(start_item, state=tk.HIDDEN)
+            canvas.itemconfig(end_item, state=tk.HIDDEN)
+        elif ds_type == "stack":
+            canvas.itemconfig(empty_item, state=tk.HIDDEN)
+            start_y = height - 50  # Start from bottom
+            canvas.coords(start_item, width // 2, 30)
+            canvas.itemconfig(start_item, text="Top ▲" if hi == size else f"▲ {size - hi:,} more",
+                              anchor=tk.CENTER, fill=theme["text"], state=tk.NORMAL)
+            canvas.coords(end_item, width // 2, start_y + 30)
+            canvas.itemconfig(end_item, text="Bottom" if lo == 0 else f"▼ {lo:,} more",
+                              anchor=tk.CENTER, fill=theme["text"], state=tk.NORMAL)
+        else:
+            canvas.itemconfig(empty_item, state=tk.HIDDEN)
+            canvas.coords(start_item, 50, 30)
+            canvas.itemconfig(start_item, text="◀ Front" if lo == 0 else f"◀ {lo:,} more",
+                              anchor=tk.W, fill=theme["text"], state=tk.NORMAL)
+            canvas.coords(end_item, width - 50, 30)
+            canvas.itemconfig(end_item, text="Back ▶" if hi == size else f"{size - hi:,} more ▶",
+                              anchor=tk.E, fill=theme["text"], state=tk.NORMAL)
+
+        element_width, element_height = (120, 40) if ds_type == "stack" else (80, 40)
+        for slot, (rect, value_text, index_text) in enumerate(self.element_items):
+            i = lo + slot
+            if i >= hi:
+                for item in (rect, value_text, index_text):
+                    canvas.itemconfig(item, state=tk.HIDDEN)
+                continue
+
+            # Background color based on highlight
+            bg_color = theme["highlight"] if i == self.highlighted_index else theme[self.MODE_COLORS[ds_type]]
+
+            if ds_type == "stack":
+                # Stack visualization (vertical)
+                center_x = width // 2
+                y_pos = height - 50 - slot * (element_height + 10)
+                canvas.coords(rect, center_x - element_width // 2, y_pos - element_height // 2,
+                              center_x + element_width // 2, y_pos + element_height // 2)
+                canvas.coords(value_text, center_x, y_pos)
+                canvas.coords(index_text, center_x - element_width // 2 + 10, y_pos - element_height // 2 + 10)
+                label = str(size - 1 - i)
+            else:
+                # Queue visualization (horizontal)
+                center_y = height // 2
+                x_pos = 50 + slot * (element_width + 10)
+                canvas.coords(rect, x_pos, center_y - element_height // 2,
+                              x_pos + element_width, center_y + element_height // 2)
+                canvas.coords(value_text, x_pos + element_width // 2, center_y)
+                canvas.coords(index_text, x_pos + 5, center_y - element_height // 2 + 10)
+                label = str(i)
+
+            canvas.itemconfig(rect, fill=bg_color, state=tk.NORMAL)
+            canvas.itemconfig(value_text, text=self.elements[i], fill=theme["text"], state=tk.NORMAL)
+            canvas.itemconfig(index_text, text=label, fill=theme["text"], state=tk.NORMAL)
+
+    def heap_levels(self, size):
+        levels, level_width = 0, 1
+        while size > 0:
+            size -= level_width
+            level_width *= self.elements.arity
+            levels += 1
+        return levels
+
+    def heap_frame_values(self, count):
+        """Values of the first `count` nodes after `heap_step` of the animated swaps.
+
+        The heap already holds the final state, so earlier frames are rebuilt by
+        undoing the remaining swaps; only the O(log n) nodes on the sift path change.
+        """
+        entries = self.elements.entries
+        values = {}
+        for i, j in reversed(self.heap_swaps[self.heap_step:]):
+            values[i], values[j] = values.get(j, entries[j][1]), values.get(i, entries[i][1])
+        return [values.get(i, entries[i][1]) for i in range(count)]
+
+    def render_heap(self):
+        # Tree layout: level L has arity**L slots spread evenly across the canvas.
+        # Only the levels that fit are drawn, reusing one (edge, oval, text) per node.
+        canvas, theme = self.canvas, self.current_theme
+        width, height = canvas.winfo_width(), canvas.winfo_height()
+        arity, size = self.elements.arity, len(self.elements)
+
+        positions = []
+        level_start, level_width, y = 0, 1, 40
+        while level_start < size and width / level_width >= 12 and y <= height - 30:
+            spacing = width / level_width
+            radius = max(5, min(18, spacing / 2 - 2))
+            for k in range(min(level_width, size - level_start)):
+                positions.append((spacing * (k + 0.5), y, radius))
+            level_start += level_width
+            level_width *= arity
+            y += 60
+        count = len(positions)
+
+        while len(self.heap_items) < count:
+            edge = canvas.create_line(0, 0, 0, 0, fill="#6B7280")
+            canvas.tag_lower(edge)
+            self.heap_items.append((
+                edge,
+                canvas.create_oval(0, 0, 0, 0, outline="#6B7280", width=2),
+                canvas.create_text(0, 0, font=("Helvetica", 9, "bold"))
+            ))
+
+        values = self.heap_frame_values(count)
+        moving = set(self.heap_swaps[self.heap_step]) if self.heap_step < len(self.heap_swaps) else ()
+        color = theme[self.MODE_COLORS[self.data_structure.get()]]
+        for i, (edge, oval, text) in enumerate(self.heap_items):
+            if i >= count:
+                for item in (edge, oval, text):
+                    canvas.itemconfig(item, state=tk.HIDDEN)
+                continue
+            x, y, radius = positions[i]
+            if i:
+                px, py, _ = positions[(i - 1) // arity]
+                canvas.coords(edge, px, py, x, y)
+                canvas.itemconfig(edge, state=tk.NORMAL)
+            else:
+                canvas.itemconfig(edge, state=tk.HIDDEN)
+            canvas.coords(oval, x - radius, y - radius, x + radius, y + radius)
+            canvas.itemconfig(oval, fill=theme["highlight"] if i in moving else color, state=tk.NORMAL)
+            canvas.coords(text, x, y)
+            canvas.itemconfig(text, text=values[i], fill=theme["text"],
+                              state=tk.NORMAL if radius >= 10 else tk.HIDDEN)
+
+        if count < size:
+            end_item = self.frame_items[2]
+            canvas.coords(end_item, width // 2, height - 15)
+            canvas.itemconfig(end_item, text=f"{size - count:,} deeper nodes not shown", anchor=tk.CENTER,
+                              fill=theme["text"], state=tk.NORMAL)
+
+    def animate_heap(self, swaps):
+        # Replays a sift one swap per tick; the heap itself is already updated
+        self.heap_swaps = list(swaps)
+        self.heap_step = 0
+        self.update_ui()
+        self.root.after(self.animation_speed.get() * 5, self.heap_animation_step)
 
-            element_width = 80
-            element_height = 40
-
-            # Calculate positions
-            center_y = self.canvas.winfo_height() // 2
-            start_x = 50
-
-            for i, element in enumerate(self.elements):
-                x_pos = start_x + i * (element_width + 10)
-
-                # Background color based on highlight
-                bg_color = self.current_theme["highlight"] if i == self.highlighted_index else self.current_theme["queue"]
-
-                self.canvas.create_rectangle(
-                    x_pos,
-                    center_y - element_height // 2,
-                    x_pos + element_width,
-                    center_y + element_height // 2,
-                    fill=bg_color,
-                    outline="#6B7280",
-                    width=2,
-                    tags=f"element-{i}"
-                )
-
-                self.canvas.create_text(
-                    x_pos + element_width // 2,
-                    center_y,
-                    text=element,
-                    font=("Helvetica", 10, "bold"),
-                    fill=self.current_theme["text"]
-                )
-
-                self.canvas.create_text(
-                    x_pos + 5,
-                    center_y - element_height // 2 + 10,
-                    text=str(i),
-                    font=("Helvetica", 8),
-                    fill=self.current_theme["text"],
-                    anchor=tk.NW
-                )
+    def heap_animation_step(self):
+        self.heap_step += 1
+        if self.heap_step > len(self.heap_swaps):
+            self.finish_animation()
+            return
+        self.render_visualization()
+        self.root.after(self.animation_speed.get() * 5, self.heap_animation_step)
 
     # Move these methods to the class level (fix indentation)
     def add_to_log(self, tag, message):
         timestamp = datetime.now().strftime("%H:%M:%S")
         log_entry = f"[{timestamp}] {message}"
         self.operation_log.append((tag, log_entry))
+        self.pending_log.append((tag, log_entry))
+        if self.log_flush_job is None:
+            self.log_flush_job = self.root.after(self.LOG_FLUSH_MS, self.flush_log)
+
+    def flush_log(self):
+        # One insert call for everything logged since the last flush, then trim
+        # the panel back to LOG_CAPACITY lines
+        self.log_flush_job = None
+        if not self.pending_log:
+            return
+        chunks = []
+        for tag, log_entry in self.pending_log:
+            chunks += [log_entry + "\n", tag]
+        self.pending_log.clear()
 
         self.log_display.config(state=tk.NORMAL)
-        self.log_display.insert(tk.END, log_entry + "\n", tag)
+        self.log_display.insert(tk.END, *chunks)
+        excess = int(self.log_display.index("end-1c").split(".")[0]) - 1 - self.LOG_CAPACITY
+        if excess > 0:
+            self.log_display.delete("1.0", f"{excess + 1}.0")
         self.log_display.see(tk.END)
         self.log_display.config(state=tk.DISABLED)
 
@@ -796,9 +2813,128 @@ class StackQueueVisualizer:
         if ds_type != self.data_structure.get():
             self.data_structure.set(ds_type)
             self.add_to_log("info", f"Switched to {ds_type}")
+            if ds_type == "deque":
+                self.deque_frame.pack(side=tk.LEFT)
+            else:
+                self.deque_frame.pack_forget()
+            self.rebuild_engine()
             self.update_ui()
 
-    def add_element(self):
+    def make_engine(self, values=()):
+        ds_type = self.data_structure.get()
+        if ds_type == "heap":
+            return BinaryHeap(values)
+        if ds_type == "d-ary heap":
+            return DaryHeap(values, arity=self.heap_arity.get())
+        if ds_type == "monotonic queue":
+            return MonotonicQueue(values)
+        if self.persistent.get() and ds_type in ("stack", "queue"):
+            return PersistentEngine(values, kind=ds_type)
+        return ENGINES[self.engine_name.get()](values)
+
+    def rebuild_engine(self):
+        # Stack, queue and deque share a storage engine; heaps and the monotonic
+        # queue reorder or drop elements, so entering or leaving them rebuilds the
+        # structure and starts a new history
+        def signature(engine):
+            return type(engine), getattr(engine, "arity", None), getattr(engine, "kind", None)
+
+        if signature(self.make_engine()) == signature(self.elements):
+            return
+        self.elements = self.make_engine(list(self.elements))
+        self.history.clear()
+        self.add_to_log("info", f"Rebuilt as {self.elements.name}; history cleared")
+
+    def record(self, command, before=None):
+        # A persistent engine already keeps every version, so the log only
+        # needs the pair of version numbers to undo or redo any operation
+        if isinstance(self.elements, PersistentEngine):
+            command = Command("version", (before, self.elements.version))
+        self.stop_replay()
+        self.history.record(command)
+
+    def time_travel(self, version):
+        if not isinstance(self.elements, PersistentEngine) or version == self.elements.version or self.animating:
+            return
+        self.stop_replay()
+        before = self.elements.version
+        self.elements.checkout(version)
+        # Consecutive slider moves collapse into one undo step
+        if self.history.can_undo() and not self.history.can_redo() and self.history.entries[-1].op == "travel":
+            self.history.amend(Command("travel", (self.history.entries[-1].value[0], version)))
+        else:
+            self.history.record(Command("travel", (before, version)))
+        self.update_ui()
+
+    def change_engine(self):
+        if self.data_structure.get() in ("stack", "queue", "deque"):
+            self.rebuild_engine()
+            self.update_ui()
+
+    def change_heap_arity(self):
+        if self.data_structure.get() == "d-ary heap" and not self.animating:
+            self.rebuild_engine()
+            self.update_ui()
+
+    def run_in_background(self, work, done, failed=None, poll_ms=50):
+        """Call work() on a worker thread, then done(result) back on the Tk thread.
+
+        Tk may only be touched from its own thread, so the result is handed over
+        through a queue the event loop polls. If work() raises, the error is
+        logged and failed() is called instead.
+        """
+        results = queue.Queue()
+
+        def target():
+            try:
+                results.put((True, work()))
+            except Exception as e:
+                results.put((False, e))
+
+        def poll():
+            try:
+                ok, result = results.get_nowait()
+            except queue.Empty:
+                self.root.after(poll_ms, poll)
+                return
+            if ok:
+                done(result)
+                return
+            self.add_to_log("error", f"{type(result).__name__}: {result}")
+            if failed:
+                failed()
+
+        threading.Thread(target=target, daemon=True).start()
+        self.root.after(poll_ms, poll)
+
+    def run_stress_test(self):
+        if self.stress_running:
+            return
+        try:
+            operations = self.stress_operations.get()
+        except tk.TclError:
+            self.add_to_log("error", "Operations must be a whole number")
+            return
+        engine_class = ENGINES[self.engine_name.get()]
+
+        def reset():
+            self.stress_running = False
+            self.stress_button.config(state=tk.NORMAL, text="Stress Test")
+
+        def finished(result):
+            engine, seconds = result
+            reset()
+            rate = operations / seconds if seconds else float("inf")
+            self.add_to_log("info", f"{operations:,} operations in {seconds:.2f}s ({rate:,.0f} ops/s)")
+            self.add_to_log("info", format_engine_stats(engine))
+
+        # Millions of operations take seconds, so they run off the Tk thread
+        self.stress_running = True
+        self.stress_button.config(state=tk.DISABLED, text="Running...")
+        self.add_to_log("info", f"Stress testing {engine_class.name} with {operations:,} operations")
+        self.run_in_background(lambda: stress_test(engine_class, operations), finished, reset)
+
+    def add_element(self, front=False):
         if self.animating:
             return
 
@@ -813,27 +2949,40 @@ class StackQueueVisualizer:
 
         self.animating = True
         ds_type = self.data_structure.get()
-
-        # Save state for undo
-        self.history = self.history[:self.history_index + 1]
-        self.history.append(("add", value, list(self.elements)))
-        self.history_index += 1
-
-        self.elements.append(value)
+        before = getattr(self.elements, "version", None)
+
+        if ds_type in self.HEAP_MODES:
+            self.elements.push(value)
+            self.record(Command("heappush", (value, list(self.elements.last_swaps))), before)
+            operation = "Inserted"
+        elif ds_type == "monotonic queue":
+            self.elements.push(value)
+            evicted = list(self.elements.last_evicted)
+            self.record(Command("monopush", (value, evicted)), before)
+            operation = f"Evicted {len(evicted)} larger and enqueued" if evicted else "Enqueued"
+        elif front:
+            self.elements.pushleft(value)
+            self.record(Command("pushleft", value), before)
+            operation = "Pushed front"
+        else:
+            self.elements.push(value)
+            self.record(Command("push", value), before)
+            operation = {"stack": "Pushed", "deque": "Pushed back"}.get(ds_type, "Enqueued")
         self.input_entry.delete(0, tk.END)
 
-        operation = "Pushed" if ds_type == "stack" else "Enqueued"
         self.add_to_log("add", f"{operation} '{value}'")
 
-        if self.animation_enabled.get():
-            self.highlighted_index = len(self.elements) - 1
+        if self.animation_enabled.get() and ds_type in self.HEAP_MODES:
+            self.animate_heap(self.elements.last_swaps)
+        elif self.animation_enabled.get():
+            self.highlighted_index = 0 if front else len(self.elements) - 1
             self.update_ui()
             self.root.after(self.animation_speed.get() * 10, self.finish_animation)
         else:
             self.animating = False
             self.update_ui()
 
-    def remove_element(self):
+    def remove_element(self, back=False):
         if self.animating or not self.elements:
             if not self.elements:
                 self.add_to_log("error", f"Empty {self.data_structure.get()}")
@@ -841,25 +2990,28 @@ class StackQueueVisualizer:
 
         self.animating = True
         ds_type = self.data_structure.get()
+        before = getattr(self.elements, "version", None)
 
-        # Save state for undo
-        self.history = self.history[:self.history_index + 1]
-        removed_value = self.elements[-1] if ds_type == "stack" else self.elements[0]
-        self.history.append(("remove", removed_value, list(self.elements)))
-        self.history_index += 1
-
-        self.highlighted_index = len(self.elements) - 1 if ds_type == "stack" else 0
-
-        if ds_type == "stack":
-            self.elements.pop()
-            operation = "Popped"
+        if ds_type in self.HEAP_MODES:
+            removed_value = self.elements.pop()
+            self.record(Command("heappop", (removed_value, list(self.elements.last_swaps))), before)
+            operation = "Extracted min"
+        elif ds_type == "stack" or back:
+            self.highlighted_index = len(self.elements) - 1
+            removed_value = self.elements.pop()
+            self.record(Command("pop", removed_value), before)
+            operation = "Popped back" if back else "Popped"
         else:
-            self.elements.pop(0)
-            operation = "Dequeued"
+            self.highlighted_index = 0
+            removed_value = self.elements.popleft()
+            self.record(Command("popleft", removed_value), before)
+            operation = "Popped front" if ds_type == "deque" else "Dequeued"
 
         self.add_to_log("remove", f"{operation} '{removed_value}'")
 
-        if self.animation_enabled.get():
+        if self.animation_enabled.get() and ds_type in self.HEAP_MODES:
+            self.animate_heap(self.elements.last_swaps)
+        elif self.animation_enabled.get():
             self.update_ui()
             self.root.after(self.animation_speed.get() * 10, self.finish_animation)
         else:
@@ -868,50 +3020,90 @@ class StackQueueVisualizer:
 
     def finish_animation(self):
         self.highlighted_index = None
+        self.heap_swaps = []
+        self.heap_step = 0
         self.animating = False
         self.update_ui()
 
-    def undo(self):
-        if self.animating or self.history_index < 0:
+    def undo_command(self, verbose=True):
+        command = self.history.undo()
+        apply_command(self.elements, command, inverse=True)
+        if not verbose:
             return
 
-        operation, value, prev_state = self.history[self.history_index]
-        self.history_index -= 1
-
-        self.elements = list(prev_state)
-        ds_type = self.data_structure.get()
-
-        if operation == "add":
-            self.add_to_log("info", f"Undo: Removed '{value}'")
+        if command.op in ("version", "travel"):
+            self.add_to_log("info", f"Undo: Back to version {command.value[0]}")
+        elif command.op in ("push", "pushleft", "heappush", "monopush"):
+            self.add_to_log("info", f"Undo: Removed '{command_value(command)}'")
+        elif command.op == "replace":
+            self.add_to_log("info", f"Undo: Restored {len(command.value[0])} elements")
         else:
-            self.add_to_log("info", f"Undo: Restored '{value}'")
-
-        self.update_ui()
+            self.add_to_log("info", f"Undo: Restored '{command_value(command)}'")
 
-    def redo(self):
-        if self.animating or self.history_index >= len(self.history) - 1:
+    def redo_command(self, verbose=True):
+        command = self.history.redo()
+        apply_command(self.elements, command)
+        if not verbose:
             return
 
-        self.history_index += 1
-        operation, value, _ = self.history[self.history_index]
-
-        ds_type = self.data_structure.get()
-        if operation == "add":
-            self.elements.append(value)
-            self.add_to_log("info", f"Redo: Added '{value}'")
+        if command.op in ("version", "travel"):
+            self.add_to_log("info", f"Redo: Forward to version {command.value[1]}")
+        elif command.op in ("push", "pushleft", "heappush", "monopush"):
+            self.add_to_log("info", f"Redo: Added '{command_value(command)}'")
+        elif command.op == "replace":
+            self.add_to_log("info", f"Redo: Replaced with {len(command.value[1])} elements")
         else:
-            self.elements.pop(-1 if ds_type == "stack" else 0)
-            self.add_to_log("info", f"Redo: Removed '{value}'")
-
+            self.add_to_log("info", f"Redo: Removed '{command_value(command)}'")
+
+    def show_history_step(self, step):
+        # Single steps are logged like undo/redo; longer jumps get one summary line
+        verbose = abs(step - self.history.index) == 1
+        while self.history.index > step:
+            self.undo_command(verbose)
+        while self.history.index < step:
+            self.redo_command(verbose)
+        if not verbose:
+            self.add_to_log("info", f"History: step {step} of {len(self.history)}")
         self.update_ui()
 
+    def undo(self):
+        if not self.animating:
+            self.playback.prev()
+
+    def redo(self):
+        if not self.animating:
+            self.playback.next()
+
+    def toggle_replay(self):
+        if self.playback.playing:
+            self.stop_replay()
+        elif not self.animating and len(self.history):
+            self.playback.first()
+            self.playback.set_interval(self.animation_speed.get() * 10)
+            self.playback.play()
+            self.replay_button.config(text="Pause")
+
+    def replay_step(self):
+        self.playback.set_interval(self.animation_speed.get() * 10)
+        self.playback.tick()
+        if not self.playback.playing:
+            self.replay_button.config(text="Replay")
+
+    def stop_replay(self):
+        self.playback.pause()
+        if hasattr(self, 'replay_button'):
+            self.replay_button.config(text="Replay")
+
     def reset(self):
         if self.animating:
             return
 
-        self.elements.clear()
+        if isinstance(self.elements, PersistentEngine):
+            # Start a fresh version history as well
+            self.elements = self.make_engine()
+        else:
+            self.elements.clear()
         self.history.clear()
-        self.history_index = -1
         self.add_to_log("info", f"{self.data_structure.get().capitalize()} reset")
         self.update_ui()
 
@@ -919,27 +3111,69 @@ class StackQueueVisualizer:
         if self.animating:
             return
 
-        self.elements.clear()
+        previous = tuple(self.elements)
         length = random.randint(1, self.max_elements.get())
-        self.elements = [''.join(random.choices(string.ascii_letters + string.digits, k=5))
-                         for _ in range(length)]
-
-        self.history = self.history[:self.history_index + 1]
-        self.history.append(("randomize", None, []))
-        self.history_index += 1
+        if self.data_structure.get() in self.HEAP_MODES + ("monotonic queue",):
+            # Priorities read better as numbers
+            values = tuple(str(random.randint(0, 99)) for _ in range(length))
+        else:
+            values = tuple(''.join(random.choices(string.ascii_letters + string.digits, k=5))
+                           for _ in range(length))
+        before = getattr(self.elements, "version", None)
+        command = Command("replace", (previous, values))
+        apply_command(self.elements, command)
+        self.record(command, before)
 
         self.add_to_log("info", f"Randomized with {length} elements")
         self.update_ui()
 
+    def change_history_limit(self):
+        self.history.limit = self.history_limit.get()
+        if len(self.history) > self.history.limit:
+            self.stop_replay()
+            self.history.trim()
+            self.update_ui()
+
     def copy_to_clipboard(self):
         self.root.clipboard_clear()
-        self.root.clipboard_append(json.dumps(self.elements))
+        self.root.clipboard_append(json.dumps(list(self.elements)))
         self.add_to_log("info", "Elements copied to clipboard")
 
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = StackQueueVisualizer(root)
-    root.mainloop()
+    parser = argparse.ArgumentParser(description="Stack and Queue Visualizer")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="run the throughput benchmark headlessly instead of opening the GUI")
+    parser.add_argument("--workload", choices=WORKLOADS, action="append",
+                        help="workload to run (repeatable; default: all)")
+    parser.add_argument("--engine", choices=BENCHMARK_ENGINES, action="append",
+                        help="engine to benchmark (repeatable; default: all)")
+    parser.add_argument("--operations", type=int, default=100000, help="operations per run (default: 100000)")
+    parser.add_argument("--mode", choices=["queue", "stack"], default="queue",
+                        help="end that removals take from (default: queue)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the workloads")
+    parser.add_argument("--simulate", type=int, action="append", metavar="CAPACITY",
+                        help="run the producer/consumer simulation headlessly with this queue capacity "
+                             "(repeatable)")
+    parser.add_argument("--variant", choices=SIMULATIONS, default="asyncio",
+                        help="workers for --simulate: asyncio tasks or threads (default: asyncio)")
+    parser.add_argument("--producers", type=int, default=2, help="producers for --simulate (default: 2)")
+    parser.add_argument("--consumers", type=int, default=2, help="consumers for --simulate (default: 2)")
+    parser.add_argument("--rate", type=float, default=50.0,
+                        help="items per second per producer for --simulate (default: 50)")
+    parser.add_argument("--service-ms", type=float, default=20.0,
+                        help="mean milliseconds a consumer spends per item for --simulate (default: 20)")
+    parser.add_argument("--duration", type=float, default=2.0, help="seconds per --simulate run (default: 2)")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        print_benchmarks(run_benchmarks(args.engine, args.workload, args.operations, args.mode, args.seed))
+    elif args.simulate:
+        simulate_capacities(args.simulate, args.variant, args.duration, args.producers, args.consumers,
+                            args.rate, args.service_ms / 1000, args.seed)
+    else:
+        root = tk.Tk()
+        app = StackQueueVisualizer(root)
+        root.mainloop()
 
 
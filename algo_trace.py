@@ -0,0 +1,456 @@
+"""Shared step traces and playback for the algorithm visualizers.
+
+A TraceLog stores an algorithm run as one small event per step plus periodic
+keyframes, and materializes any step by replaying from the nearest keyframe.
+A PlaybackController moves a cursor over the steps and runs the play clock.
+Traces can be saved in a compact binary format and reopened through mmap,
+so steps are decoded from disk on demand instead of loaded up front.
+"""
+from array import array
+from bisect import bisect_right
+import copy
+import json
+import mmap
+import shutil
+import struct
+
+import numpy as np
+
+
+class PackedArrays:
+    """Append-only list of int sequences packed into one typed array"""
+
+    def __init__(self):
+        self.data = array('q')  # Every sequence's ints, back to back
+        self.offsets = array('q', [0])  # Sequence i occupies data[offsets[i]:offsets[i + 1]]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return self.data[self.offsets[index]:self.offsets[index + 1]]
+
+    def append(self, values):
+        self.data.extend(values)
+        self.offsets.append(len(self.data))
+
+    def nbytes(self):
+        return len(self.data) * self.data.itemsize + len(self.offsets) * self.offsets.itemsize
+
+
+# Trace file layout, all integers little-endian:
+#   header      HEADER below
+#   metadata    UTF-8 JSON: trace class, its parameters and the visualizer's meta
+#   keyframes   steps (int64 each), then one record per keyframe
+#   events      one record per step after step 0
+#   step index  byte offset (int64) of every INDEX_INTERVAL-th event record
+# A record is its byte length as a varint followed by zigzag varints, one per
+# int. Keyframe record offsets come from a dense int64 table after the steps.
+TRACE_MAGIC = b'ALGTRACE'
+TRACE_VERSION = 1
+HEADER = struct.Struct('<8sHHII4xQQQQQQQQQ')
+INDEX_INTERVAL = 64
+ENCODE_CHUNK = 1 << 20  # Events varint-encoded per NumPy pass when saving
+
+
+def zigzag(values):
+    values = np.asarray(values, dtype=np.int64)
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+
+def varint_sizes(values):
+    sizes = np.ones(len(values), dtype=np.int64)
+    for k in range(1, 10):
+        sizes += values >= np.uint64(1 << (7 * k))
+    return sizes
+
+
+def encode_varints(values):
+    """LEB128 bytes of a uint64 array, and each value's byte count"""
+    sizes = varint_sizes(values)
+    ends = np.cumsum(sizes)
+    byte_index = np.arange(ends[-1] if len(ends) else 0) - np.repeat(ends - sizes, sizes)
+    repeated = np.repeat(values, sizes)
+    out = ((repeated >> (7 * byte_index).astype(np.uint64)) & np.uint64(0x7f)).astype(np.uint8)
+    out[byte_index < np.repeat(sizes - 1, sizes)] |= 0x80
+    return out, sizes
+
+
+def encode_records(data, offsets):
+    """Length-prefixed zigzag varint records for data[offsets[i]:offsets[i + 1]],
+    and the byte offset where each record starts"""
+    values = zigzag(data)
+    cumulative = np.concatenate(([0], np.cumsum(varint_sizes(values))))
+    starts = offsets[:-1] - offsets[0]
+    lengths = cumulative[offsets[1:] - offsets[0]] - cumulative[starts]
+    out, sizes = encode_varints(np.insert(values, starts, lengths.astype(np.uint64)))
+    positions = np.concatenate(([0], np.cumsum(sizes)))[starts + np.arange(len(starts))]
+    return out, positions
+
+
+def read_varint(buffer, pos):
+    result = shift = 0
+    while True:
+        byte = buffer[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def decode_varints(raw):
+    """Signed ints from zigzag varint bytes, as an array('q')"""
+    values = array('q')
+    if len(raw) > 256:
+        # Large keyframes decode in one vectorized pass
+        raw = np.frombuffer(raw, dtype=np.uint8)
+        last = raw < 0x80
+        group = np.concatenate(([0], np.cumsum(last)[:-1]))
+        starts = np.concatenate(([0], np.flatnonzero(last)[:-1] + 1))
+        shifts = ((np.arange(len(raw)) - starts[group]) * 7).astype(np.uint64)
+        unsigned = np.add.reduceat((raw & 0x7f).astype(np.uint64) << shifts, starts)
+        signed = (unsigned >> np.uint64(1)).astype(np.int64) ^ -(unsigned & np.uint64(1)).astype(np.int64)
+        values.frombytes(signed.astype('<i8').tobytes())
+        return values
+    result = shift = 0
+    for byte in raw:
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            values.append((result >> 1) ^ -(result & 1))
+            result = shift = 0
+        else:
+            shift += 7
+    return values
+
+
+class MappedArrays:
+    """Read-only PackedArrays over records in a mapped trace file.
+
+    index[j] is the offset of record j * interval; the records in between are
+    reached by skipping length prefixes. The position after the last record
+    read is kept, so reading consecutive records never rescans.
+    """
+
+    def __init__(self, buffer, start, size, index, interval, count):
+        self.buffer = buffer
+        self.start = start
+        self.size = size
+        self.index = index
+        self.interval = interval
+        self.count = count
+        self.last = (-1, 0)  # (record, offset just past it)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        index = range(self.count)[index]
+        block = index // self.interval
+        last, pos = self.last
+        if not (block * self.interval <= last < index):
+            last, pos = block * self.interval - 1, self.start + int(self.index[block])
+        for _ in range(index - last - 1):
+            length, pos = read_varint(self.buffer, pos)
+            pos += length
+        length, pos = read_varint(self.buffer, pos)
+        self.last = (index, pos + length)
+        return decode_varints(self.buffer[pos:pos + length])
+
+    def nbytes(self):
+        return self.size + len(self.index) * self.index.itemsize
+
+
+class TraceLog:
+    """Compact step trace: integer events with a keyframe index.
+
+    Step 0 is the initial state; step i is reached by applying event i to step
+    i - 1. Events are short sequences of ints packed back to back into one
+    typed array, with an offsets array marking where each starts, so a step
+    costs a few machine words instead of a copy of the whole state. Every
+    KEYFRAME_INTERVAL steps the full state is encoded as ints as well.
+    seek(step) bisects the keyframe steps for the nearest one at or before the
+    target and replays at most KEYFRAME_INTERVAL events from it, or from the
+    last step seeked if that is closer. That cursor makes seeking not thread
+    safe; a second thread seeks its own view() of the trace instead.
+
+    Subclasses define the state: encode() flattens one into ints, decode()
+    rebuilds it, and apply() advances it by one event and returns it.
+    parameters() and from_parameters() carry whatever else apply() needs
+    through save() and open(); `meta` is free-form JSON for the visualizer.
+    """
+
+    KEYFRAME_INTERVAL = 64
+
+    def __init__(self, initial):
+        self.events = PackedArrays()  # Event i is events[i - 1]
+        self.keyframes = PackedArrays()
+        self.keyframe_steps = array('q')
+        self.cursor = None  # (step, state) of the last seek, replayed from when it helps
+        self.meta = {}
+        self.path = None  # Trace file the steps are mapped from, if opened from one
+        self.add_keyframe(0, initial)
+
+    def __len__(self):
+        return len(self.events) + 1
+
+    def encode(self, state):
+        raise NotImplementedError
+
+    def decode(self, values):
+        raise NotImplementedError
+
+    def apply(self, state, event):
+        raise NotImplementedError
+
+    def parameters(self):
+        """JSON-serializable arguments from_parameters() needs to rebuild this trace"""
+        return {}
+
+    @classmethod
+    def from_parameters(cls, parameters):
+        raise NotImplementedError
+
+    def add_keyframe(self, step, state):
+        self.keyframe_steps.append(step)
+        self.keyframes.append(self.encode(state))
+
+    def record(self, event, state):
+        """Append the event leading to the next step; state is the live state after it,
+        only read when a keyframe is due. Returns the new step."""
+        self.events.append(event)
+        step = len(self.events)
+        if step % self.KEYFRAME_INTERVAL == 0:
+            self.add_keyframe(step, state)
+        return step
+
+    def event(self, step):
+        """The ints of the event leading to step (step >= 1)"""
+        return self.events[step - 1]
+
+    def keyframe(self, index):
+        return self.keyframes[index]
+
+    def remember(self, step, state):
+        """Note that state is the state at step, e.g. after the caller moved it there itself"""
+        self.cursor = (step, state)
+
+    def seek(self, step):
+        """State at step. It is shared with the next seek, so treat it as read-only."""
+        step = range(len(self))[step]
+        index = bisect_right(self.keyframe_steps, step) - 1
+        start = self.keyframe_steps[index]
+        if self.cursor is not None and start <= self.cursor[0] <= step:
+            at, state = self.cursor
+        else:
+            at, state = start, self.decode(self.keyframe(index))
+        for i in range(at + 1, step + 1):
+            state = self.apply(state, self.event(i))
+        self.cursor = (step, state)
+        return state
+
+    def view(self):
+        """The same steps with a seek cursor of their own, for seeking from another thread"""
+        view = copy.copy(self)
+        view.cursor = None
+        if self.path is not None:
+            # Mapped records also remember the last one read
+            view.events = copy.copy(self.events)
+            view.keyframes = copy.copy(self.keyframes)
+        return view
+
+    def nbytes(self):
+        return (self.events.nbytes() + self.keyframes.nbytes()
+                + len(self.keyframe_steps) * self.keyframe_steps.itemsize)
+
+    def save(self, path):
+        if self.path is not None:
+            # Mapped steps are already in this format
+            shutil.copyfile(self.path, path)
+            return
+
+        metadata = json.dumps({'kind': type(self).__name__, 'parameters': self.parameters(),
+                               'meta': self.meta}).encode()
+        keyframe_steps = np.frombuffer(self.keyframe_steps, dtype=np.int64)
+        keyframes, keyframe_positions = encode_records(np.frombuffer(self.keyframes.data, dtype=np.int64),
+                                                       np.frombuffer(self.keyframes.offsets, dtype=np.int64))
+        with open(path, 'wb') as f:
+            f.write(bytes(HEADER.size))
+            meta_offset = f.tell()
+            f.write(metadata)
+            keyframe_table = align(f)
+            f.write(keyframe_steps.astype('<i8').tobytes())
+            f.write(keyframe_positions.astype('<i8').tobytes())
+            keyframe_data = f.tell()
+            f.write(keyframes.tobytes())
+
+            # Events are encoded a chunk at a time so saving needs little memory beyond the trace
+            events_offset = f.tell()
+            data = np.frombuffer(self.events.data, dtype=np.int64)
+            offsets = np.frombuffer(self.events.offsets, dtype=np.int64)
+            index = []
+            for first in range(0, len(self.events), ENCODE_CHUNK):
+                last = min(first + ENCODE_CHUNK, len(self.events))
+                out, positions = encode_records(data[offsets[first]:offsets[last]], offsets[first:last + 1])
+                index.append(positions[::INDEX_INTERVAL] + (f.tell() - events_offset))
+                f.write(out.tobytes())
+            events_size = f.tell() - events_offset
+            index = np.concatenate(index) if index else np.empty(0, dtype=np.int64)
+            index_offset = align(f)
+            f.write(index.astype('<i8').tobytes())
+
+            f.seek(0)
+            f.write(HEADER.pack(TRACE_MAGIC, TRACE_VERSION, 0, self.KEYFRAME_INTERVAL, INDEX_INTERVAL,
+                                len(self.events), len(keyframe_steps), meta_offset, len(metadata),
+                                keyframe_table, keyframe_data, events_offset, events_size, index_offset))
+
+    @classmethod
+    def open(cls, path):
+        """Trace saved by save(), with its events and keyframes read from the file on demand"""
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (index_interval, steps, keyframe_count, meta_offset, meta_size, keyframe_table,
+         keyframe_data, events_offset, events_size, index_offset) = read_header(buffer, path)
+        metadata = json.loads(buffer[meta_offset:meta_offset + meta_size])
+        if metadata['kind'] != cls.__name__:
+            raise ValueError(f"{path} holds a {metadata['kind']}, not a {cls.__name__}")
+
+        trace = cls.from_parameters(metadata['parameters'])
+        trace.meta = metadata['meta']
+        trace.path = path
+        trace.cursor = None
+        trace.keyframe_steps = np.frombuffer(buffer, dtype='<i8', count=keyframe_count, offset=keyframe_table)
+        keyframe_index = np.frombuffer(buffer, dtype='<i8', count=keyframe_count,
+                                       offset=keyframe_table + 8 * keyframe_count)
+        trace.keyframes = MappedArrays(buffer, keyframe_data, events_offset - keyframe_data, keyframe_index, 1,
+                                       keyframe_count)
+        index = np.frombuffer(buffer, dtype='<i8', count=-(-steps // index_interval), offset=index_offset)
+        trace.events = MappedArrays(buffer, events_offset, events_size, index, index_interval, steps)
+        return trace
+
+
+def read_header(buffer, path):
+    """Header fields from the index interval on, after checking the magic and version"""
+    if len(buffer) < HEADER.size:
+        raise ValueError(f"{path} is not a trace file")
+    magic, version, _, _, *fields = HEADER.unpack_from(buffer)
+    if magic != TRACE_MAGIC:
+        raise ValueError(f"{path} is not a trace file")
+    if version != TRACE_VERSION:
+        raise ValueError(f"{path} has unsupported trace version {version}")
+    return fields
+
+
+def read_metadata(path):
+    """JSON metadata of a trace file (its 'kind', 'parameters' and 'meta') and its
+    number of steps, without mapping the steps"""
+    with open(path, 'rb') as f:
+        _, events, _, meta_offset, meta_size, *_ = read_header(f.read(HEADER.size), path)
+        f.seek(meta_offset)
+        return json.loads(f.read(meta_size)), events + 1
+
+
+def align(f, size=8):
+    """Pad the file to a multiple of size; returns the new position"""
+    f.write(bytes(-f.tell() % size))
+    return f.tell()
+
+
+class TkTimer:
+    """Repeating timer over Tk's after() with QTimer's start/stop/isActive interface"""
+
+    def __init__(self, widget, callback):
+        self.widget = widget
+        self.callback = callback
+        self.interval = 0
+        self.pending = None
+
+    def start(self, interval=None):
+        self.stop()
+        if interval is not None:
+            self.interval = interval
+        self.pending = self.widget.after(self.interval, self.fire)
+
+    def stop(self):
+        if self.pending is not None:
+            self.widget.after_cancel(self.pending)
+            self.pending = None
+
+    def isActive(self):
+        return self.pending is not None
+
+    def fire(self):
+        # Rearm first, so the callback can stop the timer
+        self.pending = self.widget.after(self.interval, self.fire)
+        self.callback()
+
+
+class PlaybackController:
+    """Step cursor with a play clock, shared by the visualizers.
+
+    show(step) draws a step; length() returns how many steps there are. timer
+    is a QTimer or TkTimer whose timeout the visualizer connects to its own
+    step-forward handler (or to tick()). extend(), if given, computes one more
+    step past the end on demand and returns False once the algorithm has
+    finished, for visualizers that generate their trace as they go.
+    """
+
+    def __init__(self, show, length, timer=None, interval=500, extend=None):
+        self.show = show
+        self.length = length
+        self.timer = timer
+        self.interval = interval
+        self.extend = extend
+        self.position = 0
+        self.playing = False
+
+    def at_start(self):
+        return self.position == 0
+
+    def at_end(self):
+        return self.position >= self.length() - 1
+
+    def seek(self, step):
+        self.position = max(0, min(step, self.length() - 1))
+        self.show(self.position)
+        return self.position
+
+    def next(self):
+        if self.at_end() and not (self.extend and self.extend()):
+            return False
+        self.seek(self.position + 1)
+        return True
+
+    def prev(self):
+        if self.at_start():
+            return False
+        self.seek(self.position - 1)
+        return True
+
+    def first(self):
+        return self.seek(0)
+
+    def last(self):
+        return self.seek(self.length() - 1)
+
+    def play(self):
+        self.playing = True
+        self.timer.start(self.interval)
+
+    def pause(self):
+        self.playing = False
+        self.timer.stop()
+
+    def set_interval(self, interval):
+        self.interval = interval
+        if self.playing:
+            self.timer.start(interval)
+
+    def tick(self):
+        if not self.next():
+            self.pause()
+
+    def rewind(self):
+        """Back to step 0 without drawing, e.g. after the trace was replaced"""
+        self.pause()
+        self.position = 0
@@ -0,0 +1,243 @@
+"""Headless video export of saved algorithm traces.
+
+    python export_trace.py run.trace run.mp4 --workers 8
+
+Frames are drawn with the Agg backend in worker processes. Each worker maps
+the trace file itself and renders a contiguous run of steps, so it seeks once
+and then replays forward. Finished runs are collected in step order and
+streamed into ffmpeg (any format it can write), a GIF, a numbered PNG
+sequence or raw RGBA frames on stdout.
+"""
+import argparse
+import importlib.util
+import multiprocessing
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from algo_trace import read_metadata
+
+# The visualizer script that defines each trace class and its frame_renderer(fig, trace)
+RENDERERS = {
+    'SortTrace': 'sort.py',
+    'TraversalTrace': 'DFS&BFS.py',
+    'MSTTrace': 'kruskal-prim.py',
+    'MatchingTrace': 'Stable_Marriage_Visualization.py',
+}
+
+CHUNK_STEPS = 8  # Frames per worker task; two tasks per worker are kept in flight
+
+# Per-process renderer set up by start_worker: (draw, figure)
+worker = None
+
+
+def load_script(filename):
+    """Import one of the visualizer scripts by path (their file names aren't module names)"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+    spec = importlib.util.spec_from_file_location(re.sub(r'\W', '_', filename[:-3]), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def start_worker(trace_path, kind, size, dpi):
+    global worker
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    module = load_script(RENDERERS[kind])
+    trace = getattr(module, kind).open(trace_path)
+
+    # Agg truncates the figure size to whole pixels, so aim half a pixel over
+    fig = Figure(figsize=((size[0] + 0.5) / dpi, (size[1] + 0.5) / dpi), dpi=dpi)
+    FigureCanvasAgg(fig)
+    worker = (module.frame_renderer(fig, trace), fig)
+
+
+def render_steps(steps, png_pattern=None):
+    """RGBA bytes of each (frame number, step)'s frame, or None after saving them as PNG files"""
+    draw, fig = worker
+    frames = []
+    for index, step in steps:
+        draw(step)
+        if png_pattern is None:
+            frames.append(bytes(fig.canvas.buffer_rgba()))
+        else:
+            # PNG compression is the slow part of a sequence, so it stays in the workers
+            from PIL import Image
+            Image.frombuffer('RGBA', fig.canvas.get_width_height(), fig.canvas.buffer_rgba()).save(
+                png_pattern % index)
+    return frames if png_pattern is None else None
+
+
+class FFmpegWriter:
+    """Pipes raw RGBA frames into an ffmpeg process encoding path"""
+
+    def __init__(self, path, size, fps, ffmpeg='ffmpeg'):
+        executable = shutil.which(ffmpeg)
+        if executable is None:
+            raise RuntimeError(f"{ffmpeg} not found; install ffmpeg or export to .gif, .png or '-'")
+        width, height = size
+        self.process = subprocess.Popen(
+            [executable, '-y', '-loglevel', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgba',
+             '-s', f'{width}x{height}', '-r', str(fps), '-i', '-',
+             # yuv420p plays everywhere but needs even dimensions
+             '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-pix_fmt', 'yuv420p', path],
+            stdin=subprocess.PIPE)
+
+    def write(self, frame):
+        self.process.stdin.write(frame)
+
+    def close(self):
+        self.process.stdin.close()
+        status = self.process.wait()
+        if status:
+            raise RuntimeError(f"ffmpeg exited with status {status}")
+
+
+class RawWriter:
+    """Raw RGBA frames on stdout, for piping into an ffmpeg command of your own"""
+
+    def __init__(self, size, fps):
+        width, height = size
+        print(f"Raw frames: ffmpeg -f rawvideo -pix_fmt rgba -s {width}x{height} -r {fps} -i - ...",
+              file=sys.stderr)
+        self.stream = sys.stdout.buffer
+
+    def write(self, frame):
+        self.stream.write(frame)
+
+    def close(self):
+        self.stream.flush()
+
+
+class GifWriter:
+    """Animated GIF through Pillow. Frames are palettized as they arrive but the
+    file is only written at the end, so keep GIFs to a few thousand frames."""
+
+    def __init__(self, path, size, fps):
+        self.path = path
+        self.size = size
+        self.duration = 1000 / fps
+        self.frames = []
+
+    def write(self, frame):
+        from PIL import Image
+        image = Image.frombuffer('RGBA', self.size, frame).convert('RGB')
+        self.frames.append(image.quantize(method=Image.Quantize.MEDIANCUT))
+
+    def close(self):
+        if self.frames:
+            self.frames[0].save(self.path, save_all=True, append_images=self.frames[1:],
+                                duration=self.duration, loop=0)
+
+
+def png_pattern(output):
+    """Frame file name pattern for a PNG sequence output, or None for a stream"""
+    if '%' in output:
+        return output
+    # A trailing separator names a directory that doesn't have to exist yet
+    if os.path.isdir(output) or output.endswith((os.sep, '/')):
+        return os.path.join(output, 'frame_%06d.png')
+    if output.lower().endswith('.png'):
+        return output[:-4] + '_%06d.png'
+    return None
+
+
+def open_writer(output, size, fps, ffmpeg='ffmpeg'):
+    if output == '-':
+        return RawWriter(size, fps)
+    if output.lower().endswith('.gif'):
+        return GifWriter(output, size, fps)
+    return FFmpegWriter(output, size, fps, ffmpeg)
+
+
+def positive_int(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {value}")
+    return value
+
+
+def export_trace(trace_path, output, fps=30, size=(960, 480), dpi=100, workers=None,
+                 start=0, stop=None, stride=1, ffmpeg='ffmpeg'):
+    """Render steps start:stop:stride of a saved trace into output; returns the frame count"""
+    metadata, length = read_metadata(trace_path)
+    kind = metadata['kind']
+    if kind not in RENDERERS:
+        raise ValueError(f"No renderer for {kind} traces")
+
+    frames = list(enumerate(range(*slice(start, stop, stride).indices(length))))
+    chunks = (frames[i:i + CHUNK_STEPS] for i in range(0, len(frames), CHUNK_STEPS))
+    pattern = png_pattern(output)
+    if pattern:
+        os.makedirs(os.path.dirname(pattern) or '.', exist_ok=True)
+    writer = None if pattern else open_writer(output, size, fps, ffmpeg)
+    workers = workers or os.cpu_count() or 1
+
+    # Spawned workers start clean of the caller's GUI or thread state
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=start_worker, initargs=(trace_path, kind, size, dpi))
+    pending = deque()
+
+    def submit():
+        chunk = next(chunks, None)
+        if chunk:
+            pending.append((executor.submit(render_steps, chunk, pattern), len(chunk)))
+
+    written = 0
+    report = 1000
+    began = time.perf_counter()
+    try:
+        for _ in range(2 * workers):
+            submit()
+
+        # Results are taken in submission order, so frames reach the writer in step order
+        while pending:
+            future, count = pending.popleft()
+            rendered = future.result()
+            submit()
+            if writer is not None:
+                for frame in rendered:
+                    writer.write(frame)
+
+            written += count
+            if written >= report or written == len(frames):
+                report += 1000
+                print(f"{written:,}/{len(frames):,} frames, {written / (time.perf_counter() - began):.1f} fps",
+                      file=sys.stderr)
+    finally:
+        executor.shutdown(cancel_futures=True)
+        if writer is not None:
+            writer.close()
+    return len(frames)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render a saved algorithm trace to video without a display")
+    parser.add_argument("trace", help="trace file saved from a visualizer")
+    parser.add_argument("output",
+                        help="video file for ffmpeg (.mp4, .webm, ...), .gif, a PNG sequence "
+                             "(frames/%%06d.png, a directory such as frames/, or name.png), or - for raw RGBA on stdout")
+    parser.add_argument("--fps", type=float, default=30, help="frames per second (default: 30)")
+    parser.add_argument("--size", default="960x480", metavar="WxH", help="frame size in pixels (default: 960x480)")
+    parser.add_argument("--dpi", type=int, default=100, help="figure resolution (default: 100)")
+    parser.add_argument("--workers", type=positive_int, help="rendering processes (default: all CPUs)")
+    parser.add_argument("--start", type=int, default=0, help="first step to render")
+    parser.add_argument("--stop", type=int, help="step to stop before (default: the end)")
+    parser.add_argument("--stride", type=positive_int, default=1, help="render every STRIDE-th step")
+    parser.add_argument("--ffmpeg", default="ffmpeg", help="ffmpeg executable (default: ffmpeg on PATH)")
+    args = parser.parse_args()
+
+    width, height = (int(x) for x in args.size.lower().split('x'))
+    began = time.perf_counter()
+    count = export_trace(args.trace, args.output, args.fps, (width, height), args.dpi, args.workers,
+                         args.start, args.stop, args.stride, args.ffmpeg)
+    print(f"Wrote {count:,} frames to {args.output} in {time.perf_counter() - began:.1f} s", file=sys.stderr)
@@ -1,33 +1,868 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import networkx as nx
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.animation import FuncAnimation
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import heapq
+import multiprocessing
 import numpy as np
-import random
+import queue
+import threading
 import time
+import tracemalloc
+from algo_trace import PlaybackController, TkTimer, TraceLog
 
-class AnimatedMSTVisualizer:
+# Edge list storage for MST graphs: one record per undirected edge (u < v)
+EDGE_DTYPE = np.dtype([('u', np.int32), ('v', np.int32), ('weight', np.int32)])
+
+TRACE_FILETYPES = [("Algorithm traces", "*.trace"), ("All files", "*.*")]
+
+
+class UnionFind:
+    def __init__(self, n_nodes):
+        self.parent = list(range(n_nodes))
+        self.rank = [0] * n_nodes
+        self.find_calls = 0
+        self.union_calls = 0
+
+    def find(self, x):
+        self.find_calls += 1
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+        # Path compression
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, x, y):
+        self.union_calls += 1
+        px, py = self.find(x), self.find(y)
+        if px == py:
+            return False
+        if self.rank[px] < self.rank[py]:
+            px, py = py, px
+        self.parent[py] = px
+        if self.rank[px] == self.rank[py]:
+            self.rank[px] += 1
+        return True
+
+    def get_components(self):
+        components = {}
+        for node in range(len(self.parent)):
+            components.setdefault(self.find(node), []).append(node)
+        return list(components.values())
+
+
+def random_edge_array(n_nodes, prob, rng, min_weight=1, max_weight=20):
+    """Generate a connected G(n, p) graph as a structured (u, v, weight) edge array"""
+    u, v = np.triu_indices(n_nodes, k=1)
+    keep = rng.random(u.size) < prob
+    u, v = u[keep], v[keep]
+
+    # Ensure graph is connected by bridging consecutive components
+    uf = UnionFind(n_nodes)
+    for a, b in zip(u.tolist(), v.tolist()):
+        uf.union(a, b)
+    components = uf.get_components()
+    if len(components) > 1:
+        bridges = np.array([(rng.choice(components[i]), rng.choice(components[i + 1]))
+                            for i in range(len(components) - 1)])
+        bridges.sort(axis=1)
+        u = np.concatenate([u, bridges[:, 0]])
+        v = np.concatenate([v, bridges[:, 1]])
+
+    edges = np.empty(u.size, dtype=EDGE_DTYPE)
+    edges['u'] = u
+    edges['v'] = v
+    edges['weight'] = rng.integers(min_weight, max_weight + 1, size=u.size)
+    return edges
+
+
+def edge_adjacency(n_nodes, edges):
+    """Adjacency lists of (neighbor, weight, edge id) triples built from an edge array"""
+    adjacency = [[] for _ in range(n_nodes)]
+    for edge_id, (u, v, w) in enumerate(edges.tolist()):
+        adjacency[u].append((v, w, edge_id))
+        adjacency[v].append((u, w, edge_id))
+    return adjacency
+
+
+# MST trace event kinds and the step type each one is drawn as
+INITIAL, START, CANDIDATES, CONSIDER, ADD, REJECT, COMPLETE = range(7)
+STEP_TYPES = ['initial', 'start', 'candidates', 'consider', 'add_edge', 'reject', 'complete']
+
+
+class MSTTrace(TraceLog):
+    """Compact Prim's/Kruskal's animation trace: one edge event per step.
+
+    Step 0 is the INITIAL step and every later step is a (kind, edge id, node)
+    event. MST edges and visited nodes only ever grow, so the state at any step
+    is a prefix of ``added`` and ``visit_order``, and the TraceLog state is
+    just the (added, visited, considered, total weight) prefix counters.
+    Descriptions are generated only for the step being displayed.
+    """
+
+    KEYFRAME_INTERVAL = 32
+
+    def __init__(self, algorithm, n_nodes, edges):
+        self.algorithm = algorithm  # 'prim' or 'kruskal'
+        self.n_nodes = n_nodes
+        self.edges = edges
+        self.added = array('i')  # Edge ids in the order they joined the MST
+        self.visit_order = array('i')  # Prim's visited nodes in visiting order
+        self.counters = (0, 0, 0, 0)
+        super().__init__(self.counters)
+    
+    def parameters(self):
+        return {'algorithm': self.algorithm, 'n_nodes': self.n_nodes, 'edges': self.edges.tolist(),
+                'added': self.added.tolist(), 'visit_order': self.visit_order.tolist()}
+    
+    @classmethod
+    def from_parameters(cls, parameters):
+        edges = np.array([tuple(edge) for edge in parameters['edges']], dtype=EDGE_DTYPE)
+        trace = cls(parameters['algorithm'], parameters['n_nodes'], edges)
+        trace.added = array('i', parameters['added'])
+        trace.visit_order = array('i', parameters['visit_order'])
+        return trace
+
+    def encode(self, counters):
+        return counters
+
+    def decode(self, values):
+        return tuple(values)
+
+    def apply(self, counters, event):
+        return self.advance(counters, *event)
+
+    def advance(self, counters, kind, edge_id, node):
+        added, visited, considered, total_weight = counters
+        if kind == START:
+            visited += 1
+        elif kind == ADD:
+            added += 1
+            total_weight += int(self.edges['weight'][edge_id])
+            if self.algorithm == 'prim':
+                visited += 1
+        elif kind == CONSIDER:
+            considered += 1
+        return added, visited, considered, total_weight
+
+    def add(self, kind, edge_id=-1, node=-1):
+        if kind == START:
+            self.visit_order.append(node)
+        elif kind == ADD:
+            self.added.append(edge_id)
+            if self.algorithm == 'prim':
+                self.visit_order.append(node)
+
+        self.counters = self.advance(self.counters, kind, edge_id, node)
+        self.record((kind, edge_id, node), self.counters)
+
+    def event(self, step):
+        return super().event(step) if step else (INITIAL, -1, -1)
+
+    def edge(self, edge_id):
+        u, v, w = self.edges[edge_id].tolist()
+        return u, v, w
+
+    def oriented_edge(self, edge_id, node):
+        # (tree endpoint, newly reached endpoint) for Prim's edges
+        u, v, _ = self.edge(edge_id)
+        return (v, u) if node == u else (u, v)
+
+    def candidate_edges(self, visited):
+        # All edges from visited to unvisited nodes, in heap order (weight, visited end, unvisited end)
+        in_tree = np.zeros(self.n_nodes, dtype=bool)
+        in_tree[list(visited)] = True
+        crossing = self.edges[in_tree[self.edges['u']] != in_tree[self.edges['v']]]
+        inside = np.where(in_tree[crossing['u']], crossing['u'], crossing['v'])
+        outside = np.where(in_tree[crossing['u']], crossing['v'], crossing['u'])
+        order = np.lexsort((outside, inside, crossing['weight']))
+        return list(zip(inside[order].tolist(), outside[order].tolist(), crossing['weight'][order].tolist()))
+
+    def __getitem__(self, index):
+        index = range(len(self))[index]
+        added, visited_count, _, total_weight = self.seek(index)
+        kind, edge_id, node = self.event(index)
+        if self.algorithm == 'prim':
+            # visit_order[i + 1] is the node reached through added[i]
+            mst_edges = [self.oriented_edge(i, v) for i, v in zip(self.added[:added], self.visit_order[1:])]
+        else:
+            mst_edges = [self.edge(i)[:2] for i in self.added[:added]]
+        step = {'type': STEP_TYPES[kind], 'mst_edges': mst_edges, 'current_edge': None,
+                'total_weight': total_weight}
+
+        if self.algorithm == 'prim':
+            step['visited'] = set(self.visit_order[:visited_count])
+            if kind in (CANDIDATES, ADD):
+                step['current_edge'] = self.oriented_edge(edge_id, node)
+            if kind == CANDIDATES:
+                step['candidate_edges'] = self.candidate_edges(step['visited'])
+        else:
+            forest = UnionFind(self.n_nodes)
+            for u, v in mst_edges:
+                forest.union(u, v)
+            step['components'] = forest.get_components()
+            if edge_id >= 0:
+                step['current_edge'] = self.edge(edge_id)[:2]
+        return step
+
+    def describe(self, index):
+        index = range(len(self))[index]
+        added, visited_count, considered, total_weight = self.seek(index)
+        kind, edge_id, node = self.event(index)
+
+        if self.algorithm == 'prim':
+            if kind == INITIAL:
+                return "Starting Prim's Algorithm. We'll grow the MST by adding the minimum weight edge from visited nodes."
+            if kind == START:
+                return f"Step 1: Start with node {node}. Mark it as visited (green)."
+            if kind == CANDIDATES:
+                candidates = self.candidate_edges(self.visit_order[:visited_count])
+                min_edge = self.oriented_edge(edge_id, node)
+                return (f"Step {added + 2}a: Consider all edges from visited nodes to unvisited nodes. "
+                        f"Candidates: {candidates}. Minimum is {min_edge} with weight {self.edge(edge_id)[2]}.")
+            if kind == ADD:
+                min_edge = self.oriented_edge(edge_id, node)
+                return (f"Step {added + 1}b: Add edge {min_edge} with weight {self.edge(edge_id)[2]} to MST. "
+                        f"Mark node {node} as visited. Total weight: {total_weight}")
+            return f"Prim's Algorithm Complete! MST has {added} edges with total weight {total_weight}."
+
+        if kind == INITIAL:
+            sorted_edges = self.edges[np.argsort(self.edges['weight'], kind='stable')].tolist()
+            return f"Starting Kruskal's Algorithm. Sort all edges by weight: {sorted_edges}"
+        if kind == COMPLETE:
+            return f"Kruskal's Algorithm Complete! MST has {added} edges with total weight {total_weight}."
+        u, v, weight = self.edge(edge_id)
+        if kind == CONSIDER:
+            return f"Step {considered}: Consider edge ({u}, {v}) with weight {weight}. Check if it creates a cycle."
+        if kind == ADD:
+            return f"Step {considered}: Add edge ({u}, {v}) with weight {weight}. No cycle created. Total weight: {total_weight}"
+        return f"Step {considered}: Reject edge ({u}, {v}) - would create a cycle!"
+
+
+class StepList(list):
+    """Plain list of step dicts (with stored descriptions) usable wherever an MSTTrace is"""
+
+    def describe(self, index):
+        return self[index]['description']
+
+    def view(self):
+        # Steps are never changed after they are built, so every thread can share them
+        return self
+
+
+def prims_steps(n_nodes, edges, record=True):
+    """Prim's algorithm with a binary heap; returns (MSTTrace or None, operation counts)"""
+    adjacency = edge_adjacency(n_nodes, edges)
+    stats = {'edges_examined': 0, 'heap_pushes': 0, 'heap_pops': 0}
+    trace = MSTTrace('prim', n_nodes, edges) if record else None
+    visited = set()
+    heap = []
+    
+    def visit(node):
+        visited.add(node)
+        for neighbor, weight, edge_id in adjacency[node]:
+            stats['edges_examined'] += 1
+            if neighbor not in visited:
+                heapq.heappush(heap, (weight, node, neighbor, edge_id))
+                stats['heap_pushes'] += 1
+    
+    # Start from node 0
+    start_node = 0
+    visit(start_node)
+    if record:
+        trace.add(START, node=start_node)
+    
+    while len(visited) < n_nodes and heap:
+        # Pop until the minimum edge leaves the tree (stale entries are skipped lazily)
+        while True:
+            _, u, v, edge_id = heapq.heappop(heap)
+            stats['heap_pops'] += 1
+            if v not in visited:
+                break
+        
+        # Candidate edges are derived from the visited set when the step is displayed
+        if record:
+            trace.add(CANDIDATES, edge_id, v)
+            trace.add(ADD, edge_id, v)
+        visit(v)
+    
+    if record:
+        trace.add(COMPLETE)
+    return trace, stats
+
+
+def kruskals_steps(n_nodes, edges, record=True):
+    """Kruskal's algorithm with union-find; returns (MSTTrace or None, operation counts)"""
+    # Kruskal's ordering: indices of edges sorted by weight
+    order = np.argsort(edges['weight'], kind='stable')
+    trace = MSTTrace('kruskal', n_nodes, edges) if record else None
+    
+    uf = UnionFind(n_nodes)
+    mst_size = 0
+    edges_examined = 0
+    
+    for edge_id, (u, v, _) in zip(order.tolist(), edges[order].tolist()):
+        edges_examined += 1
+        if record:
+            trace.add(CONSIDER, edge_id)
+        
+        if uf.union(u, v):
+            mst_size += 1
+            if record:
+                trace.add(ADD, edge_id)
+            if mst_size == n_nodes - 1:
+                break
+        elif record:
+            trace.add(REJECT, edge_id)
+    
+    if record:
+        trace.add(COMPLETE)
+    stats = {'edges_examined': edges_examined, 'find_calls': uf.find_calls, 'union_calls': uf.union_calls}
+    return trace, stats
+
+
+def minimum_spanning_tree(n_nodes, edges):
+    """Edge keys (u, v) of a minimum spanning tree, using Kruskal's ordering"""
+    uf = UnionFind(n_nodes)
+    tree = set()
+    for u, v, _ in edges[np.argsort(edges['weight'], kind='stable')].tolist():
+        if uf.union(u, v):
+            tree.add((u, v))
+            if len(tree) == n_nodes - 1:
+                break
+    return tree
+
+
+class DynamicMST:
+    """Keeps an MST up to date under edge insertions, deletions and weight changes.
+
+    Insertions and weight decreases use the cycle property (the new edge swaps
+    out the heaviest edge on its tree path), deletions and weight increases of
+    tree edges search for the lightest replacement edge across the cut. Every
+    update returns animation steps in the same format as Prim's steps.
+    """
+
+    def __init__(self, n_nodes, edges):
+        self.n_nodes = n_nodes
+        self.edges = edges.copy()
+        self.weights = {(u, v): w for u, v, w in edges.tolist()}
+        self.tree = minimum_spanning_tree(n_nodes, edges)
+
+    def total_weight(self):
+        return sum(self.weights[key] for key in self.tree)
+
+    def step(self, step_type, description, current_edge=None, candidate_edges=None, visited=()):
+        return {
+            'type': step_type,
+            'visited': set(visited),
+            'mst_edges': sorted(self.tree),
+            'current_edge': current_edge,
+            'candidate_edges': candidate_edges,
+            'description': description,
+            'total_weight': self.total_weight()
+        }
+
+    def edge_key(self, u, v):
+        if u == v or not (0 <= u < self.n_nodes and 0 <= v < self.n_nodes):
+            raise ValueError(f"Edge endpoints must be two different nodes between 0 and {self.n_nodes - 1}")
+        return (min(u, v), max(u, v))
+
+    def edge_index(self, key):
+        return np.flatnonzero((self.edges['u'] == key[0]) & (self.edges['v'] == key[1]))[0]
+
+    def tree_adjacency(self, skip=None):
+        adjacency = [[] for _ in range(self.n_nodes)]
+        for a, b in self.tree:
+            if (a, b) != skip:
+                adjacency[a].append(b)
+                adjacency[b].append(a)
+        return adjacency
+
+    def tree_path(self, source, target):
+        # BFS over the tree; returns the edge keys on the unique source-target path
+        adjacency = self.tree_adjacency()
+        parent = {source: None}
+        frontier = [source]
+        while target not in parent:
+            next_frontier = []
+            for node in frontier:
+                for neighbor in adjacency[node]:
+                    if neighbor not in parent:
+                        parent[neighbor] = node
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+        path = []
+        node = target
+        while parent[node] is not None:
+            path.append((min(node, parent[node]), max(node, parent[node])))
+            node = parent[node]
+        return path
+
+    def cut_side(self, key):
+        # Nodes still connected to key[0] once tree edge key is removed
+        adjacency = self.tree_adjacency(skip=key)
+        side = {key[0]}
+        stack = [key[0]]
+        while stack:
+            for neighbor in adjacency[stack.pop()]:
+                if neighbor not in side:
+                    side.add(neighbor)
+                    stack.append(neighbor)
+        return side
+
+    def crossing_edges(self, side, exclude=None):
+        in_side = np.zeros(self.n_nodes, dtype=bool)
+        in_side[list(side)] = True
+        crossing = self.edges[in_side[self.edges['u']] != in_side[self.edges['v']]]
+        if exclude is not None:
+            crossing = crossing[(crossing['u'] != exclude[0]) | (crossing['v'] != exclude[1])]
+        return crossing
+
+    def insert(self, u, v, weight):
+        key = self.edge_key(u, v)
+        if key in self.weights:
+            raise ValueError(f"Edge {key} already exists")
+
+        self.edges = np.concatenate([self.edges, np.array([(*key, weight)], dtype=EDGE_DTYPE)])
+        self.weights[key] = weight
+        steps = [self.step('insert', f"Insert edge {key} with weight {weight}.", current_edge=key)]
+        return steps + self.offer_edge(key)
+
+    def remove(self, u, v):
+        key = self.edge_key(u, v)
+        if key not in self.weights:
+            raise ValueError(f"Edge {key} does not exist")
+
+        side = None
+        if key in self.tree:
+            side = self.cut_side(key)
+            if self.crossing_edges(side, exclude=key).size == 0:
+                raise ValueError(f"Removing edge {key} would disconnect the graph")
+
+        weight = self.weights.pop(key)
+        self.edges = np.delete(self.edges, self.edge_index(key))
+        self.tree.discard(key)
+        steps = [self.step('remove', f"Remove edge {key} with weight {weight}.", current_edge=key)]
+        if side is None:
+            steps.append(self.step('complete', f"{key} was not in the MST, so the tree is unchanged. "
+                                               f"Total weight: {self.total_weight()}"))
+            return steps
+        return steps + self.reconnect(key, side)
+
+    def set_weight(self, u, v, weight):
+        key = self.edge_key(u, v)
+        if key not in self.weights:
+            raise ValueError(f"Edge {key} does not exist")
+
+        old_weight = self.weights[key]
+        self.weights[key] = weight
+        self.edges['weight'][self.edge_index(key)] = weight
+        steps = [self.step('reweight', f"Change the weight of {key} from {old_weight} to {weight}.",
+                           current_edge=key)]
+
+        if key in self.tree and weight > old_weight:
+            return steps + self.reconnect(key, self.cut_side(key))
+        if key not in self.tree and weight < old_weight:
+            return steps + self.offer_edge(key)
+
+        steps.append(self.step('complete', f"{'Tree' if key in self.tree else 'Non-tree'} edge {key} "
+                                           f"got {'lighter' if weight < old_weight else 'heavier'}, so the tree "
+                                           f"is unchanged. Total weight: {self.total_weight()}"))
+        return steps
+
+    def offer_edge(self, key):
+        # Cycle property: the heaviest edge on the cycle closed by key is not in the MST
+        weight = self.weights[key]
+        path = self.tree_path(*key)
+        heaviest = max(path, key=self.weights.get)
+        steps = [self.step('cycle',
+                           f"The tree path {key[0]} -> {key[1]} closes a cycle with {key}. "
+                           f"Heaviest edge on the path is {heaviest} with weight {self.weights[heaviest]}.",
+                           current_edge=heaviest,
+                           candidate_edges=[(a, b, self.weights[(a, b)]) for a, b in path])]
+
+        if weight < self.weights[heaviest]:
+            self.tree.remove(heaviest)
+            self.tree.add(key)
+            steps.append(self.step('add_edge', f"Swap: {key} (weight {weight}) replaces {heaviest} "
+                                               f"(weight {self.weights[heaviest]}). Total weight: {self.total_weight()}",
+                                   current_edge=key))
+        else:
+            steps.append(self.step('reject', f"{key} (weight {weight}) is not lighter than {heaviest}, "
+                                             f"so the tree is unchanged. Total weight: {self.total_weight()}",
+                                   current_edge=key))
+        return steps
+
+    def reconnect(self, key, side):
+        # Replacement search: the lightest edge across the cut left by removing key from the tree
+        self.tree.discard(key)
+        steps = [self.step('cut', f"Taking {key} out of the tree splits it into {sorted(side)} and the rest.",
+                           current_edge=key, visited=side)]
+
+        crossing = self.crossing_edges(side)
+        best = crossing[np.argmin(crossing['weight'])]
+        best_key = (int(best['u']), int(best['v']))
+        steps.append(self.step('candidates', f"Edges crossing the cut: {crossing.tolist()}. Lightest is "
+                                             f"{best_key} with weight {int(best['weight'])}.",
+                               current_edge=best_key, candidate_edges=crossing.tolist(), visited=side))
+
+        self.tree.add(best_key)
+        if best_key == key:
+            description = f"{key} is still the lightest edge across the cut and stays in the MST."
+        else:
+            description = f"Add replacement edge {best_key}."
+        steps.append(self.step('add_edge', f"{description} Total weight: {self.total_weight()}",
+                               current_edge=best_key, visited=side))
+        return steps
+
+
+# Every engine takes (n_nodes, edges, record) and returns (steps, operation counts)
+MST_ENGINES = {
+    "Prim's Algorithm": prims_steps,
+    "Kruskal's Algorithm": kruskals_steps,
+}
+
+
+def race_engine(name, n_nodes, edges):
+    """Worker-process entry point: time and profile one engine, then record its trace"""
+    engine = MST_ENGINES[name]
+    
+    # Timed run without trace recording or allocation tracing
+    start = time.perf_counter()
+    _, stats = engine(n_nodes, edges, record=False)
+    stats['wall_time'] = time.perf_counter() - start
+    
+    tracemalloc.start()
+    engine(n_nodes, edges, record=False)
+    stats['peak_memory'] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    
+    trace, _ = engine(n_nodes, edges)
+    return name, trace, stats
+
+
+def format_engine_stats(stats):
+    counts = ", ".join(f"{key.replace('_', ' ')} {value}" for key, value in stats.items()
+                       if key not in ('wall_time', 'peak_memory'))
+    return f"{stats['wall_time'] * 1000:.3f} ms, peak {stats['peak_memory'] / 1024:.1f} KB, {counts}"
+
+
+class RaceFrames:
+    """Lockstep view over several engines' traces; shorter traces hold their final step"""
+
+    def __init__(self, results):
+        self.results = results
+        self.length = max(len(trace) for _, trace, _ in results)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        return {'type': 'race',
+                'frames': [(name, trace[min(index, len(trace) - 1)], stats) for name, trace, stats in self.results]}
+
+    def view(self):
+        return RaceFrames([(name, trace.view(), stats) for name, trace, stats in self.results])
+
+    def describe(self, index):
+        summary = "\n".join(f"{name}: {format_engine_stats(stats)}" for name, _, stats in self.results)
+        steps = "\n".join(f"{name}: {trace.describe(min(index, len(trace) - 1))}" for name, trace, _ in self.results)
+        return f"{summary}\n\n{steps}"
+
+
+class FrameCache:
+    """Pre-renders animation frames on a background thread with off-screen Agg canvases.
+
+    Frames are kept as RGBA buffer regions keyed by step index, evicted least
+    recently used once they exceed ``max_bytes``, and blitted into the Tk canvas
+    on demand. ``invalidate`` drops everything when the steps or graph change and
+    hands over the ``render_frame(fig, index)`` for the new ones, which must only
+    read state the Tk thread no longer touches (see ``MSTDrawing.snapshot``).
+    """
+
+    def __init__(self, figure, lookahead=4, max_bytes=192 * 2 ** 20):
+        self.render_frame = None
+        self.lookahead = lookahead
+        self.max_bytes = max_bytes
+        self.frames = OrderedDict()
+        self.lock = threading.Lock()
+        # Most recent requests first, so scrubbing doesn't wait behind stale prefetches
+        self.requests = queue.LifoQueue()
+        self.generation = 0
+        self.resize(figure)
+        threading.Thread(target=self.worker, daemon=True).start()
+
+    def resize(self, figure):
+        with self.lock:
+            self.figsize = tuple(figure.get_size_inches())
+            self.dpi = figure.dpi
+            self.frame_bytes = int(figure.bbox.width) * int(figure.bbox.height) * 4
+            self.generation += 1
+            self.frames.clear()
+
+    def invalidate(self, render_frame):
+        with self.lock:
+            self.render_frame = render_frame
+            self.generation += 1
+            self.frames.clear()
+
+    def get(self, index):
+        with self.lock:
+            frame = self.frames.get(index)
+            if frame is not None:
+                self.frames.move_to_end(index)
+            return frame
+
+    def put(self, index, frame):
+        with self.lock:
+            self.store(index, frame)
+
+    def store(self, index, frame):
+        # Caller holds the lock
+        self.frames[index] = frame
+        self.frames.move_to_end(index)
+        while len(self.frames) > 1 and len(self.frames) * self.frame_bytes > self.max_bytes:
+            self.frames.popitem(last=False)
+
+    def prefetch(self, indices):
+        # indices are in priority order; the LIFO queue serves the last one put first
+        with self.lock:
+            generation = self.generation
+            missing = [index for index in indices if index >= 0 and index not in self.frames]
+        for index in reversed(missing):
+            self.requests.put((generation, index))
+
+    def worker(self):
+        fig = canvas = None
+        fig_key = None
+        while True:
+            generation, index = self.requests.get()
+            with self.lock:
+                if generation != self.generation or index in self.frames:
+                    continue
+                key = (self.figsize, self.dpi)
+                render_frame = self.render_frame
+
+            if key != fig_key:
+                fig = Figure(figsize=key[0], dpi=key[1])
+                canvas = FigureCanvasAgg(fig)
+                fig_key = key
+
+            render_frame(fig, index)
+            canvas.draw()
+            frame = canvas.copy_from_bbox(fig.bbox)
+
+            with self.lock:
+                if generation == self.generation:
+                    self.store(index, frame)
+
+
+class MSTDrawing:
+    """Draws MST animation steps onto any figure.
+    
+    Shared by the Tk visualizer (its own figure and the off-screen frame
+    cache) and headless export. Reads n_nodes, edges, graph, edge_labels, pos,
+    animation_steps and algorithm_name.
+    """
+    
+    def build_display_graph(self, layout=True):
+        # networkx graph, edge labels and layout are only needed for drawing
+        self.graph = nx.Graph()
+        self.graph.add_nodes_from(range(self.n_nodes))
+        self.graph.add_edges_from(zip(self.edges['u'].tolist(), self.edges['v'].tolist()))
+        self.edge_labels = {(u, v): w for u, v, w in self.edges.tolist()}
+        
+        # Generate positions for consistent layout; edge edits keep the current one
+        if layout:
+            self.pos = nx.spring_layout(self.graph, seed=42, k=2, iterations=50)
+    
+    def layout_axes(self, fig, count):
+        # Same layout for the Tk figure and off-screen Agg figures, so cached frames match
+        fig.clear()
+        fig.suptitle("Animated Minimum Spanning Tree Algorithm")
+        return fig.subplots(1, count, squeeze=False)[0]
+    
+    def render_frame(self, fig, index):
+        # Draws one animation step onto any figure (the Tk figure or an off-screen Agg figure)
+        step = self.animation_steps[index]
+        if step['type'] == 'race':
+            axes = self.layout_axes(fig, len(step['frames']))
+            for ax, (name, sub_step, stats) in zip(axes, step['frames']):
+                self.draw_step(ax, sub_step, name, stats)
+        else:
+            self.draw_step(self.layout_axes(fig, 1)[0], step, getattr(self, 'algorithm_name', 'MST Algorithm'))
+    
+    def draw_step(self, ax, step, algorithm_name, stats=None):
+        # Kruskal's steps color union-find components; Prim's and dynamic updates color visited nodes
+        if 'components' in step:
+            self.draw_kruskals_step(step, ax)
+        else:
+            self.draw_prims_step(step, ax)
+        
+        title = f"{algorithm_name} - Total Weight: {step['total_weight']}"
+        if stats:
+            title += f"\n{stats['wall_time'] * 1000:.3f} ms, {stats['edges_examined']} edges examined"
+        ax.set_title(title)
+        ax.axis('off')
+    
+    def draw_prims_step(self, step, ax):
+        # Draw all edges in light gray
+        nx.draw_networkx_edges(self.graph, self.pos, ax=ax, alpha=0.2, edge_color='lightgray')
+        
+        # Color nodes based on visited status
+        node_colors = []
+        for node in self.graph.nodes():
+            if node in step.get('visited', set()):
+                node_colors.append('lightgreen')
+            else:
+                node_colors.append('lightblue')
+        
+        # Draw nodes
+        nx.draw_networkx_nodes(self.graph, self.pos, ax=ax, node_color=node_colors, 
+                              node_size=700, alpha=0.8)
+        nx.draw_networkx_labels(self.graph, self.pos, ax=ax, font_size=12, font_weight='bold')
+        
+        # Draw MST edges in red
+        if step['mst_edges']:
+            nx.draw_networkx_edges(self.graph, self.pos, ax=ax, edgelist=step['mst_edges'], 
+                                  edge_color='red', width=3)
+        
+        # Highlight current edge being considered
+        if step.get('current_edge'):
+            nx.draw_networkx_edges(self.graph, self.pos, ax=ax, 
+                                  edgelist=[step['current_edge']], 
+                                  edge_color='orange', width=4, alpha=0.8)
+        
+        # Highlight candidate edges
+        if step.get('candidate_edges'):
+            candidate_edge_list = [(u, v) for u, v, w in step['candidate_edges']]
+            nx.draw_networkx_edges(self.graph, self.pos, ax=ax, 
+                                  edgelist=candidate_edge_list, 
+                                  edge_color='yellow', width=2, alpha=0.6)
+        
+        # Draw edge labels
+        nx.draw_networkx_edge_labels(self.graph, self.pos, self.edge_labels, ax=ax, font_size=10)
+    
+    def draw_kruskals_step(self, step, ax):
+        # Draw all edges in light gray
+        nx.draw_networkx_edges(self.graph, self.pos, ax=ax, alpha=0.2, edge_color='lightgray')
+        
+        # Color nodes based on components
+        if step.get('components'):
+            colors = ['lightblue', 'lightgreen', 'lightcoral', 'lightyellow', 'lightpink', 
+                     'lightcyan', 'wheat', 'lavender', 'mistyrose', 'honeydew']
+            node_colors = {}
+            for i, component in enumerate(step['components']):
+                color = colors[i % len(colors)]
+                for node in component:
+                    node_colors[node] = color
+            
+            node_color_list = [node_colors.get(node, 'lightgray') for node in self.graph.nodes()]
+        else:
+            node_color_list = ['lightblue'] * len(self.graph.nodes())
+        
+        # Draw nodes
+        nx.draw_networkx_nodes(self.graph, self.pos, ax=ax, node_color=node_color_list, 
+                              node_size=700, alpha=0.8)
+        nx.draw_networkx_labels(self.graph, self.pos, ax=ax, font_size=12, font_weight='bold')
+        
+        # Draw MST edges in red
+        if step['mst_edges']:
+            nx.draw_networkx_edges(self.graph, self.pos, ax=ax, edgelist=step['mst_edges'], 
+                                  edge_color='red', width=3)
+        
+        # Highlight current edge
+        if step.get('current_edge'):
+            color = 'orange' if step['type'] == 'consider' else ('green' if step['type'] == 'add_edge' else 'red')
+            width = 4 if step['type'] in ['consider', 'add_edge'] else 3
+            nx.draw_networkx_edges(self.graph, self.pos, ax=ax, 
+                                  edgelist=[step['current_edge']], 
+                                  edge_color=color, width=width, alpha=0.8)
+        
+        # Draw edge labels
+        nx.draw_networkx_edge_labels(self.graph, self.pos, self.edge_labels, ax=ax, font_size=10)
+    
+    def use_trace_graph(self, trace):
+        # Graph and saved layout of an opened MSTTrace
+        self.n_nodes = trace.n_nodes
+        self.edges = trace.edges
+        pos = trace.meta.get('pos')
+        self.build_display_graph(layout=pos is None)
+        if pos is not None:
+            self.pos = {node: np.array(xy) for node, xy in enumerate(pos)}
+    
+    def snapshot(self):
+        """Drawing of the current graph and steps for the frame cache's worker thread.
+        
+        Graph edits replace graph, pos and edge_labels rather than changing them,
+        so the snapshot keeps the ones it was taken with; the steps get their own
+        view so the worker's seeks don't move the Tk thread's cursor.
+        """
+        drawing = MSTDrawing()
+        drawing.graph = self.graph
+        drawing.pos = self.pos
+        drawing.edge_labels = self.edge_labels
+        drawing.animation_steps = self.animation_steps.view()
+        drawing.algorithm_name = getattr(self, 'algorithm_name', 'MST Algorithm')
+        return drawing
+
+
+def frame_renderer(fig, trace):
+    """Draws steps of an opened MSTTrace onto an Agg figure, for export_trace.py"""
+    drawing = MSTDrawing()
+    drawing.use_trace_graph(trace)
+    drawing.animation_steps = trace
+    drawing.algorithm_name = trace.meta.get('algorithm_name', "MST Algorithm")
+    
+    def draw(step):
+        drawing.render_frame(fig, step)
+        fig.canvas.draw()
+    return draw
+
+
+class AnimatedMSTVisualizer(MSTDrawing):
     def __init__(self, root):
         self.root = root
         self.root.title("Animated MST Algorithms: Prim's vs Kruskal's")
         self.root.geometry("1400x900")
         
-        # Initialize graph
+        # Initialize graph; edges are the source of truth, networkx is only used for drawing
+        self.rng = np.random.default_rng()
+        self.n_nodes = 0
+        self.edges = np.empty(0, dtype=EDGE_DTYPE)
         self.graph = nx.Graph()
+        self.edge_labels = {}
         self.pos = {}
         
         # Animation state
-        self.animation_steps = []
-        self.current_step = 0
-        self.is_animating = False
-        self.animation = None
+        self.animation_steps = StepList()
         self.animation_speed = 1000  # milliseconds
+        self.playback = PlaybackController(lambda step: self.draw_current_step(), lambda: len(self.animation_steps),
+                                           TkTimer(root, self.animate_step), self.animation_speed)
+        
+        # Incrementally maintained MST for edge edits
+        self.dynamic_mst = None
+        
+        # Race mode state
+        self.race_executor = None
+        self.race_futures = []
         
         # Setup UI
         self.setup_ui()
         
+        # Off-screen frame cache for instant stepping
+        self.frame_is_stale = False
+        self.frame_cache = FrameCache(self.fig)
+        self.canvas.mpl_connect('resize_event', self.on_canvas_resize)
+        
         # Generate initial random graph
         self.generate_random_graph()
     
@@ -50,8 +885,14 @@ class AnimatedMSTVisualizer:
                   command=self.animate_prims).grid(row=0, column=1, padx=(0, 10))
         ttk.Button(top_buttons, text="Animate Kruskal's", 
                   command=self.animate_kruskals).grid(row=0, column=2, padx=(0, 10))
+        ttk.Button(top_buttons, text="Race All", 
+                  command=self.race_all).grid(row=0, column=3, padx=(0, 10))
         ttk.Button(top_buttons, text="Stop Animation", 
-                  command=self.stop_animation).grid(row=0, column=3, padx=(0, 10))
+                  command=self.stop_animation).grid(row=0, column=4, padx=(0, 10))
+        ttk.Button(top_buttons, text="Save Trace", 
+                  command=self.save_trace).grid(row=0, column=5, padx=(0, 10))
+        ttk.Button(top_buttons, text="Open Trace", 
+                  command=self.open_trace).grid(row=0, column=6, padx=(0, 10))
         
         # Animation controls
         anim_controls = ttk.Frame(control_frame)
@@ -82,6 +923,31 @@ class AnimatedMSTVisualizer:
         self.prob_var = tk.StringVar(value="0.4")
         ttk.Entry(param_frame, textvariable=self.prob_var, width=5).grid(row=0, column=3, padx=(5, 0))
         
+        # Edge editing (incremental MST updates)
+        edit_frame = ttk.Frame(control_frame)
+        edit_frame.grid(row=3, column=0, columnspan=4, pady=(10, 0))
+        
+        ttk.Label(edit_frame, text="Edge u:").grid(row=0, column=0)
+        self.edge_u_var = tk.StringVar(value="0")
+        ttk.Entry(edit_frame, textvariable=self.edge_u_var, width=4).grid(row=0, column=1, padx=(5, 10))
+        
+        ttk.Label(edit_frame, text="v:").grid(row=0, column=2)
+        self.edge_v_var = tk.StringVar(value="1")
+        ttk.Entry(edit_frame, textvariable=self.edge_v_var, width=4).grid(row=0, column=3, padx=(5, 10))
+        
+        ttk.Label(edit_frame, text="Weight:").grid(row=0, column=4)
+        self.edge_weight_var = tk.StringVar(value="5")
+        ttk.Entry(edit_frame, textvariable=self.edge_weight_var, width=4).grid(row=0, column=5, padx=(5, 15))
+        
+        ttk.Button(edit_frame, text="Set Weight", 
+                  command=lambda: self.edit_edge('set_weight')).grid(row=0, column=6, padx=(0, 10))
+        ttk.Button(edit_frame, text="Add Edge", 
+                  command=lambda: self.edit_edge('insert')).grid(row=0, column=7, padx=(0, 10))
+        ttk.Button(edit_frame, text="Remove Edge", 
+                  command=lambda: self.edit_edge('remove')).grid(row=0, column=8, padx=(0, 10))
+        ttk.Button(edit_frame, text="Random Update", 
+                  command=self.random_edge_update).grid(row=0, column=9)
+        
         # Create matplotlib figure
         self.fig, self.ax = plt.subplots(1, 1, figsize=(12, 8))
         self.fig.suptitle("Animated Minimum Spanning Tree Algorithm")
@@ -138,37 +1004,68 @@ class AnimatedMSTVisualizer:
             
             self.stop_animation()
             
-            # Generate random graph
-            self.graph = nx.erdos_renyi_graph(n_nodes, prob)
-            
-            # Ensure graph is connected
-            if not nx.is_connected(self.graph):
-                components = list(nx.connected_components(self.graph))
-                for i in range(len(components) - 1):
-                    node1 = random.choice(list(components[i]))
-                    node2 = random.choice(list(components[i + 1]))
-                    self.graph.add_edge(node1, node2)
-            
-            # Add random weights to edges
-            for u, v in self.graph.edges():
-                self.graph[u][v]['weight'] = random.randint(1, 20)
-            
-            # Generate positions for consistent layout
-            self.pos = nx.spring_layout(self.graph, seed=42, k=2, iterations=50)
+            # Generate random connected graph with weights in one vectorized pass
+            self.n_nodes = n_nodes
+            self.edges = random_edge_array(n_nodes, prob, self.rng)
+            self.dynamic_mst = None
+            self.build_display_graph()
             
             # Reset animation
-            self.animation_steps = []
-            self.current_step = 0
+            self.animation_steps = StepList()
+            self.playback.rewind()
+            self.frame_cache.invalidate(self.snapshot().render_frame)
             
             # Update display
             self.draw_graph()
-            self.update_status("Graph generated", f"{n_nodes} nodes, {len(self.graph.edges())} edges")
+            self.update_status("Graph generated", f"{n_nodes} nodes, {len(self.edges)} edges")
             
         except ValueError:
             messagebox.showerror("Error", "Please enter valid numbers")
     
+    def edit_edge(self, operation):
+        if self.n_nodes == 0:
+            messagebox.showwarning("Warning", "Please generate a graph first")
+            return
+        
+        try:
+            u = int(self.edge_u_var.get())
+            v = int(self.edge_v_var.get())
+            weight = None if operation == 'remove' else int(self.edge_weight_var.get())
+        except ValueError:
+            messagebox.showerror("Error", "Please enter valid numbers")
+            return
+        
+        self.stop_animation()
+        if self.dynamic_mst is None:
+            self.dynamic_mst = DynamicMST(self.n_nodes, self.edges)
+        
+        try:
+            if operation == 'remove':
+                steps = self.dynamic_mst.remove(u, v)
+            else:
+                steps = getattr(self.dynamic_mst, operation)(u, v, weight)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        
+        # Only the edited edge changed; keep the layout and animate the update
+        self.edges = self.dynamic_mst.edges
+        self.build_display_graph(layout=False)
+        self.animation_steps = StepList(steps)
+        self.start_animation("Dynamic MST Update")
+    
+    def random_edge_update(self):
+        if len(self.edges) == 0:
+            return
+        
+        u, v, _ = self.edges[self.rng.integers(len(self.edges))].tolist()
+        self.edge_u_var.set(str(u))
+        self.edge_v_var.set(str(v))
+        self.edge_weight_var.set(str(self.rng.integers(1, 21)))
+        self.edit_edge('set_weight')
+    
     def animate_prims(self):
-        if len(self.graph.nodes()) == 0:
+        if self.n_nodes == 0:
             messagebox.showwarning("Warning", "Please generate a graph first")
             return
         
@@ -177,7 +1074,7 @@ class AnimatedMSTVisualizer:
         self.start_animation("Prim's Algorithm")
     
     def animate_kruskals(self):
-        if len(self.graph.nodes()) == 0:
+        if self.n_nodes == 0:
             messagebox.showwarning("Warning", "Please generate a graph first")
             return
         
@@ -186,323 +1083,133 @@ class AnimatedMSTVisualizer:
         self.start_animation("Kruskal's Algorithm")
     
     def prepare_prims_animation(self):
-        # Prim's algorithm step-by-step
-        self.animation_steps = []
-        visited = set()
-        mst_edges = []
-        
-        # Initial state
-        self.animation_steps.append({
-            'type': 'initial',
-            'visited': set(),
-            'mst_edges': [],
-            'current_edge': None,
-            'description': "Starting Prim's Algorithm. We'll grow the MST by adding the minimum weight edge from visited nodes.",
-            'total_weight': 0
-        })
-        
-        # Start from node 0
-        start_node = list(self.graph.nodes())[0]
-        visited.add(start_node)
-        total_weight = 0
-        
-        self.animation_steps.append({
-            'type': 'start',
-            'visited': visited.copy(),
-            'mst_edges': mst_edges.copy(),
-            'current_edge': None,
-            'description': f"Step 1: Start with node {start_node}. Mark it as visited (green).",
-            'total_weight': total_weight
-        })
-        
-        step_count = 2
-        while len(visited) < len(self.graph.nodes()):
-            # Find minimum weight edge
-            min_edge = None
-            min_weight = float('inf')
-            candidate_edges = []
-            
-            for node in visited:
-                for neighbor in self.graph.neighbors(node):
-                    if neighbor not in visited:
-                        weight = self.graph[node][neighbor]['weight']
-                        candidate_edges.append((node, neighbor, weight))
-                        if weight < min_weight:
-                            min_weight = weight
-                            min_edge = (node, neighbor)
-            
-            # Show candidate edges
-            if candidate_edges:
-                self.animation_steps.append({
-                    'type': 'candidates',
-                    'visited': visited.copy(),
-                    'mst_edges': mst_edges.copy(),
-                    'candidate_edges': candidate_edges,
-                    'current_edge': min_edge,
-                    'description': f"Step {step_count}a: Consider all edges from visited nodes to unvisited nodes. Candidates: {[(u, v, w) for u, v, w in candidate_edges]}. Minimum is {min_edge} with weight {min_weight}.",
-                    'total_weight': total_weight
-                })
-            
-            if min_edge:
-                mst_edges.append(min_edge)
-                visited.add(min_edge[1])
-                total_weight += min_weight
-                
-                self.animation_steps.append({
-                    'type': 'add_edge',
-                    'visited': visited.copy(),
-                    'mst_edges': mst_edges.copy(),
-                    'current_edge': min_edge,
-                    'description': f"Step {step_count}b: Add edge {min_edge} with weight {min_weight} to MST. Mark node {min_edge[1]} as visited. Total weight: {total_weight}",
-                    'total_weight': total_weight
-                })
-                step_count += 1
-        
-        # Final state
-        self.animation_steps.append({
-            'type': 'complete',
-            'visited': visited.copy(),
-            'mst_edges': mst_edges.copy(),
-            'current_edge': None,
-            'description': f"Prim's Algorithm Complete! MST has {len(mst_edges)} edges with total weight {total_weight}.",
-            'total_weight': total_weight
-        })
+        self.animation_steps, _ = prims_steps(self.n_nodes, self.edges)
     
     def prepare_kruskals_animation(self):
-        # Kruskal's algorithm step-by-step
-        self.animation_steps = []
-        
-        # Union-Find class
-        class UnionFind:
-            def __init__(self, nodes):
-                self.parent = {node: node for node in nodes}
-                self.rank = {node: 0 for node in nodes}
-            
-            def find(self, x):
-                if self.parent[x] != x:
-                    self.parent[x] = self.find(self.parent[x])
-                return self.parent[x]
-            
-            def union(self, x, y):
-                px, py = self.find(x), self.find(y)
-                if px == py:
-                    return False
-                if self.rank[px] < self.rank[py]:
-                    px, py = py, px
-                self.parent[py] = px
-                if self.rank[px] == self.rank[py]:
-                    self.rank[px] += 1
-                return True
-            
-            def get_components(self):
-                components = {}
-                for node in self.parent:
-                    root = self.find(node)
-                    if root not in components:
-                        components[root] = []
-                    components[root].append(node)
-                return list(components.values())
-        
-        # Get all edges sorted by weight
-        edges = [(u, v, data['weight']) for u, v, data in self.graph.edges(data=True)]
-        edges.sort(key=lambda x: x[2])
-        
-        # Initial state
-        self.animation_steps.append({
-            'type': 'initial',
-            'mst_edges': [],
-            'current_edge': None,
-            'components': [[node] for node in self.graph.nodes()],
-            'description': f"Starting Kruskal's Algorithm. Sort all edges by weight: {[(u, v, w) for u, v, w in edges]}",
-            'total_weight': 0
-        })
-        
-        uf = UnionFind(self.graph.nodes())
-        mst_edges = []
-        total_weight = 0
-        step_count = 1
-        
-        for u, v, weight in edges:
-            # Show current edge being considered
-            self.animation_steps.append({
-                'type': 'consider',
-                'mst_edges': mst_edges.copy(),
-                'current_edge': (u, v),
-                'components': uf.get_components(),
-                'description': f"Step {step_count}: Consider edge ({u}, {v}) with weight {weight}. Check if it creates a cycle.",
-                'total_weight': total_weight
-            })
-            
-            if uf.union(u, v):
-                mst_edges.append((u, v))
-                total_weight += weight
-                
-                self.animation_steps.append({
-                    'type': 'add_edge',
-                    'mst_edges': mst_edges.copy(),
-                    'current_edge': (u, v),
-                    'components': uf.get_components(),
-                    'description': f"Step {step_count}: Add edge ({u}, {v}) with weight {weight}. No cycle created. Total weight: {total_weight}",
-                    'total_weight': total_weight
-                })
-                
-                if len(mst_edges) == len(self.graph.nodes()) - 1:
-                    break
-            else:
-                self.animation_steps.append({
-                    'type': 'reject',
-                    'mst_edges': mst_edges.copy(),
-                    'current_edge': (u, v),
-                    'components': uf.get_components(),
-                    'description': f"Step {step_count}: Reject edge ({u}, {v}) - would create a cycle!",
-                    'total_weight': total_weight
-                })
-            
-            step_count += 1
-        
-        # Final state
-        self.animation_steps.append({
-            'type': 'complete',
-            'mst_edges': mst_edges.copy(),
-            'current_edge': None,
-            'components': [list(self.graph.nodes())],
-            'description': f"Kruskal's Algorithm Complete! MST has {len(mst_edges)} edges with total weight {total_weight}.",
-            'total_weight': total_weight
-        })
+        self.animation_steps, _ = kruskals_steps(self.n_nodes, self.edges)
     
-    def start_animation(self, algorithm_name):
-        if not self.animation_steps:
+    def race_all(self):
+        if self.n_nodes == 0:
+            messagebox.showwarning("Warning", "Please generate a graph first")
+            return
+        if self.race_futures:
             return
         
-        self.is_animating = True
-        self.current_step = 0
-        self.algorithm_name = algorithm_name
-        self.algorithm_label.config(text=f"Algorithm: {algorithm_name}")
+        self.stop_animation()
+        self.update_status("Racing...", f"Running {', '.join(MST_ENGINES)} in separate processes")
         
-        self.animate_step()
+        # Spawned workers don't inherit the Tk process state or the frame cache thread
+        self.race_executor = ProcessPoolExecutor(max_workers=len(MST_ENGINES),
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        self.race_futures = [self.race_executor.submit(race_engine, name, self.n_nodes, self.edges)
+                             for name in MST_ENGINES]
+        self.root.after(50, self.poll_race)
     
-    def animate_step(self):
-        if not self.is_animating or self.current_step >= len(self.animation_steps):
-            self.is_animating = False
+    def poll_race(self):
+        if not all(future.done() for future in self.race_futures):
+            self.root.after(50, self.poll_race)
             return
         
-        self.draw_current_step()
-        self.current_step += 1
+        futures, self.race_futures = self.race_futures, []
+        self.race_executor.shutdown(wait=False)
+        try:
+            results = [future.result() for future in futures]
+        except Exception as e:
+            messagebox.showerror("Error", f"Race failed: {e}")
+            return
         
-        if self.current_step < len(self.animation_steps):
-            # Calculate delay based on speed
-            delay = int(self.animation_speed / self.speed_var.get())
-            self.root.after(delay, self.animate_step)
-        else:
-            self.is_animating = False
+        self.animation_steps = RaceFrames(results)
+        self.start_animation(f"Race: {' vs '.join(name for name, _, _ in results)}")
     
-    def draw_current_step(self):
-        if not self.animation_steps or self.current_step >= len(self.animation_steps):
+    def save_trace(self):
+        if not isinstance(self.animation_steps, MSTTrace):
+            messagebox.showwarning("Warning", "Animate Prim's or Kruskal's first; races and edge updates can't be saved")
             return
         
-        step = self.animation_steps[self.current_step]
-        self.ax.clear()
-        
-        # Update status
-        self.step_label.config(text=f"Step: {self.current_step + 1}/{len(self.animation_steps)}")
-        self.step_text.delete(1.0, tk.END)
-        self.step_text.insert(tk.END, step['description'])
-        
-        if len(self.graph.nodes()) == 0:
+        path = filedialog.asksaveasfilename(defaultextension=".trace", filetypes=TRACE_FILETYPES)
+        if not path:
             return
         
-        # Choose colors and drawing based on algorithm
-        if hasattr(self, 'algorithm_name') and 'Prim' in self.algorithm_name:
-            self.draw_prims_step(step)
-        else:
-            self.draw_kruskals_step(step)
-        
-        self.ax.set_title(f"{getattr(self, 'algorithm_name', 'MST Algorithm')} - Total Weight: {step['total_weight']}")
-        self.ax.axis('off')
-        self.canvas.draw()
+        # Keep the layout so the reopened trace draws the same picture
+        self.animation_steps.meta = {'algorithm_name': self.algorithm_name,
+                                     'pos': [[float(x) for x in self.pos[node]] for node in range(self.n_nodes)]}
+        try:
+            self.animation_steps.save(path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not save trace: {e}")
     
-    def draw_prims_step(self, step):
-        # Draw all edges in light gray
-        nx.draw_networkx_edges(self.graph, self.pos, ax=self.ax, alpha=0.2, edge_color='lightgray')
-        
-        # Color nodes based on visited status
-        node_colors = []
-        for node in self.graph.nodes():
-            if node in step.get('visited', set()):
-                node_colors.append('lightgreen')
-            else:
-                node_colors.append('lightblue')
-        
-        # Draw nodes
-        nx.draw_networkx_nodes(self.graph, self.pos, ax=self.ax, node_color=node_colors, 
-                              node_size=700, alpha=0.8)
-        nx.draw_networkx_labels(self.graph, self.pos, ax=self.ax, font_size=12, font_weight='bold')
+    def open_trace(self):
+        path = filedialog.askopenfilename(filetypes=TRACE_FILETYPES)
+        if not path:
+            return
         
-        # Draw MST edges in red
-        if step['mst_edges']:
-            nx.draw_networkx_edges(self.graph, self.pos, ax=self.ax, edgelist=step['mst_edges'], 
-                                  edge_color='red', width=3)
+        try:
+            trace = MSTTrace.open(path)
+        except (OSError, ValueError, KeyError) as e:
+            messagebox.showerror("Error", f"Could not open trace: {e}")
+            return
         
-        # Highlight current edge being considered
-        if step.get('current_edge'):
-            nx.draw_networkx_edges(self.graph, self.pos, ax=self.ax, 
-                                  edgelist=[step['current_edge']], 
-                                  edge_color='orange', width=4, alpha=0.8)
+        self.stop_animation()
+        self.use_trace_graph(trace)
+        self.dynamic_mst = None
+        self.animation_steps = trace
+        self.start_animation(trace.meta.get('algorithm_name', "MST Algorithm"))
+    
+    def start_animation(self, algorithm_name):
+        if not self.animation_steps:
+            return
         
-        # Highlight candidate edges
-        if step.get('candidate_edges'):
-            candidate_edge_list = [(u, v) for u, v, w in step['candidate_edges']]
-            nx.draw_networkx_edges(self.graph, self.pos, ax=self.ax, 
-                                  edgelist=candidate_edge_list, 
-                                  edge_color='yellow', width=2, alpha=0.6)
+        self.algorithm_name = algorithm_name
+        self.algorithm_label.config(text=f"Algorithm: {algorithm_name}")
+        self.frame_cache.invalidate(self.snapshot().render_frame)
         
-        # Draw edge labels
-        edge_labels = nx.get_edge_attributes(self.graph, 'weight')
-        nx.draw_networkx_edge_labels(self.graph, self.pos, edge_labels, ax=self.ax, font_size=10)
+        self.playback.first()
+        self.update_speed(None)
+        self.playback.play()
     
-    def draw_kruskals_step(self, step):
-        # Draw all edges in light gray
-        nx.draw_networkx_edges(self.graph, self.pos, ax=self.ax, alpha=0.2, edge_color='lightgray')
-        
-        # Color nodes based on components
-        if step.get('components'):
-            colors = ['lightblue', 'lightgreen', 'lightcoral', 'lightyellow', 'lightpink', 
-                     'lightcyan', 'wheat', 'lavender', 'mistyrose', 'honeydew']
-            node_colors = {}
-            for i, component in enumerate(step['components']):
-                color = colors[i % len(colors)]
-                for node in component:
-                    node_colors[node] = color
-            
-            node_color_list = [node_colors.get(node, 'lightgray') for node in self.graph.nodes()]
-        else:
-            node_color_list = ['lightblue'] * len(self.graph.nodes())
+    def animate_step(self):
+        self.playback.tick()
+    
+    def draw_current_step(self):
+        current_step = self.playback.position
+        if not self.animation_steps or current_step >= len(self.animation_steps):
+            return
         
-        # Draw nodes
-        nx.draw_networkx_nodes(self.graph, self.pos, ax=self.ax, node_color=node_color_list, 
-                              node_size=700, alpha=0.8)
-        nx.draw_networkx_labels(self.graph, self.pos, ax=self.ax, font_size=12, font_weight='bold')
+        # Update status
+        self.step_label.config(text=f"Step: {current_step + 1}/{len(self.animation_steps)}")
+        self.step_text.delete(1.0, tk.END)
+        self.step_text.insert(tk.END, self.animation_steps.describe(current_step))
         
-        # Draw MST edges in red
-        if step['mst_edges']:
-            nx.draw_networkx_edges(self.graph, self.pos, ax=self.ax, edgelist=step['mst_edges'], 
-                                  edge_color='red', width=3)
+        if self.n_nodes == 0:
+            return
         
-        # Highlight current edge
-        if step.get('current_edge'):
-            color = 'orange' if step['type'] == 'consider' else ('green' if step['type'] == 'add_edge' else 'red')
-            width = 4 if step['type'] in ['consider', 'add_edge'] else 3
-            nx.draw_networkx_edges(self.graph, self.pos, ax=self.ax, 
-                                  edgelist=[step['current_edge']], 
-                                  edge_color=color, width=width, alpha=0.8)
+        # Blit a pre-rendered frame if the worker already has it, otherwise draw synchronously
+        frame = self.frame_cache.get(current_step)
+        if frame is not None:
+            self.canvas.get_renderer().restore_region(frame)
+            self.canvas.blit(self.fig.bbox)
+            self.frame_is_stale = True
+        else:
+            self.render_frame(self.fig, current_step)
+            self.canvas.draw()
+            self.frame_is_stale = False
+            self.frame_cache.put(current_step, self.canvas.copy_from_bbox(self.fig.bbox))
         
-        # Draw edge labels
-        edge_labels = nx.get_edge_attributes(self.graph, 'weight')
-        nx.draw_networkx_edge_labels(self.graph, self.pos, edge_labels, ax=self.ax, font_size=10)
+        # Keep upcoming and the previous step warm for stepping in either direction
+        upcoming = range(current_step + 1,
+                         min(current_step + 1 + self.frame_cache.lookahead, len(self.animation_steps)))
+        self.frame_cache.prefetch([*upcoming, current_step - 1])
+    
+    def on_canvas_resize(self, event):
+        # Cached frames no longer match the canvas size
+        self.frame_cache.resize(self.fig)
+        if self.frame_is_stale and self.animation_steps and self.playback.position < len(self.animation_steps):
+            self.render_frame(self.fig, self.playback.position)
+            self.frame_is_stale = False
     
     def draw_graph(self):
-        self.ax.clear()
-        if len(self.graph.nodes()) == 0:
+        self.ax = self.layout_axes(self.fig, 1)[0]
+        if self.n_nodes == 0:
             return
         
         # Draw basic graph
@@ -512,21 +1219,18 @@ class AnimatedMSTVisualizer:
         nx.draw_networkx_edges(self.graph, self.pos, ax=self.ax, alpha=0.6)
         
         # Draw edge labels
-        edge_labels = nx.get_edge_attributes(self.graph, 'weight')
-        nx.draw_networkx_edge_labels(self.graph, self.pos, edge_labels, ax=self.ax, font_size=10)
+        nx.draw_networkx_edge_labels(self.graph, self.pos, self.edge_labels, ax=self.ax, font_size=10)
         
         self.ax.set_title("Graph - Ready for Algorithm")
         self.ax.axis('off')
         self.canvas.draw()
+        self.frame_is_stale = False
     
     def stop_animation(self):
-        self.is_animating = False
-        if self.animation:
-            self.animation.event_source.stop()
+        self.playback.pause()
     
     def reset_animation(self):
-        self.stop_animation()
-        self.current_step = 0
+        self.playback.rewind()
         if self.animation_steps:
             self.draw_current_step()
         else:
@@ -534,18 +1238,14 @@ class AnimatedMSTVisualizer:
         self.update_status("Animation reset", "Ready to start")
     
     def next_step(self):
-        if self.animation_steps and self.current_step < len(self.animation_steps) - 1:
-            self.current_step += 1
-            self.draw_current_step()
+        self.playback.next()
     
     def prev_step(self):
-        if self.animation_steps and self.current_step > 0:
-            self.current_step -= 1
-            self.draw_current_step()
+        self.playback.prev()
     
     def update_speed(self, value):
         # Speed is updated in real-time during animation
-        pass
+        self.playback.set_interval(int(self.animation_speed / self.speed_var.get()))
     
     def update_status(self, status, details=""):
         self.step_text.delete(1.0, tk.END)
@@ -3,12 +3,186 @@ import random
 import time
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QLabel, QPushButton, QComboBox, QSlider, QSpinBox, QGroupBox,
-                             QRadioButton, QFrame, QTextEdit, QSplitter)
+                             QRadioButton, QFrame, QTextEdit, QSplitter, QFileDialog)
 from PyQt5.QtCore import Qt, QTimer, pyqtSignal
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 import matplotlib.animation as animation
 import numpy as np
+from algo_trace import PlaybackController, TraceLog
+
+TRACE_FILTER = "Algorithm traces (*.trace);;All files (*)"
+
+
+class SortTrace(TraceLog):
+    """A sorting run as a TraceLog.
+
+    A state is [array, highlighted, sorted indices, pivot indices, comparisons,
+    swaps]. An event is [comparisons, swaps, k, then k (index, value) writes],
+    followed for the highlighted, sorted and pivot indices by either -1 when
+    they are unchanged or their count and the indices. Every write is
+    highlighted in the step that shows it, so add() only compares the
+    highlighted positions with the previous step to find the writes.
+    """
+
+    def __init__(self, array):
+        self.live = [list(array), [], [], [], 0, 0]  # State after the newest step
+        super().__init__(self.live)
+
+    @classmethod
+    def from_parameters(cls, parameters):
+        return cls([])  # The initial array is keyframe 0
+
+    def encode(self, state):
+        array, highlighted, sorted_indices, pivot_indices, comparisons, swaps = state
+        values = [comparisons, swaps, len(array), *array]
+        for indices in (highlighted, sorted_indices, pivot_indices):
+            values.append(len(indices))
+            values.extend(indices)
+        return values
+
+    def decode(self, values):
+        values = values.tolist()
+        n = values[2]
+        state = [values[3:3 + n], [], [], [], values[0], values[1]]
+        pos = 3 + n
+        for k in (1, 2, 3):
+            count = values[pos]
+            state[k] = values[pos + 1:pos + 1 + count]
+            pos += 1 + count
+        return state
+
+    def apply(self, state, event):
+        event = event.tolist()
+        array = state[0]
+        state[4], state[5], writes = event[0], event[1], event[2]
+        for pos in range(3, 3 + 2 * writes, 2):
+            array[event[pos]] = event[pos + 1]
+        pos = 3 + 2 * writes
+        for k in (1, 2, 3):
+            count = event[pos]
+            if count >= 0:
+                state[k] = event[pos + 1:pos + 1 + count]
+                pos += count
+            pos += 1
+        return state
+
+    def add(self, array, highlighted, sorted_indices, pivot_indices, comparisons, swaps):
+        live = self.live
+        event = [comparisons, swaps, 0]
+        for i in highlighted:
+            if array[i] != live[0][i]:
+                live[0][i] = array[i]
+                event += (i, array[i])
+        event[2] = (len(event) - 3) // 2
+        for k, indices in ((1, highlighted), (2, sorted_indices), (3, pivot_indices)):
+            if indices == live[k]:
+                event.append(-1)
+            else:
+                live[k] = list(indices)
+                event.append(len(indices))
+                event.extend(indices)
+        live[4], live[5] = comparisons, swaps
+        return self.record(event, live)
+
+    def writes(self, step):
+        """Indices whose values changed at step, in ascending order"""
+        event = self.event(step)
+        return sorted(event[3 + 2 * k] for k in range(event[2]))
+
+
+class SortPlot:
+    """Bar chart of SortTrace states on one axes.
+
+    The bars, value labels, ticks and legend are created once per trace and
+    update() only changes heights, colors, labels and the title, since every
+    state of a sort holds the same values.
+    """
+
+    default_color = '#3498db'
+    highlight_color = '#e74c3c'
+    sorted_color = '#2ecc71'
+    pivot_color = '#f39c12'
+
+    def __init__(self, ax, array):
+        self.ax = ax
+        ax.clear()
+
+        # Create the bar plot
+        self.bars = ax.bar(range(len(array)), array, color=self.default_color, edgecolor='black', linewidth=0.5)
+
+        # Add value labels on top of bars
+        self.labels = [ax.text(bar.get_x() + bar.get_width() / 2., bar.get_height() + 1,
+                               f'{value}', ha='center', va='bottom', fontsize=8)
+                       for bar, value in zip(self.bars, array)]
+
+        # Configure the plot
+        ax.set_xlim(-0.5, len(array) - 0.5)
+        ax.set_ylim(0, max(array) * 1.15)
+        ax.set_xticks(range(len(array)))
+        ax.set_xticklabels([str(i) for i in range(len(array))], fontsize=8)
+        ax.set_xlabel('Index')
+        ax.set_ylabel('Value')
+        self.title = ax.set_title('Sorting Visualization')
+
+        # Add a legend
+        from matplotlib.patches import Patch
+        legend_elements = [
+            Patch(facecolor=self.default_color, edgecolor='black', label='Unsorted'),
+            Patch(facecolor=self.highlight_color, edgecolor='black', label='Comparing/Swapping'),
+            Patch(facecolor=self.sorted_color, edgecolor='black', label='Sorted'),
+            Patch(facecolor=self.pivot_color, edgecolor='black', label='Pivot')
+        ]
+        ax.legend(handles=legend_elements, loc='upper right', fontsize='small')
+
+    def artists(self):
+        """Everything update() changes, for blitting"""
+        return [*self.bars, *self.labels, self.title]
+
+    def update(self, state, step, total):
+        array, highlighted, sorted_indices, pivot_indices = state[:4]
+
+        # Create color array
+        colors = [self.default_color] * len(array)
+
+        # Apply colors based on state
+        for i in sorted_indices:
+            colors[i] = self.sorted_color
+
+        for i in highlighted:
+            colors[i] = self.highlight_color
+
+        for i in pivot_indices:
+            colors[i] = self.pivot_color
+
+        for bar, label, value, color in zip(self.bars, self.labels, array, colors):
+            bar.set_height(value)
+            bar.set_facecolor(color)
+            label.set_y(value + 1)
+            label.set_text(f'{value}')
+        self.title.set_text(f'Sorting Visualization (Step {step}/{total})')
+
+
+def frame_renderer(fig, trace):
+    """Draws steps of an opened SortTrace onto an Agg figure, for export_trace.py.
+
+    The static parts are rendered once; each frame restores them and redraws
+    only the bars, labels and title.
+    """
+    plot = SortPlot(fig.add_subplot(111), trace.seek(0)[0])
+    fig.tight_layout()
+    artists = plot.artists()
+    for artist in artists:
+        artist.set_animated(True)
+    fig.canvas.draw()
+    background = fig.canvas.copy_from_bbox(fig.bbox)
+
+    def draw(step):
+        plot.update(trace.seek(step), step, len(trace) - 1)
+        fig.canvas.restore_region(background)
+        for artist in artists:
+            fig.draw_artist(artist)
+    return draw
 
 
 class SortingCanvas(FigureCanvas):
@@ -18,7 +192,9 @@ class SortingCanvas(FigureCanvas):
         self.setParent(parent)
 
         self.array = []
-        self.states = []
+        self.trace = SortTrace([])
+        self.plot = None
+        self.plotted_trace = None  # Trace the plot's bars were built for
         self.current_state_index = -1
         self.highlighted_indices = []
         self.sorted_indices = []
@@ -26,15 +202,9 @@ class SortingCanvas(FigureCanvas):
         self.comparison_count = 0
         self.swap_count = 0
 
-        # Colors
-        self.default_color = '#3498db'
-        self.highlight_color = '#e74c3c'
-        self.sorted_color = '#2ecc71'
-        self.pivot_color = '#f39c12'
-
     def setup_array(self, size, min_val=5, max_val=100):
         self.array = [random.randint(min_val, max_val) for _ in range(size)]
-        self.states = [(self.array.copy(), [], [], [], 0, 0)]  # Initial state
+        self.trace = SortTrace(self.array)  # Initial state
         self.current_state_index = 0
         self.highlighted_indices = []
         self.sorted_indices = []
@@ -47,7 +217,7 @@ class SortingCanvas(FigureCanvas):
     def custom_array(self, custom_values):
         try:
             self.array = [int(x.strip()) for x in custom_values.split(',')]
-            self.states = [(self.array.copy(), [], [], [], 0, 0)]  # Initial state
+            self.trace = SortTrace(self.array)  # Initial state
             self.current_state_index = 0
             self.highlighted_indices = []
             self.sorted_indices = []
@@ -63,57 +233,16 @@ class SortingCanvas(FigureCanvas):
         if not self.array or self.current_state_index < 0:
             return
 
-        self.ax.clear()
-
         # Load current state
-        state = self.states[self.current_state_index]
-        array = state[0]
-        highlighted = state[1]
-        sorted_indices = state[2]
-        pivot_indices = state[3]
+        state = self.trace.seek(self.current_state_index)
 
-        # Create color array
-        colors = [self.default_color] * len(array)
-
-        # Apply colors based on state
-        for i in sorted_indices:
-            colors[i] = self.sorted_color
+        # A sort never changes the values, so the bars are only rebuilt for a new trace
+        if self.plotted_trace is not self.trace:
+            self.plot = SortPlot(self.ax, state[0])
+            self.plotted_trace = self.trace
+            self.fig.tight_layout()
 
-        for i in highlighted:
-            colors[i] = self.highlight_color
-
-        for i in pivot_indices:
-            colors[i] = self.pivot_color
-
-        # Create the bar plot
-        bars = self.ax.bar(range(len(array)), array, color=colors, edgecolor='black', linewidth=0.5)
-
-        # Add value labels on top of bars
-        for i, bar in enumerate(bars):
-            height = bar.get_height()
-            self.ax.text(bar.get_x() + bar.get_width() / 2., height + 1,
-                         f'{array[i]}', ha='center', va='bottom', fontsize=8)
-
-        # Configure the plot
-        self.ax.set_xlim(-0.5, len(array) - 0.5)
-        self.ax.set_ylim(0, max(array) * 1.15)
-        self.ax.set_xticks(range(len(array)))
-        self.ax.set_xticklabels([str(i) for i in range(len(array))], fontsize=8)
-        self.ax.set_xlabel('Index')
-        self.ax.set_ylabel('Value')
-        self.ax.set_title(f'Sorting Visualization (Step {self.current_state_index}/{len(self.states) - 1})')
-
-        # Add a legend
-        from matplotlib.patches import Patch
-        legend_elements = [
-            Patch(facecolor=self.default_color, edgecolor='black', label='Unsorted'),
-            Patch(facecolor=self.highlight_color, edgecolor='black', label='Comparing/Swapping'),
-            Patch(facecolor=self.sorted_color, edgecolor='black', label='Sorted'),
-            Patch(facecolor=self.pivot_color, edgecolor='black', label='Pivot')
-        ]
-        self.ax.legend(handles=legend_elements, loc='upper right', fontsize='small')
-
-        self.fig.tight_layout()
+        self.plot.update(state, self.current_state_index, len(self.trace) - 1)
         self.draw()
 
     def add_state(self, array, highlighted=None, sorted_indices=None, pivot_indices=None):
@@ -124,13 +253,13 @@ class SortingCanvas(FigureCanvas):
         if pivot_indices is None:
             pivot_indices = []
 
-        self.states.append((array.copy(), highlighted.copy(), sorted_indices.copy(),
-                            pivot_indices.copy(), self.comparison_count, self.swap_count))
+        self.trace.add(array, highlighted, sorted_indices, pivot_indices,
+                       self.comparison_count, self.swap_count)
 
     def go_to_state(self, index):
-        if 0 <= index < len(self.states):
+        if 0 <= index < len(self.trace):
             self.current_state_index = index
-            state = self.states[index]
+            state = self.trace.seek(index)
             self.array = state[0]
             self.highlighted_indices = state[1]
             self.sorted_indices = state[2]
@@ -141,18 +270,6 @@ class SortingCanvas(FigureCanvas):
             return True
         return False
 
-    def next_state(self):
-        return self.go_to_state(self.current_state_index + 1)
-
-    def prev_state(self):
-        return self.go_to_state(self.current_state_index - 1)
-
-    def reset(self):
-        return self.go_to_state(0)
-
-    def last_state(self):
-        return self.go_to_state(len(self.states) - 1)
-
 
 class SortingVisualizer(QMainWindow):
     def __init__(self):
@@ -197,6 +314,7 @@ class SortingVisualizer(QMainWindow):
         self.timer = QTimer()
         self.timer.timeout.connect(self.step_forward)
         self.speed = 500  # milliseconds
+        self.playback = PlaybackController(self.show_state, lambda: len(self.canvas.trace), self.timer, self.speed)
         self.current_algorithm = None
 
         # Generate initial array
@@ -233,6 +351,14 @@ class SortingVisualizer(QMainWindow):
         self.start_btn.clicked.connect(self.start_sorting)
         layout.addWidget(self.start_btn)
 
+        self.save_trace_btn = QPushButton("Save Trace")
+        self.save_trace_btn.clicked.connect(self.save_trace)
+        layout.addWidget(self.save_trace_btn)
+
+        self.open_trace_btn = QPushButton("Open Trace")
+        self.open_trace_btn.clicked.connect(self.open_trace)
+        layout.addWidget(self.open_trace_btn)
+
         layout.addStretch()
 
         self.algorithm_group.setLayout(layout)
@@ -322,6 +448,7 @@ class SortingVisualizer(QMainWindow):
     def generate_array(self):
         size = self.size_input.value()
         self.stop_animation()
+        self.playback.rewind()
         array = self.canvas.setup_array(size)
         self.update_status("Generated new random array")
         self.update_buttons_state()
@@ -331,6 +458,7 @@ class SortingVisualizer(QMainWindow):
         custom_input = self.custom_input.currentText()
         array = self.canvas.custom_array(custom_input)
         if array:
+            self.playback.rewind()
             self.update_status(f"Applied custom array: {custom_input}")
         else:
             self.update_status("Invalid input. Please enter comma-separated integers.")
@@ -338,8 +466,7 @@ class SortingVisualizer(QMainWindow):
 
     def update_speed(self):
         self.speed = self.speed_slider.value()
-        if self.timer.isActive():
-            self.timer.setInterval(self.speed)
+        self.playback.set_interval(self.speed)
 
     def toggle_animation(self):
         if self.timer.isActive():
@@ -348,40 +475,37 @@ class SortingVisualizer(QMainWindow):
             self.start_animation()
 
     def start_animation(self):
-        self.timer.start(self.speed)
+        self.playback.play()
         self.play_btn.setText("⏸ Pause")
 
     def stop_animation(self):
-        self.timer.stop()
+        self.playback.pause()
         self.play_btn.setText("▶ Play")
 
-    def step_forward(self):
-        if not self.canvas.next_state():
-            self.stop_animation()
+    def show_state(self, index):
+        self.canvas.go_to_state(index)
         self.update_status_from_current_state()
         self.update_buttons_state()
 
+    def step_forward(self):
+        if not self.playback.next():
+            self.stop_animation()
+
     def step_backward(self):
         self.stop_animation()
-        self.canvas.prev_state()
-        self.update_status_from_current_state()
-        self.update_buttons_state()
+        self.playback.prev()
 
     def go_to_first(self):
         self.stop_animation()
-        self.canvas.reset()
-        self.update_status_from_current_state()
-        self.update_buttons_state()
+        self.playback.first()
 
     def go_to_last(self):
         self.stop_animation()
-        self.canvas.last_state()
-        self.update_status_from_current_state()
-        self.update_buttons_state()
+        self.playback.last()
 
     def update_buttons_state(self):
-        at_start = self.canvas.current_state_index == 0
-        at_end = self.canvas.current_state_index == len(self.canvas.states) - 1
+        at_start = self.playback.at_start()
+        at_end = self.playback.at_end()
 
         self.first_btn.setEnabled(not at_start)
         self.prev_btn.setEnabled(not at_start)
@@ -390,17 +514,14 @@ class SortingVisualizer(QMainWindow):
         self.play_btn.setEnabled(not at_end)
 
     def update_status_from_current_state(self):
-        if not self.canvas.states:
-            return
-
         idx = self.canvas.current_state_index
-        state = self.canvas.states[idx]
+        state = self.canvas.trace.seek(idx)
 
         # Get highlighted indices
         highlighted = state[1]
 
         # Create status message
-        status = f"Step {idx}/{len(self.canvas.states) - 1}\n"
+        status = f"Step {idx}/{len(self.canvas.trace) - 1}\n"
         status += f"Algorithm: {self.algo_combo.currentText()}\n"
         status += f"Comparisons: {state[4]}\n"
         status += f"Swaps: {state[5]}\n\n"
@@ -414,22 +535,51 @@ class SortingVisualizer(QMainWindow):
 
         # Add explanation based on current step and algorithm
         if self.current_algorithm and idx > 0:
-            prev_state = self.canvas.states[idx - 1][0]
             curr_state = state[0]
 
-            if prev_state != curr_state:
-                # Find what changed
-                changes = []
-                for i in range(len(prev_state)):
-                    if i < len(curr_state) and prev_state[i] != curr_state[i]:
-                        changes.append(i)
-
-                if changes and len(changes) == 2:
-                    status += f"\n\nSwapped elements at indices {changes[0]} and {changes[1]}"
-                    status += f"\nValues: {curr_state[changes[0]]} and {curr_state[changes[1]]}"
+            # The step's event lists exactly what changed
+            changes = self.canvas.trace.writes(idx)
+            if len(changes) == 2:
+                status += f"\n\nSwapped elements at indices {changes[0]} and {changes[1]}"
+                status += f"\nValues: {curr_state[changes[0]]} and {curr_state[changes[1]]}"
 
         self.status_text.setText(status)
 
+    def save_trace(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Trace", "", TRACE_FILTER)
+        if not path:
+            return
+        try:
+            self.canvas.trace.save(path)
+        except OSError as e:
+            self.update_status(f"Could not save trace: {e}")
+            return
+        self.update_status(f"Saved {len(self.canvas.trace) - 1} steps to {path}")
+
+    def open_trace(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Open Trace", "", TRACE_FILTER)
+        if not path:
+            return
+        self.stop_animation()
+        try:
+            trace = SortTrace.open(path)
+        except (OSError, ValueError) as e:
+            self.update_status(f"Could not open trace: {e}")
+            return
+
+        # Steps are read from the file as they are shown
+        self.playback.rewind()
+        self.canvas.trace = trace
+        self.current_algorithm = trace.meta.get('algorithm')
+        if self.current_algorithm:
+            self.algo_combo.setCurrentText(self.current_algorithm)
+        if trace.meta.get('ascending', True):
+            self.order_asc.setChecked(True)
+        else:
+            self.order_desc.setChecked(True)
+        self.show_state(0)
+        self.update_status(f"Opened {path} ({len(trace) - 1} steps)")
+
     def update_status(self, message):
         current_text = self.status_text.toPlainText()
         self.status_text.setText(f"{message}\n\n{current_text}")
@@ -441,7 +591,8 @@ class SortingVisualizer(QMainWindow):
         algo_name = self.algo_combo.currentText()
 
         # Reset the states
-        self.canvas.states = [(self.canvas.array.copy(), [], [], [], 0, 0)]
+        self.playback.rewind()
+        self.canvas.trace = SortTrace(self.canvas.array)
         self.canvas.current_state_index = 0
         self.canvas.comparison_count = 0
         self.canvas.swap_count = 0
@@ -462,6 +613,7 @@ class SortingVisualizer(QMainWindow):
             self.merge_sort_driver(ascending)
 
         self.current_algorithm = algo_name
+        self.canvas.trace.meta = {'algorithm': algo_name, 'ascending': ascending}
         self.canvas.plot_state()
         self.update_status(f"Started {algo_name} algorithm")
         self.update_buttons_state()
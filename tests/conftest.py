@@ -0,0 +1,27 @@
+"""The visualizers are standalone scripts, some named like Stack&Queue.py, so
+the tests load them by path the same way export_trace.py does."""
+import os
+import sys
+
+import matplotlib
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+matplotlib.use('Agg')
+
+from export_trace import load_script  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def mst():
+    return load_script("kruskal-prim.py")
+
+
+@pytest.fixture(scope="session")
+def matching():
+    return load_script("Stable_Marriage_Visualization.py")
+
+
+@pytest.fixture(scope="session")
+def stack_queue():
+    return load_script("Stack&Queue.py")
@@ -0,0 +1,138 @@
+"""TraceLog seeking, playback and trace files checked against replaying every step in order"""
+import random
+
+import numpy as np
+import pytest
+
+from algo_trace import PlaybackController, TraceLog, decode_varints, encode_varints, read_metadata, zigzag
+
+
+class WalkTrace(TraceLog):
+    """A few counters; the event (i, delta) adds delta to counter i"""
+
+    KEYFRAME_INTERVAL = 8
+
+    def __init__(self, size):
+        self.size = size
+        super().__init__([0] * size)
+
+    def parameters(self):
+        return {'size': self.size}
+
+    @classmethod
+    def from_parameters(cls, parameters):
+        return cls(parameters['size'])
+
+    def encode(self, state):
+        return state
+
+    def decode(self, values):
+        return np.frombuffer(values, dtype=np.int64).tolist()
+
+    def apply(self, state, event):
+        state[event[0]] += event[1]
+        return state
+
+
+def random_walk(rng, steps, size=4, scale=1000):
+    trace = WalkTrace(size)
+    state, states = [0] * size, [[0] * size]
+    for _ in range(steps):
+        event = [rng.randrange(size), rng.randint(-scale, scale)]
+        state[event[0]] += event[1]
+        trace.record(event, state)
+        states.append(list(state))
+    return trace, states
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_seek_matches_sequential_replay(seed):
+    rng = random.Random(seed)
+    trace, states = random_walk(rng, rng.randint(0, 100))
+    assert len(trace) == len(states)
+    steps = [rng.randrange(len(trace)) for _ in range(50)] + list(range(len(trace) - 1, -1, -1))
+    for step in steps:
+        assert trace.seek(step) == states[step]
+    assert trace.seek(-1) == states[-1]
+
+
+def test_views_seek_independently():
+    trace, states = random_walk(random.Random(0), 60)
+    view = trace.view()
+    for a, b in [(10, 50), (59, 3), (20, 21)]:
+        assert view.seek(a) == states[a]
+        assert trace.seek(b) == states[b]
+        assert view.seek(a + 1) == states[a + 1]
+
+
+def test_playback_controller_stays_in_bounds_and_extends():
+    shown, steps = [], [0]
+
+    def extend():
+        if len(steps) == 5:
+            return False
+        steps.append(len(steps))
+        return True
+
+    playback = PlaybackController(shown.append, lambda: len(steps), extend=extend)
+    assert not playback.prev()
+    assert playback.seek(-3) == 0 and playback.seek(10) == 0
+
+    # Stepping past the end computes new steps until extend() reports it is done
+    while playback.next():
+        pass
+    assert playback.position == 4 and len(steps) == 5 and playback.at_end()
+    assert playback.seek(99) == 4 and playback.first() == 0 and playback.at_start()
+    assert playback.last() == 4
+    assert shown == [0, 0, 1, 2, 3, 4, 4, 0, 4]
+
+
+@pytest.mark.parametrize("count", [0, 1, 5, 40, 300])
+def test_varints_round_trip(count):
+    # Small runs decode byte by byte, those over 256 bytes in one NumPy pass
+    rng = np.random.default_rng(count)
+    extremes = [0, -1, 1, 63, -64, 64, 2**31, -2**31, 2**63 - 1, -2**63]
+    values = np.concatenate((extremes, rng.integers(-2**63, 2**63 - 1, count, dtype=np.int64),
+                             rng.integers(-300, 300, count)))
+    raw, sizes = encode_varints(zigzag(values))
+    assert sizes.sum() == len(raw)
+    assert decode_varints(raw.tobytes()).tolist() == values.tolist()
+    assert decode_varints(raw[:sizes[:4].sum()].tobytes()).tolist() == values[:4].tolist()
+
+
+@pytest.mark.parametrize("steps", [0, 1, 7, 8, 9, 200])
+def test_saved_trace_reopens_with_the_same_steps(tmp_path, steps):
+    rng = random.Random(steps)
+    trace, states = random_walk(rng, steps, scale=2**40)
+    trace.meta = {'title': 'walk', 'speed': [1, 2]}
+    path = tmp_path / 'walk.trace'
+    trace.save(path)
+
+    metadata, length = read_metadata(path)
+    assert length == len(states)
+    assert metadata == {'kind': 'WalkTrace', 'parameters': {'size': 4}, 'meta': trace.meta}
+
+    opened = WalkTrace.open(path)
+    assert len(opened) == len(states) and opened.meta == trace.meta
+    assert [opened.event(step).tolist() for step in range(1, len(opened))] == [
+        trace.event(step).tolist() for step in range(1, len(trace))]
+    for step in [rng.randrange(len(opened)) for _ in range(30)] + list(range(len(opened))):
+        assert opened.seek(step) == states[step]
+    assert opened.view().seek(0) == states[0]
+
+    # Saving a mapped trace copies the file as it is
+    opened.save(tmp_path / 'copy.trace')
+    assert (tmp_path / 'copy.trace').read_bytes() == path.read_bytes()
+
+
+def test_open_rejects_other_files(tmp_path):
+    class OtherTrace(WalkTrace):
+        pass
+
+    trace, _ = random_walk(random.Random(0), 10)
+    trace.save(tmp_path / 'walk.trace')
+    with pytest.raises(ValueError):
+        OtherTrace.open(tmp_path / 'walk.trace')
+    (tmp_path / 'junk.trace').write_bytes(b'not a trace' * 20)
+    with pytest.raises(ValueError):
+        WalkTrace.open(tmp_path / 'junk.trace')
@@ -0,0 +1,55 @@
+"""DynamicMST checked against networkx after random edge edits"""
+import networkx as nx
+import numpy as np
+import pytest
+
+
+def as_graph(n_nodes, edges):
+    graph = nx.Graph()
+    graph.add_nodes_from(range(n_nodes))
+    graph.add_weighted_edges_from(edges.tolist())
+    return graph
+
+
+def check_tree(dynamic):
+    graph = as_graph(dynamic.n_nodes, dynamic.edges)
+    tree = nx.Graph(list(dynamic.tree))
+    tree.add_nodes_from(range(dynamic.n_nodes))
+    assert all(graph.has_edge(u, v) for u, v in dynamic.tree)
+    assert nx.is_tree(tree)
+    expected = nx.minimum_spanning_tree(graph).size(weight='weight')
+    assert dynamic.total_weight() == expected
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_dynamic_mst_matches_networkx_under_edits(mst, seed):
+    rng = np.random.default_rng(seed)
+    n_nodes = int(rng.integers(3, 12))
+    dynamic = mst.DynamicMST(n_nodes, mst.random_edge_array(n_nodes, 0.4, rng))
+    check_tree(dynamic)
+
+    for _ in range(40):
+        u, v = sorted(rng.choice(n_nodes, 2, replace=False).tolist())
+        weight = int(rng.integers(1, 21))
+        operation = rng.choice(["insert", "remove", "set_weight"])
+        exists = (u, v) in dynamic.weights
+        if operation == "insert" and not exists:
+            steps = dynamic.insert(u, v, weight)
+        elif operation == "remove" and exists:
+            graph = as_graph(n_nodes, dynamic.edges)
+            graph.remove_edge(u, v)
+            if not nx.is_connected(graph):
+                with pytest.raises(ValueError):
+                    dynamic.remove(u, v)
+                continue
+            steps = dynamic.remove(u, v)
+        elif exists:
+            steps = dynamic.set_weight(u, v, weight)
+        else:
+            with pytest.raises(ValueError):
+                dynamic.remove(u, v)
+            continue
+
+        check_tree(dynamic)
+        assert steps[-1]['total_weight'] == dynamic.total_weight()
+        assert sorted(steps[-1]['mst_edges']) == sorted(dynamic.tree)
@@ -0,0 +1,223 @@
+"""Matching engines checked against textbook and brute-force versions"""
+import itertools
+
+import numpy as np
+import pytest
+
+
+def gale_shapley(men_prefs, women_prefs):
+    """Textbook men-proposing Gale-Shapley; returns each woman's husband"""
+    n = len(men_prefs)
+    rank = [{man: i for i, man in enumerate(row)} for row in women_prefs]
+    next_choice, husband, free = [0] * n, [-1] * n, list(range(n))
+    while free:
+        man = free.pop()
+        woman = men_prefs[man][next_choice[man]]
+        next_choice[man] += 1
+        if husband[woman] < 0:
+            husband[woman] = man
+        elif rank[woman][man] < rank[woman][husband[woman]]:
+            free.append(husband[woman])
+            husband[woman] = man
+        else:
+            free.append(man)
+    return husband
+
+
+@pytest.mark.parametrize("n", [1, 2, 5, 30])
+def test_engine_matches_textbook_gale_shapley(matching, n):
+    rng = np.random.default_rng(n)
+    for _ in range(10):
+        men_prefs = matching.random_preferences(n, rng)
+        women_prefs = matching.random_preferences(n, rng)
+        expected = gale_shapley(men_prefs.tolist(), women_prefs.tolist())
+        engine = matching.GaleShapleyEngine(men_prefs, women_prefs)
+
+        engine.run()
+        assert engine.husband.tolist() == expected
+        engine.reset()
+        while engine.step():
+            pass
+        assert engine.husband.tolist() == expected
+        assert np.array_equal(engine.wives()[engine.husband], np.arange(n))
+
+
+def same_state(a, b):
+    return (np.array_equal(a[0], b[0]) and np.array_equal(a[1], b[1])
+            and tuple(a[2]) == tuple(b[2]) and a[3] == b[3])
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_trace_seek_matches_recorded_states(matching, seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(2, 12))
+    engine = matching.GaleShapleyEngine(matching.random_preferences(n, rng),
+                                        matching.random_preferences(n, rng))
+    trace = matching.MatchingTrace(engine)
+    states = [engine.snapshot()]
+    while True:
+        event = engine.step_round() if seed % 2 else engine.step()
+        if event is None:
+            break
+        trace.add(event)
+        states.append(engine.snapshot())
+    assert len(trace) == len(states)
+
+    # Random jumps replay from keyframes; runs of single steps back undo events
+    for step in [*rng.integers(0, len(trace), 20), *range(len(trace) - 1, -1, -1)]:
+        assert same_state(trace.seek(int(step)).snapshot(), states[step])
+
+
+def brute_blocking_pairs(men_rank, women_rank, wife):
+    n = len(wife)
+    husband = [-1] * n
+    for man, woman in enumerate(wife):
+        if woman >= 0:
+            husband[woman] = man
+    return [[man, woman] for man in range(n) for woman in range(n)
+            if (wife[man] < 0 or men_rank[man][woman] < men_rank[man][wife[man]])
+            and (husband[woman] < 0 or women_rank[woman][man] < women_rank[woman][husband[woman]])]
+
+
+@pytest.mark.parametrize("n", [1, 3, 7, 40])
+def test_blocking_pairs_match_brute_force(matching, n):
+    rng = np.random.default_rng(n)
+    for _ in range(10):
+        men_prefs = matching.random_preferences(n, rng)
+        women_prefs = matching.random_preferences(n, rng)
+        men_rank, women_rank = matching.inverse_ranks(men_prefs), matching.inverse_ranks(women_prefs)
+        engine = matching.GaleShapleyEngine(men_prefs, women_prefs)
+
+        # Partial matchings from part way through a run, and random ones
+        for _ in range(rng.integers(0, 3 * n)):
+            engine.step()
+        wife = engine.wives()
+        expected = brute_blocking_pairs(men_rank.tolist(), women_rank.tolist(), wife.tolist())
+        assert matching.blocking_pairs(men_rank, women_rank, wife, chunk_rows=3).tolist() == expected
+
+        wife = rng.permutation(n)
+        wife[rng.random(n) < 0.2] = -1
+        expected = brute_blocking_pairs(men_rank.tolist(), women_rank.tolist(), wife.tolist())
+        assert engine.blocking_pairs(wife).tolist() == expected
+
+        engine.run()
+        assert len(engine.blocking_pairs()) == 0
+
+
+@pytest.mark.parametrize("n", range(1, 7))
+def test_lattice_enumerates_every_stable_matching(matching, n):
+    rng = np.random.default_rng(n)
+    for _ in range(15):
+        men_prefs = matching.random_preferences(n, rng)
+        women_prefs = matching.random_preferences(n, rng)
+        lattice = matching.StableMatchingLattice(men_prefs, women_prefs)
+        stable = [wife for wife in itertools.permutations(range(n))
+                  if len(matching.blocking_pairs(lattice.men_rank, lattice.women_rank, np.array(wife))) == 0]
+
+        found = [tuple(wife.tolist()) for wife in lattice]
+        assert len(found) == len(set(found))
+        assert set(found) == set(stable)
+        costs = [lattice.costs(np.array(wife)) for wife in stable]
+        assert lattice.costs(lattice.egalitarian())[0] == min(cost for cost, _ in costs)
+        assert tuple(lattice.minimum_regret().tolist()) in found
+        assert lattice.costs(lattice.minimum_regret())[1] == min(regret for _, regret in costs)
+
+
+def hr_blocking_pairs(lists, offsets, resident_ranks, hospital_ranks, capacities, assignment):
+    """Pairs where the resident prefers the hospital and it has room or an assignee it likes less"""
+    ranks = {(r, int(lists[j])): (int(resident_ranks[j]), int(hospital_ranks[j]))
+             for r in range(len(offsets) - 1) for j in range(offsets[r], offsets[r + 1])
+             if hospital_ranks[j] >= 0}
+    blocking = set()
+    for (resident, hospital), (resident_rank, hospital_rank) in ranks.items():
+        own = assignment[resident]
+        if own >= 0 and ranks[resident, own][0] <= resident_rank:
+            continue
+        assignees = [r for r in range(len(assignment)) if assignment[r] == hospital]
+        if (len(assignees) < capacities[hospital]
+                or any(hospital_rank < ranks[r, hospital][1] for r in assignees)):
+            blocking.add((resident, hospital))
+    return ranks, blocking
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_hospitals_residents_is_weakly_stable(matching, seed):
+    rng = np.random.default_rng(seed)
+    for _ in range(10):
+        n_residents, n_hospitals = int(rng.integers(1, 15)), int(rng.integers(1, 5))
+        lists, offsets, resident_ranks, hospital_ranks, capacities = matching.random_hospitals_residents(
+            n_residents, n_hospitals, int(rng.integers(1, n_hospitals + 1)), rng, tie_probability=0.4)
+        hospital_ranks[rng.random(len(hospital_ranks)) < 0.1] = -1
+        engine = matching.HospitalsResidentsEngine(lists, offsets, resident_ranks, hospital_ranks, capacities,
+                                                   tie_break=rng.permutation(n_residents))
+        assignment = engine.run()
+
+        ranks, blocking = hr_blocking_pairs(lists, offsets, resident_ranks, hospital_ranks, capacities,
+                                            assignment)
+        assert not blocking
+        assert all((r, h) in ranks for r, h in enumerate(assignment.tolist()) if h >= 0)
+        assert np.all(np.bincount(assignment[assignment >= 0], minlength=n_hospitals) <= capacities)
+
+        # The finder agrees with brute force on an arbitrary acceptable assignment too
+        other = np.array([rng.choice([-1] + [h for r2, h in ranks if r2 == r]) for r in range(n_residents)])
+        _, blocking = hr_blocking_pairs(lists, offsets, resident_ranks, hospital_ranks, capacities, other)
+        assert set(map(tuple, engine.blocking_pairs(other).tolist())) == blocking
+
+
+def perfect_matchings(people):
+    if not people:
+        yield []
+        return
+    for i in range(1, len(people)):
+        for rest in perfect_matchings(people[1:i] + people[i + 1:]):
+            yield [(people[0], people[i])] + rest
+
+
+def roommates_stable(prefs, partner):
+    rank = [{q: i for i, q in enumerate(row)} for row in prefs]
+    return not any(rank[p][q] < rank[p][partner[p]] and rank[q][p] < rank[q][partner[q]]
+                   for p in range(len(prefs)) for q in range(len(prefs)) if p != q and partner[p] != q)
+
+
+@pytest.mark.parametrize("n", [2, 4, 6, 8])
+def test_roommates_finds_a_stable_matching_iff_one_exists(matching, n):
+    rng = np.random.default_rng(n)
+    for _ in range(40):
+        prefs = matching.random_roommates(n, rng)
+        partner = matching.StableRoommatesEngine(prefs).run()
+        exists = False
+        for pairs in perfect_matchings(list(range(n))):
+            candidate = [0] * n
+            for a, b in pairs:
+                candidate[a], candidate[b] = b, a
+            if roommates_stable(prefs.tolist(), candidate):
+                exists = True
+                break
+        if partner is None:
+            assert not exists
+        else:
+            assert all(partner[partner[p]] == p != partner[p] for p in range(n))
+            assert roommates_stable(prefs.tolist(), partner.tolist())
+
+
+@pytest.mark.parametrize("n", [1, 3, 5])
+def test_roommates_with_odd_count_has_no_stable_matching(matching, n):
+    assert matching.StableRoommatesEngine(matching.random_roommates(n, np.random.default_rng(n))).run() is None
+
+
+def test_trace_view_seeks_without_moving_the_live_engine(matching):
+    rng = np.random.default_rng(0)
+    engine = matching.GaleShapleyEngine(matching.random_preferences(8, rng), matching.random_preferences(8, rng))
+    trace = matching.MatchingTrace(engine)
+    states = [engine.snapshot()]
+    while True:
+        event = engine.step()
+        if event is None:
+            break
+        trace.add(event)
+        states.append(engine.snapshot())
+
+    view = trace.view()
+    for step in [0, len(trace) // 2, len(trace) - 2]:
+        assert same_state(view.seek(step).snapshot(), states[step])
+        assert same_state(engine.snapshot(), states[-1])
@@ -0,0 +1,199 @@
+"""Stack and queue engines checked against collections.deque, heapq and plain lists"""
+import heapq
+import random
+from collections import deque
+
+import pytest
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_engines_match_deque(stack_queue, seed):
+    rng = random.Random(seed)
+    for name, engine_class in stack_queue.ENGINES.items():
+        engine = engine_class(range(rng.randint(0, 20)))
+        expected = deque(range(len(engine)))
+        for i in range(400):
+            r = rng.random()
+            if r < 0.3:
+                engine.push(i)
+                expected.append(i)
+            elif r < 0.45:
+                engine.pushleft(i)
+                expected.appendleft(i)
+            elif expected and r < 0.7:
+                assert engine.pop() == expected.pop(), name
+            elif expected:
+                assert engine.popleft() == expected.popleft(), name
+            assert len(engine) == len(expected), name
+            assert list(engine) == list(expected), name
+            if expected:
+                middle = len(expected) // 2
+                assert (engine[0], engine[-1], engine[middle]) == (expected[0], expected[-1], expected[middle]), name
+
+
+def random_command(engine, rng):
+    r = rng.random()
+    if r < 0.1:
+        return "replace", (list(engine), [rng.randint(0, 9) for _ in range(rng.randint(0, 4))])
+    if r < 0.5 or not len(engine):
+        return ("push" if r < 0.35 else "pushleft"), rng.randint(0, 9)
+    return ("pop", engine[-1]) if r < 0.8 else ("popleft", engine[0])
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_undo_log_undoes_and_redoes_through_compaction(stack_queue, seed):
+    rng = random.Random(seed)
+    limit = rng.choice([4, 7, 16])
+    log = stack_queue.UndoLog(limit)
+    engine = stack_queue.RingBuffer()
+    history = [[]]  # States along the applied entries, newest last
+    for _ in range(300):
+        command = stack_queue.Command(*random_command(engine, rng))
+        stack_queue.apply_command(engine, command)
+        log.record(command)
+        history.append(list(engine))
+        assert 0 <= log.index <= len(log) <= limit
+
+        # The newest limit // 2 entries are never compacted, so they step back exactly
+        steps = rng.randint(0, min(log.index, limit // 2))
+        for back in range(1, steps + 1):
+            stack_queue.apply_command(engine, log.undo(), inverse=True)
+            assert list(engine) == history[-1 - back]
+        for _ in range(steps):
+            stack_queue.apply_command(engine, log.redo())
+        assert list(engine) == history[-1]
+
+        # Compacted entries still lead from a past state to the present
+        if rng.random() < 0.1:
+            applied = log.index
+            while log.can_undo():
+                stack_queue.apply_command(engine, log.undo(), inverse=True)
+            assert list(engine) in history
+            while log.index < applied:
+                stack_queue.apply_command(engine, log.redo())
+            assert list(engine) == history[-1]
+
+        # Leave a redo tail behind for the next record to drop
+        if rng.random() < 0.2 and log.can_undo():
+            stack_queue.apply_command(engine, log.undo(), inverse=True)
+            history.pop()
+            assert list(engine) == history[-1]
+
+
+@pytest.mark.parametrize("arity", [2, 3, 4, 8])
+def test_heaps_match_heapq_and_undo_exactly(stack_queue, arity):
+    rng = random.Random(arity)
+    for _ in range(20):
+        values = [str(rng.randint(0, 50)) for _ in range(rng.randint(0, 30))]
+        heap = stack_queue.DaryHeap(values, arity=arity)
+        expected = [int(value) for value in values]
+        heapq.heapify(expected)
+        for _ in range(150):
+            before = list(heap.entries)
+            if rng.random() < 0.5 or not expected:
+                value = str(rng.randint(0, 50))
+                heap.push(value)
+                heapq.heappush(expected, int(value))
+                command = stack_queue.Command("heappush", (value, list(heap.last_swaps)))
+            else:
+                value = heap.pop()
+                assert int(value) == heapq.heappop(expected)
+                command = stack_queue.Command("heappop", (value, list(heap.last_swaps)))
+            after = list(heap.entries)
+            stack_queue.apply_command(heap, command, inverse=True)
+            assert heap.entries == before
+            stack_queue.apply_command(heap, command)
+            assert heap.entries == after
+
+
+def suffix_minima(pushed):
+    """Positions of the values no later push undercuts, which a monotonic queue keeps"""
+    kept, smallest = [], float("inf")
+    for i in range(len(pushed) - 1, -1, -1):
+        if int(pushed[i]) <= smallest:
+            kept.append(i)
+            smallest = int(pushed[i])
+    return kept[::-1]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_monotonic_queue_keeps_suffix_minima_and_undoes(stack_queue, seed):
+    rng = random.Random(seed)
+    queue = stack_queue.MonotonicQueue()
+    window = []  # Pushed values from just after the last one dequeued
+    for _ in range(300):
+        before = list(queue)
+        if rng.random() < 0.6 or not len(queue):
+            value = str(rng.randint(0, 20))
+            queue.push(value)
+            window.append(value)
+            command = stack_queue.Command("monopush", (value, list(queue.last_evicted)))
+        else:
+            front = suffix_minima(window)[0]
+            value = queue.popleft()
+            assert value == window[front]
+            window = window[front + 1:]
+            command = stack_queue.Command("popleft", value)
+        after = list(queue)
+        stack_queue.apply_command(queue, command, inverse=True)
+        assert list(queue) == before
+        stack_queue.apply_command(queue, command)
+        assert list(queue) == after
+        assert list(queue) == [window[i] for i in suffix_minima(window)]
+
+
+def test_monotonic_queue_refuses_a_front_insert_that_breaks_its_order(stack_queue):
+    queue = stack_queue.MonotonicQueue(["3", "5"])
+    with pytest.raises(AssertionError):
+        queue.unpopleft("4")
+    queue.unpopleft("1")
+    assert list(queue) == ["1", "3", "5"]
+
+
+@pytest.mark.parametrize("kind", ["stack", "queue"])
+def test_persistent_engine_keeps_every_version_intact(stack_queue, kind):
+    rng = random.Random(kind)
+    engine = stack_queue.PersistentEngine(kind=kind)
+    expected, history = [], [[]]
+    for i in range(300):
+        if rng.random() < 0.55 or not expected:
+            engine.push(i)
+            expected.append(i)
+        elif kind == "stack":
+            assert engine.pop() == expected.pop()
+        else:
+            assert engine.popleft() == expected.pop(0)
+        history.append(list(expected))
+        assert list(engine) == expected
+        if expected:
+            assert (engine[0], engine[-1]) == (expected[0], expected[-1])
+
+    # Branching off an old version leaves every other version as it was
+    for version in rng.sample(range(len(history)), 30):
+        engine.checkout(version)
+        assert list(engine) == history[version]
+    engine.checkout(5)
+    engine.push(-1)
+    assert list(engine) == history[5] + [-1]
+    assert [list(version) for version in engine.versions[:len(history)]] == history
+
+
+def test_real_time_queue_matches_deque_from_any_version(stack_queue):
+    rng = random.Random(0)
+    versions = [(stack_queue.RealTimeQueue.EMPTY, deque())]
+    for i in range(500):
+        # Operate on a random earlier version, so lazy rotations get shared and forced out of order
+        queue, expected = versions[rng.randrange(len(versions))] if rng.random() < 0.2 else versions[-1]
+        expected = deque(expected)
+        if rng.random() < 0.55 or not expected:
+            queue = queue.push(i)
+            expected.append(i)
+        else:
+            value, queue = queue.popleft()
+            assert value == expected.popleft()
+        versions.append((queue, expected))
+        assert len(queue) == len(expected)
+    for queue, expected in versions:
+        assert list(queue) == list(expected)
+        if expected:
+            assert (queue[0], queue[-1]) == (expected[0], expected[-1])